@@ -0,0 +1,9 @@
+"""Benchmarks of Coleridge.
+
+```
+python -m benchmarks --output results.json
+python -m benchmarks --quick --only background rabbit
+```
+
+The results are written as JSON, to compare them between versions.
+"""
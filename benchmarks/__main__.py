@@ -0,0 +1,76 @@
+"""Run the benchmarks and write their results as JSON"""
+
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from importlib.metadata import PackageNotFoundError, version
+from json import dumps
+from platform import platform, python_implementation, python_version
+from os import cpu_count
+from sys import stderr
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Sequence, Union
+from . import bench_background, bench_cron, bench_import, bench_rabbit, bench_serialization
+from .common import Result
+
+SUITES: Dict[str, Callable[[bool], List[Result]]] = {
+    "background": bench_background.run,
+    "rabbit": bench_rabbit.run,
+    "serialization": bench_serialization.run,
+    "cron": bench_cron.run,
+    "import": bench_import.run,
+}
+
+
+def _version() -> str:
+    """The version of Coleridge being measured."""
+    try:
+        return version("coleridge")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def main(argv: Union[Sequence[str], None] = None) -> int:
+    """
+    Run the benchmarks.
+
+    Args:
+        argv (Union[Sequence[str], None], optional): The arguments. Defaults to None, \
+            which uses the ones of the process.
+
+    Returns:
+        int: The exit code.
+    """
+    parser = ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    parser.add_argument("--quick", action="store_true", help="Run shorter benchmarks")
+    parser.add_argument(
+        "--only", nargs="+", choices=sorted(SUITES), default=None, help="The suites to run"
+    )
+    parser.add_argument("--output", default=None, help="The JSON file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    report: Dict[str, Any] = {
+        "coleridge": _version(),
+        "python": f"{python_implementation()} {python_version()}",
+        "platform": platform(),
+        "cpus": cpu_count(),
+        "quick": args.quick,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "results": [],
+    }
+    for name in args.only or list(SUITES):
+        started = perf_counter()
+        print(f"Running {name}...", file=stderr)
+        report["results"].extend(SUITES[name](args.quick))
+        print(f"  {perf_counter() - started:.1f}s", file=stderr)
+
+    text = dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
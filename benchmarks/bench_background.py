@@ -0,0 +1,61 @@
+"""Throughput and latency of the background functions"""
+
+from time import perf_counter, sleep
+from typing import List
+from coleridge import Coleridge, Value
+from .common import Countdown, Result, throughput
+
+CONCURRENCY = (1, 4, 16, 64)
+WORKLOADS = {"noop": 0.0, "sleep_1ms": 0.001}
+
+
+def _bench(concurrency: int, workload: str, tasks: int) -> Result:
+    """Run `tasks` tasks on a pool of `concurrency` workers."""
+    coleridge = Coleridge(max_workers=concurrency)
+    pause = WORKLOADS[workload]
+
+    @coleridge
+    def work(value: Value) -> Value:
+        if pause:
+            sleep(pause)
+        return value
+
+    countdown = Countdown(tasks)
+    value = Value(value=1)
+    started = perf_counter()
+    for _ in range(tasks):
+        submitted = perf_counter()
+        work.run(value).add_done_callback(lambda _, s=submitted: countdown.done(s))
+    if not countdown.wait(600):
+        raise TimeoutError("The background tasks did not finish")
+    seconds = perf_counter() - started
+    if coleridge.executor is not None:
+        coleridge.executor.shutdown()
+    return throughput(
+        "background.run",
+        {"concurrency": concurrency, "workload": workload},
+        tasks,
+        seconds,
+        countdown.latencies,
+    )
+
+
+def run(quick: bool) -> List[Result]:
+    """
+    Benchmark `DecoratedBackgroundFunction.run` at various concurrency levels.
+
+    Args:
+        quick (bool): Run fewer tasks.
+
+    Returns:
+        List[Result]: The results.
+    """
+    results = []
+    for workload, pause in WORKLOADS.items():
+        for concurrency in CONCURRENCY:
+            tasks = 2_000 if quick else 20_000
+            if pause:
+                # Keep every run around one second of work per worker
+                tasks = min(tasks, int(concurrency / pause) * (1 if quick else 3))
+            results.append(_bench(concurrency, workload, tasks))
+    return results
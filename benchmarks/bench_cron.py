@@ -0,0 +1,52 @@
+"""Firing jitter of the cron jobs"""
+
+from threading import Lock
+from time import sleep, time
+from typing import List
+from coleridge import CronScheduler, WorkerPool
+from .common import Result, summarize
+
+JOBS = (1, 100, 1_000)
+
+
+def _bench(jobs: int, seconds: int) -> Result:
+    """Schedule `jobs` jobs every second, and measure how late they start."""
+    scheduler = CronScheduler(WorkerPool(8, name="bench-cron"))
+    lock = Lock()
+    jitter: List[float] = []
+
+    def _job() -> None:
+        now = time()
+        with lock:
+            # The jobs are due on the second
+            jitter.append(now - int(now))
+
+    scheduled = [scheduler.add("* * * * * *", _job) for _ in range(jobs)]
+    sleep(seconds + 0.5)
+    for job in scheduled:
+        scheduler.remove(job)
+    scheduler.shutdown()
+    scheduler.executor.shutdown()
+    stats = [job.stats for job in scheduled]
+    return {
+        "name": "cron.jitter",
+        "params": {"jobs": jobs, "seconds": seconds},
+        "runs": len(jitter),
+        "skipped": sum(s.skipped for s in stats),
+        "misfires": sum(s.misfires for s in stats),
+        "jitter": summarize(jitter),
+    }
+
+
+def run(quick: bool) -> List[Result]:
+    """
+    Benchmark how late the cron jobs start, with an increasing number of jobs.
+
+    Args:
+        quick (bool): Measure for less time.
+
+    Returns:
+        List[Result]: The results.
+    """
+    seconds = 2 if quick else 5
+    return [_bench(jobs, seconds) for jobs in JOBS]
@@ -0,0 +1,61 @@
+"""Import time of Coleridge, in a fresh interpreter every time"""
+
+from json import loads
+from subprocess import run as run_process  # nosec B404
+from sys import executable
+from typing import List
+from .common import Result, summarize
+
+HEAVY = ("pika", "yaml", "croniter", "sqlite3", "http.server")
+
+# What a service imports before it can decorate its first function
+SCENARIOS = {
+    "background": "from coleridge import Coleridge",
+    "rabbit": "from coleridge import Coleridge, RabbitBackgroundFunction",
+    "cron": "from coleridge import Coleridge, CronDecorator",
+}
+
+_SCRIPT = """
+from json import dumps
+from sys import modules
+from time import perf_counter
+started = perf_counter()
+{statement}
+seconds = perf_counter() - started
+print(dumps({{"seconds": seconds, "loaded": [m for m in {heavy!r} if m in modules]}}))
+"""
+
+
+def _measure(statement: str) -> Result:
+    """Time `statement` in a new interpreter, and list the heavy modules it loaded."""
+    script = _SCRIPT.format(statement=statement, heavy=HEAVY)
+    output = run_process(  # nosec B603
+        [executable, "-c", script], capture_output=True, check=True, text=True
+    ).stdout
+    return dict(loads(output))
+
+
+def run(quick: bool) -> List[Result]:
+    """
+    Benchmark importing Coleridge for background, rabbit and cron services.
+
+    Args:
+        quick (bool): Start fewer interpreters.
+
+    Returns:
+        List[Result]: The results.
+    """
+    repeat = 5 if quick else 20
+    results = []
+    for scenario, statement in SCENARIOS.items():
+        runs = [_measure(statement) for _ in range(repeat)]
+        results.append(
+            {
+                "name": "import.time",
+                "params": {"scenario": scenario},
+                "runs": repeat,
+                "loaded": runs[-1]["loaded"],
+                "time": summarize([r["seconds"] for r in runs]),
+            }
+        )
+    return results
@@ -0,0 +1,129 @@
+"""Publish/consume round trips of the rabbit code path, against the in-process broker"""
+
+from itertools import count
+from time import perf_counter
+from typing import List
+from coleridge import Coleridge, MemoryBroker, Value
+from .common import Countdown, Result, throughput
+
+CONCURRENCY = (1, 8)
+BATCH_SIZES = (1, 64)
+# A round trip to a nearby broker, waited by the messages published with confirms
+CONFIRM_LATENCY = 0.0005
+
+_queues = count()
+
+
+def _bench(concurrency: int, batch_size: int, many: bool, tasks: int) -> Result:
+    """Send `tasks` messages and wait for all the replies."""
+    pool = MemoryBroker().connection_pool()
+    coleridge = Coleridge(
+        mode="memory",
+        queue=f"bench-{next(_queues)}",
+        connection_pool=pool,
+        concurrency=concurrency,
+        publish_batch_size=batch_size,
+        publish_linger_ms=5 if batch_size > 1 else 0,
+    )
+
+    @coleridge
+    def echo(value: Value) -> Value:
+        return value
+
+    echo.consume()
+    countdown = Countdown(tasks)
+    value = Value(value=1)
+    started = perf_counter()
+    if many:
+        for offset in range(0, tasks, 256):
+            submitted = perf_counter()
+            for res in echo.run_many([value] * min(256, tasks - offset)):
+                res.add_done_callback(lambda _, s=submitted: countdown.done(s))
+    else:
+        for _ in range(tasks):
+            submitted = perf_counter()
+            echo.run(value).add_done_callback(lambda _, s=submitted: countdown.done(s))
+    echo.flush()
+    if not countdown.wait(600):
+        raise TimeoutError("The rabbit tasks did not finish")
+    seconds = perf_counter() - started
+    echo.close()
+    pool.close()
+    return throughput(
+        "rabbit.round_trip",
+        {
+            "concurrency": concurrency,
+            "publish_batch_size": batch_size,
+            "api": "run_many" if many else "run",
+        },
+        tasks,
+        seconds,
+        countdown.latencies,
+    )
+
+
+def _bench_publish(confirms: bool, batch_size: int, tasks: int) -> Result:
+    """Publish `tasks` messages, without consuming them, and wait until they are sent."""
+    broker = MemoryBroker(confirm_latency=CONFIRM_LATENCY)
+    pool = broker.connection_pool()
+    coleridge = Coleridge(
+        mode="memory",
+        queue=f"bench-{next(_queues)}",
+        connection_pool=pool,
+        consume=False,
+        publish_batch_size=batch_size,
+        publish_linger_ms=5 if batch_size > 1 else 0,
+        publisher_confirms=confirms,
+    )
+
+    @coleridge
+    def echo(value: Value) -> Value:
+        return value
+
+    value = Value(value=1)
+    latencies = []
+    started = perf_counter()
+    for _ in range(tasks):
+        submitted = perf_counter()
+        echo.run(value)
+        latencies.append(perf_counter() - submitted)
+    echo.flush()
+    seconds = perf_counter() - started
+    if broker.queue_depth(echo.queue) != tasks:
+        raise RuntimeError("Some messages were not published")
+    echo.close()
+    pool.close()
+    return throughput(
+        "rabbit.publish",
+        {
+            "publisher_confirms": confirms,
+            "publish_batch_size": batch_size,
+            "confirm_latency_ms": CONFIRM_LATENCY * 1000,
+        },
+        tasks,
+        seconds,
+        latencies,
+    )
+
+
+def run(quick: bool) -> List[Result]:
+    """
+    Benchmark rabbit round trips (publish, consume, run, reply and decode), and \
+    publishing alone, with and without publisher confirms.
+
+    Args:
+        quick (bool): Run fewer tasks.
+
+    Returns:
+        List[Result]: The results.
+    """
+    tasks = 1_000 if quick else 10_000
+    results = []
+    for concurrency in CONCURRENCY:
+        for batch_size in BATCH_SIZES:
+            results.append(_bench(concurrency, batch_size, False, tasks))
+        results.append(_bench(concurrency, 1, True, tasks))
+    for confirms in (False, True):
+        for batch_size in BATCH_SIZES:
+            results.append(_bench_publish(confirms, batch_size, tasks // 4))
+    return results
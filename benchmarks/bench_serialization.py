@@ -0,0 +1,100 @@
+"""Serialization cost of big `List[T]` payloads"""
+
+from functools import partial
+from time import perf_counter
+from typing import Any, Callable, Dict, List
+from pydantic import BaseModel
+from coleridge.codecs import get_adapter, get_codec
+from .common import Result
+
+SIZES = (100, 1_000, 10_000)
+CODECS = ("json", "msgpack", "pickle")
+
+
+class Item(BaseModel):
+    """A typical record"""
+
+    id: int
+    name: str
+    price: float
+    tags: List[str]
+    active: bool
+
+
+def _items(size: int) -> List[Item]:
+    """Build a payload."""
+    return [
+        Item(id=i, name=f"item-{i}", price=i * 1.5, tags=["a", "b", str(i)], active=i % 2 == 0)
+        for i in range(size)
+    ]
+
+
+def _time(func: Callable[[], object], repeat: int) -> float:
+    """The best time of `repeat` runs, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = perf_counter()
+        func()
+        best = min(best, perf_counter() - started)
+    return best
+
+
+def _result(  # noqa: PLR0913
+    name: str, params: Dict[str, Any], size: int, nbytes: int, encode: float, decode: float
+) -> Result:
+    """Build the result of a serialization benchmark."""
+    return {
+        "name": name,
+        "params": params,
+        "items": size,
+        "bytes": nbytes,
+        "encode_ms": round(encode * 1000, 4),
+        "decode_ms": round(decode * 1000, 4),
+        "decode_items_per_sec": round(size / decode, 2) if decode > 0 else None,
+    }
+
+
+def run(quick: bool) -> List[Result]:
+    """
+    Benchmark encoding and decoding lists of models with every codec, and with the \
+    cached type adapters used by the process pool and the result store.
+
+    Args:
+        quick (bool): Repeat the measures fewer times.
+
+    Returns:
+        List[Result]: The results.
+    """
+    repeat = 3 if quick else 10
+    results = []
+    for size in SIZES:
+        payload = _items(size)
+        for name in CODECS:
+            try:
+                codec = get_codec(name)
+            except (ImportError, ValueError):
+                continue  # msgpack is optional
+            body = codec.encode(payload)
+            results.append(
+                _result(
+                    "serialization.codec",
+                    {"codec": name, "items": size},
+                    size,
+                    len(body),
+                    _time(partial(codec.encode, payload), repeat),
+                    _time(partial(codec.decode, body, Item), repeat),
+                )
+            )
+        adapter = get_adapter(Item)
+        body = adapter.dump_json(payload)
+        results.append(
+            _result(
+                "serialization.adapter",
+                {"items": size},
+                size,
+                len(body),
+                _time(partial(adapter.dump_json, payload), repeat),
+                _time(partial(adapter.validate_json, body), repeat),
+            )
+        )
+    return results
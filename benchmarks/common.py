@@ -0,0 +1,120 @@
+"""Helpers shared by the benchmarks"""
+
+from threading import Condition
+from time import perf_counter
+from typing import Any, Dict, List, Sequence, Union
+
+Result = Dict[str, Any]
+
+
+def percentile(values: Sequence[float], q: float) -> Union[float, None]:
+    """
+    Get a percentile of some values, with the nearest-rank method.
+
+    Args:
+        values (Sequence[float]): The values, in any order.
+        q (float): The percentile, between 0 and 100.
+
+    Returns:
+        Union[float, None]: The percentile, or None without values.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(int(round(q / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(latencies: Sequence[float]) -> Dict[str, Union[float, None]]:
+    """
+    Summarize latencies, in milliseconds.
+
+    Args:
+        latencies (Sequence[float]): The latencies, in seconds.
+
+    Returns:
+        Dict[str, Union[float, None]]: p50, p90, p99 and max, in milliseconds.
+    """
+    summary: Dict[str, Union[float, None]] = {}
+    for name, q in (("p50_ms", 50.0), ("p90_ms", 90.0), ("p99_ms", 99.0), ("max_ms", 100.0)):
+        value = percentile(latencies, q)
+        summary[name] = None if value is None else round(value * 1000, 4)
+    return summary
+
+
+def throughput(
+    name: str, params: Dict[str, Any], tasks: int, seconds: float, latencies: Sequence[float]
+) -> Result:
+    """
+    Build the result of a throughput benchmark.
+
+    Args:
+        name (str): The name of the benchmark.
+        params (Dict[str, Any]): Its parameters.
+        tasks (int): The number of tasks.
+        seconds (float): How long they took.
+        latencies (Sequence[float]): The latency of every task, in seconds.
+
+    Returns:
+        Result: The result.
+    """
+    return {
+        "name": name,
+        "params": params,
+        "tasks": tasks,
+        "seconds": round(seconds, 6),
+        "tasks_per_sec": round(tasks / seconds, 2) if seconds > 0 else None,
+        "latency": summarize(latencies),
+    }
+
+
+class Countdown:
+    """Waits until a number of tasks are done, recording their latencies"""
+
+    _cond: Condition
+    _remaining: int
+    latencies: List[float]
+
+    def __init__(self, tasks: int) -> None:
+        """
+        Initializes a new instance of the Countdown class.
+
+        Args:
+            tasks (int): The number of tasks to wait for.
+
+        Returns:
+            None
+        """
+        self._cond = Condition()
+        self._remaining = tasks
+        self.latencies = []
+
+    def done(self, started: float) -> None:
+        """
+        Record a finished task.
+
+        Args:
+            started (float): When the task was submitted, from `perf_counter`.
+
+        Returns:
+            None
+        """
+        latency = perf_counter() - started
+        with self._cond:
+            self.latencies.append(latency)
+            self._remaining -= 1
+            if self._remaining <= 0:
+                self._cond.notify_all()
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Wait for all the tasks.
+
+        Args:
+            timeout (float): The maximum time to wait, in seconds.
+
+        Returns:
+            bool: True if all the tasks are done.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self._remaining <= 0, timeout)
@@ -1,20 +1,104 @@
 """.. include:: ../README.md"""
 
-from .models import Connection, Empty, ResultModel, Value
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, Dict, List
+from .models import (
+    Connection,
+    Empty,
+    FunctionMetrics,
+    HistogramStats,
+    JobStats,
+    ResultModel,
+    StoreStats,
+    Value,
+)
+from .codecs import Codec, JsonCodec, MsgpackCodec, PickleCodec, register_codec
 from .coleridge import Coleridge
 from .decorator import ColeridgeDecorator
 from .decorated import DecoratedBackgroundFunction
-from .rabbit import RabbitBackgroundFunction
-from .cronfun import CronDecorator
+from .executor import WorkerPool, QueueFullError
+from .process import ProcessBackgroundFunction
+from .pipeline import Pipeline
+from .errors import RemoteExecutionError
+from .dispatch import CompletionDispatcher
+from .metrics import MetricsRecorder
+from .store import ResultStore, MemoryResultStore
+from .result import ExecutionResult, as_completed
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .rabbit import RabbitBackgroundFunction
+    from .pool import ConnectionPool
+    from .memory import MemoryBroker
+    from .cronfun import CronDecorator
+    from .scheduler import CronJob, CronScheduler
+    from .metrics import MetricsServer, render_prometheus
+    from .sqlite import SQLiteResultStore
+
+# The transports, the scheduler and the optional extras pull in pika, yaml, croniter and
+# sqlite3: they are only imported when one of their names is used, so background-only
+# users start faster.
+_LAZY: Dict[str, str] = {
+    "RabbitBackgroundFunction": "rabbit",
+    "ConnectionPool": "pool",
+    "MemoryBroker": "memory",
+    "CronDecorator": "cronfun",
+    "CronJob": "scheduler",
+    "CronScheduler": "scheduler",
+    "MetricsServer": "metrics",
+    "render_prometheus": "metrics",
+    "SQLiteResultStore": "sqlite",
+}
+
+
+def __getattr__(name: str) -> Any:
+    """Import the lazy names on first use."""
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{_LAZY[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    """List the lazy names too."""
+    return sorted(set(globals()) | set(_LAZY))
+
 
 __all__ = (
     "Coleridge",
     "ColeridgeDecorator",
     "DecoratedBackgroundFunction",
+    "ProcessBackgroundFunction",
     "RabbitBackgroundFunction",
+    "Pipeline",
     "Connection",
     "Empty",
     "ResultModel",
+    "StoreStats",
+    "JobStats",
+    "FunctionMetrics",
+    "HistogramStats",
     "Value",
     "CronDecorator",
+    "CronJob",
+    "CronScheduler",
+    "WorkerPool",
+    "QueueFullError",
+    "ExecutionResult",
+    "as_completed",
+    "Codec",
+    "JsonCodec",
+    "MsgpackCodec",
+    "PickleCodec",
+    "register_codec",
+    "ConnectionPool",
+    "MemoryBroker",
+    "RemoteExecutionError",
+    "CompletionDispatcher",
+    "MetricsRecorder",
+    "MetricsServer",
+    "render_prometheus",
+    "ResultStore",
+    "MemoryResultStore",
+    "SQLiteResultStore",
 )
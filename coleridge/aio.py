@@ -0,0 +1,84 @@
+"""Asyncio utils"""
+
+from asyncio import AbstractEventLoop, new_event_loop, run_coroutine_threadsafe
+from inspect import isasyncgen, isawaitable, isgenerator
+from threading import Lock, Thread
+from typing import Any, Callable, Union
+from .streaming import gather_items
+
+
+class EventLoopThread:
+    """An event loop running forever in a daemon thread.
+
+    The thread is started the first time the loop is requested.
+    """
+
+    _loop: Union[AbstractEventLoop, None]
+    _lock: Lock
+    _name: str
+
+    def __init__(self, name: str = "coleridge-loop") -> None:
+        """
+        Initializes a new instance of the EventLoopThread class.
+
+        Args:
+            name (str, optional): The name of the thread. Defaults to "coleridge-loop".
+
+        Returns:
+            None
+        """
+        self._loop = None
+        self._lock = Lock()
+        self._name = name
+
+    @property
+    def loop(self) -> AbstractEventLoop:
+        """The event loop, started if it was not running yet"""
+        with self._lock:
+            if self._loop is None:
+                loop = new_event_loop()
+                Thread(target=loop.run_forever, name=self._name, daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+
+_default_loop = EventLoopThread()
+
+
+def get_event_loop() -> AbstractEventLoop:
+    """Get the shared event loop running the async decorated functions."""
+    return _default_loop.loop
+
+
+def call_blocking(
+    func: Callable[[Any], Any],
+    value: Any,
+    loop: Union[AbstractEventLoop, None] = None,
+) -> Any:
+    """
+    Call a function that might be async from synchronous code. The items of \
+    generator functions (sync or async) are collected into a list.
+
+    Args:
+        func (Callable[[Any], Any]): The function, either sync or async.
+        value (Any): The argument of the function.
+        loop (Union[AbstractEventLoop, None], optional): The event loop running the \
+            coroutine. Defaults to None, which uses the shared event loop.
+
+    Returns:
+        Any: The return value of the function, awaited if needed.
+    """
+    output = func(value)
+    if isasyncgen(output):
+        output = gather_items(output)
+    if isgenerator(output):
+        return list(output)
+    if isawaitable(output):
+        return run_coroutine_threadsafe(
+            output,  # type: ignore[arg-type]
+            loop if loop is not None else get_event_loop(),
+        ).result()
+    return output
+
+
+__all__ = ("EventLoopThread", "get_event_loop", "call_blocking")
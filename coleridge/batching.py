@@ -0,0 +1,152 @@
+"""Batching of single submissions, by size and by time"""
+
+from logging import getLogger
+from threading import Condition, Thread
+from time import monotonic
+from typing import Callable, Generic, List, Tuple, TypeVar, Union
+
+T = TypeVar("T")
+
+logger = getLogger(__name__)
+
+
+class Batcher(Generic[T]):
+    """Collects items and hands them over in batches, when `batch_size` items are \
+    waiting or the oldest one has waited `linger` seconds.
+
+    The batches are handed over by a dedicated thread, started with the first item, \
+    so `add` never waits for a batch to be handled. It batches the inputs of the \
+    background functions, and the messages of the rabbit publishers. A batch whose \
+    handler raises is logged and dropped, and the next ones are still handled.
+    """
+
+    _handle: Callable[[List[T]], None]
+    _batch_size: int
+    _linger: float
+    _name: str
+    _buffer: List[Tuple[float, T]]
+    _pending: Condition
+    _flusher: Union[Thread, None]
+    _closed: bool
+
+    def __init__(
+        self,
+        handle: Callable[[List[T]], None],
+        batch_size: int,
+        linger: float = 0.0,
+        name: str = "coleridge-batcher",
+    ) -> None:
+        """
+        Initializes a new instance of the Batcher class.
+
+        Args:
+            handle (Callable[[List[T]], None]): Called with every batch, by the thread \
+                of the batcher. It should not raise: the errors are only logged.
+            batch_size (int): The maximum number of items in a batch.
+            linger (float, optional): The maximum time in seconds an item waits for its \
+                batch to fill up. Defaults to 0, which hands over whatever is waiting \
+                as soon as the thread is free.
+            name (str, optional): The name of the thread. Defaults to "coleridge-batcher".
+
+        Returns:
+            None
+        """
+        self._handle = handle
+        self._batch_size = max(batch_size, 1)
+        self._linger = max(linger, 0.0)
+        self._name = name
+        self._buffer = []
+        self._pending = Condition()
+        self._flusher = None
+        self._closed = False
+
+    @property
+    def batch_size(self) -> int:
+        """The maximum number of items in a batch"""
+        return self._batch_size
+
+    @property
+    def linger(self) -> float:
+        """The maximum time in seconds an item waits for its batch to fill up"""
+        return self._linger
+
+    def add(self, item: T) -> None:
+        """
+        Add an item to the next batch.
+
+        Args:
+            item (T): The item.
+
+        Raises:
+            RuntimeError: If the batcher is closed.
+
+        Returns:
+            None
+        """
+        with self._pending:
+            if self._closed:
+                raise RuntimeError("The batcher is closed")
+            first = not self._buffer
+            self._buffer.append((monotonic(), item))
+            if self._flusher is None:
+                self._flusher = Thread(target=self._flush_loop, name=self._name, daemon=True)
+                self._flusher.start()
+            if first or len(self._buffer) >= self._batch_size:
+                self._pending.notify()
+
+    def _lingered(self) -> float:
+        """How long the oldest waiting item has waited. Must be called with the lock held."""
+        return monotonic() - self._buffer[0][0]
+
+    def _flush_loop(self) -> None:
+        """Hand the batches over when they are full or have lingered enough."""
+        while True:
+            with self._pending:
+                while not self._closed and (
+                    not self._buffer
+                    or (len(self._buffer) < self._batch_size and self._lingered() < self._linger)
+                ):
+                    if self._buffer:
+                        self._pending.wait(self._linger - self._lingered())
+                    else:
+                        self._pending.wait()
+                if self._closed and not self._buffer:
+                    return
+                batch = [item for _, item in self._buffer[: self._batch_size]]
+                self._buffer = self._buffer[self._batch_size :]
+            self._hand_over(batch)
+
+    def _hand_over(self, batch: List[T]) -> None:
+        """Call the handler with a batch, logging its errors."""
+        try:
+            self._handle(batch)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception(f"{self._name} failed to handle a batch of {len(batch)} items")
+
+    def flush(self) -> None:
+        """
+        Hand the waiting items over right away, in batches of at most `batch_size`.
+
+        Returns:
+            None
+        """
+        with self._pending:
+            waiting = [item for _, item in self._buffer]
+            self._buffer = []
+        for start in range(0, len(waiting), self._batch_size):
+            self._hand_over(waiting[start : start + self._batch_size])
+
+    def close(self) -> None:
+        """
+        Hand the waiting items over and stop the thread.
+
+        Returns:
+            None
+        """
+        with self._pending:
+            self._closed = True
+            self._pending.notify_all()
+        self.flush()
+
+
+__all__ = ("Batcher",)
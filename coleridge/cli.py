@@ -0,0 +1,145 @@
+"""Command line interface
+
+```
+coleridge worker package.module:func [package.module:other ...] --concurrency 8
+```
+
+A target can be a rabbit function, a `Coleridge` object (all its rabbit functions are \
+served) or a whole module (all the rabbit functions and `Coleridge` objects in it).
+"""
+
+from argparse import ArgumentParser, Namespace
+from importlib import import_module
+from logging import basicConfig
+from os import getcwd
+from sys import path as sys_path
+from types import ModuleType
+from typing import Any, List, Sequence, Union
+from .coleridge import Coleridge
+from .metrics import MetricsServer
+from .rabbit import RabbitBackgroundFunction
+from .worker import serve
+
+
+def _functions_of(obj: Any) -> List[RabbitBackgroundFunction[Any, Any]]:
+    """Get the rabbit functions of an object."""
+    if isinstance(obj, RabbitBackgroundFunction):
+        return [obj]
+    if isinstance(obj, Coleridge):
+        return [func for func in obj.functions if isinstance(func, RabbitBackgroundFunction)]
+    if isinstance(obj, ModuleType):
+        found: List[RabbitBackgroundFunction[Any, Any]] = []
+        for value in vars(obj).values():
+            if isinstance(value, (RabbitBackgroundFunction, Coleridge)):
+                found.extend(_functions_of(value))
+        return found
+    raise TypeError(f"{obj!r} is not a rabbit function, a Coleridge object or a module")
+
+
+def load_target(target: str) -> List[RabbitBackgroundFunction[Any, Any]]:
+    """
+    Import the rabbit functions of a target.
+
+    Args:
+        target (str): `package.module:attribute` or `package.module`.
+
+    Raises:
+        ValueError: If the target has no rabbit functions.
+
+    Returns:
+        List[RabbitBackgroundFunction]: The rabbit functions.
+    """
+    module_name, _, attribute = target.partition(":")
+    obj: Any = import_module(module_name)
+    for name in attribute.split(".") if attribute else []:
+        obj = getattr(obj, name)
+    functions = _functions_of(obj)
+    if not functions:
+        raise ValueError(f"{target} has no rabbit functions")
+    return functions
+
+
+def _parser() -> ArgumentParser:
+    """Build the argument parser."""
+    parser = ArgumentParser(prog="coleridge", description="Coleridge background tasks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    worker = commands.add_parser("worker", help="Consume the queues of rabbit functions")
+    worker.add_argument(
+        "targets",
+        nargs="+",
+        metavar="TARGET",
+        help="package.module:func, package.module:coleridge_object or package.module",
+    )
+    worker.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=None,
+        help="Messages handled at the same time by each function",
+    )
+    worker.add_argument(
+        "--prefetch",
+        type=int,
+        default=None,
+        help="Unacknowledged messages per function (default: twice the concurrency)",
+    )
+    worker.add_argument(
+        "--drain-timeout",
+        type=float,
+        default=30,
+        help="Seconds to wait for the running messages when stopping",
+    )
+    worker.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve the metrics in the Prometheus text format on this port",
+    )
+    worker.add_argument(
+        "--metrics-host", default="127.0.0.1", help="The address of the metrics endpoint"
+    )
+    worker.add_argument("--log-level", default="INFO", help="The logging level")
+    return parser
+
+
+def _worker(args: Namespace) -> int:
+    """Run the worker command."""
+    basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(message)s")
+    if getcwd() not in sys_path:
+        sys_path.insert(0, getcwd())
+    functions: List[RabbitBackgroundFunction[Any, Any]] = []
+    for target in args.targets:
+        functions.extend(load_target(target))
+    if args.metrics_port is not None:
+        MetricsServer(
+            lambda: [func.metrics.snapshot() for func in functions],
+            args.metrics_port,
+            args.metrics_host,
+        )
+    serve(
+        functions,
+        concurrency=args.concurrency,
+        prefetch_count=args.prefetch,
+        drain_timeout=args.drain_timeout,
+    )
+    return 0
+
+
+def main(argv: Union[Sequence[str], None] = None) -> int:
+    """
+    Entry point of the `coleridge` command.
+
+    Args:
+        argv (Union[Sequence[str], None], optional): The arguments. Defaults to None, \
+            which uses the ones of the process.
+
+    Returns:
+        int: The exit code.
+    """
+    args = _parser().parse_args(argv)
+    if args.command == "worker":
+        return _worker(args)
+    return 1
+
+
+__all__ = ("main", "load_target")
@@ -0,0 +1,205 @@
+"""Wire codecs for the messages sent to the broker"""
+
+from abc import ABC, abstractmethod
+from pickle import dumps, loads  # nosec B403
+from typing import Any, Dict, List, Sequence, Type, Union
+from pydantic import BaseModel, TypeAdapter
+
+_ADAPTERS: Dict[Type[BaseModel], TypeAdapter[Any]] = {}
+_ANY: TypeAdapter[Any] = TypeAdapter(Any)
+
+
+def get_adapter(model: Type[BaseModel]) -> TypeAdapter[Any]:
+    """
+    Get a (cached) adapter validating and serializing a model, a list of models or None.
+
+    Args:
+        model (Type[BaseModel]): The model.
+
+    Returns:
+        TypeAdapter[Any]: The adapter for `Union[List[model], model, None]`.
+    """
+    if model not in _ADAPTERS:
+        _ADAPTERS[model] = TypeAdapter(
+            Union[List[model], model, None]  # type: ignore[valid-type,arg-type]
+        )
+    return _ADAPTERS[model]
+
+
+class Codec(ABC):
+    """Base class of the wire codecs.
+
+    A codec turns a model (or a list of models) into the body of a message and back, \
+    and is announced to the consumer through the `content_type` of the message.
+    """
+
+    name: str = ""
+    content_type: str = ""
+
+    @abstractmethod
+    def encode(self, value: Union[BaseModel, Sequence[BaseModel], str, None]) -> bytes:
+        """
+        Encode a value into the body of a message.
+
+        Args:
+            value (Union[BaseModel, Sequence[BaseModel], str, None]): The value. Strings \
+                are expected to be JSON already.
+
+        Returns:
+            bytes: The body of the message.
+        """
+
+    @abstractmethod
+    def decode(self, body: bytes, model: Type[BaseModel]) -> Any:
+        """
+        Decode the body of a message straight into a model or a list of models.
+
+        Args:
+            body (bytes): The body of the message.
+            model (Type[BaseModel]): The model to decode into.
+
+        Returns:
+            Any: The model, the list of models or None.
+        """
+
+
+class JsonCodec(Codec):
+    """JSON codec, using pydantic to serialize and validate"""
+
+    name = "json"
+    content_type = "application/json"
+
+    def encode(self, value: Union[BaseModel, Sequence[BaseModel], str, None]) -> bytes:
+        """Encode a value as JSON."""
+        if isinstance(value, str):
+            return value.encode("utf-8")
+        if isinstance(value, BaseModel):
+            return value.model_dump_json().encode("utf-8")
+        if isinstance(value, list) and value:
+            return get_adapter(type(value[0])).dump_json(value)
+        return _ANY.dump_json(value)
+
+    def decode(self, body: bytes, model: Type[BaseModel]) -> Any:
+        """Validate a JSON body in a single pass."""
+        return get_adapter(model).validate_json(body)
+
+
+class MsgpackCodec(Codec):
+    """MessagePack codec, more compact than JSON. Requires the `msgpack` package."""
+
+    name = "msgpack"
+    content_type = "application/msgpack"
+
+    def __init__(self) -> None:
+        """
+        Initializes a new instance of the MsgpackCodec class.
+
+        Raises:
+            ImportError: If msgpack is not installed.
+
+        Returns:
+            None
+        """
+        try:
+            import msgpack  # pylint: disable=import-outside-toplevel
+        except ImportError as ex:
+            raise ImportError(
+                "The msgpack codec requires msgpack, install it with `pip install msgpack`"
+            ) from ex
+        self._msgpack = msgpack
+
+    def encode(self, value: Union[BaseModel, Sequence[BaseModel], str, None]) -> bytes:
+        """Encode a value as MessagePack."""
+        if isinstance(value, str):
+            return bytes(self._msgpack.packb(_ANY.validate_json(value)))
+        if isinstance(value, BaseModel):
+            return bytes(self._msgpack.packb(value.model_dump(mode="json")))
+        if isinstance(value, list) and value:
+            return bytes(
+                self._msgpack.packb(get_adapter(type(value[0])).dump_python(value, mode="json"))
+            )
+        return bytes(self._msgpack.packb(_ANY.dump_python(value, mode="json")))
+
+    def decode(self, body: bytes, model: Type[BaseModel]) -> Any:
+        """Validate a MessagePack body."""
+        return get_adapter(model).validate_python(self._msgpack.unpackb(body))
+
+
+class PickleCodec(Codec):
+    """Legacy pickle codec. Only use it with a broker you trust."""
+
+    name = "pickle"
+    content_type = "application/x-python-pickle"
+
+    def encode(self, value: Union[BaseModel, Sequence[BaseModel], str, None]) -> bytes:
+        """Pickle a value."""
+        return dumps(value)
+
+    def decode(self, body: bytes, model: Type[BaseModel]) -> Any:
+        """Unpickle a body, validating what is not a model yet."""
+        value = loads(body)  # nosec B301
+        if isinstance(value, (str, bytes)):
+            return get_adapter(model).validate_json(value)
+        if isinstance(value, (dict, list)):
+            return get_adapter(model).validate_python(value)
+        return value
+
+
+_CODECS: Dict[str, Type[Codec]] = {
+    JsonCodec.name: JsonCodec,
+    MsgpackCodec.name: MsgpackCodec,
+    PickleCodec.name: PickleCodec,
+}
+_INSTANCES: Dict[str, Codec] = {}
+
+
+def get_codec(codec: Union[str, Codec]) -> Codec:
+    """
+    Get a codec by name ("json", "msgpack" or "pickle") or content type.
+
+    Args:
+        codec (Union[str, Codec]): The name or the content type of the codec, or \
+            the codec itself.
+
+    Raises:
+        ValueError: If there is no such codec.
+
+    Returns:
+        Codec: The codec.
+    """
+    if isinstance(codec, Codec):
+        return codec
+    if codec not in _INSTANCES:
+        for cls in _CODECS.values():
+            if codec in (cls.name, cls.content_type):
+                _INSTANCES[codec] = cls()
+                break
+        else:
+            raise ValueError(f"Unknown codec {codec}")
+    return _INSTANCES[codec]
+
+
+def register_codec(codec: Type[Codec]) -> None:
+    """
+    Register a custom codec, so it can be used by name and decoded by content type.
+
+    Args:
+        codec (Type[Codec]): The codec class.
+
+    Returns:
+        None
+    """
+    _CODECS[codec.name] = codec
+    _INSTANCES.pop(codec.name, None)
+    _INSTANCES.pop(codec.content_type, None)
+
+
+__all__ = (
+    "Codec",
+    "JsonCodec",
+    "MsgpackCodec",
+    "PickleCodec",
+    "get_adapter",
+    "get_codec",
+    "register_codec",
+)
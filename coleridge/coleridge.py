@@ -1,13 +1,28 @@
 """The Coleridge class"""
 
+from asyncio import AbstractEventLoop
+from concurrent.futures import ProcessPoolExecutor
+from inspect import isfunction
 from pathlib import Path
-from typing import Literal, Callable, Union, List, cast
+from threading import Event
+from typing import TYPE_CHECKING, Any, Awaitable, Dict, Literal, Callable, Union, List, cast
+from .codecs import Codec
 from .decorator import ColeridgeDecorator, T, U
 from .decorated import DecoratedBackgroundFunction
+from .executor import WorkerPool, Backpressure
 from .models.connection import Connection
-from .rabbit import RabbitBackgroundFunction
+from .models.response import ResultModel
+from .models.stats import FunctionMetrics
+from .dispatch import CompletionDispatcher
+from .metrics import MetricsServer
+from .pipeline import Pipeline, Stage
+from .store import MemoryResultStore, ResultStore
 from .get_types import get_params_type
 
+if TYPE_CHECKING:  # pragma: no cover
+    from .pool import ConnectionPool
+    from .rabbit import RabbitBackgroundFunction
+
 
 class Coleridge:
     """The Coleridge class is a decorator that allows you to easily \
@@ -17,13 +32,49 @@ class Coleridge:
 
     _connection_settings: Union[Connection, None, str, Path]
     _queue: Union[str, None]
-    _mode: Literal["rabbit", "background"]
+    _mode: Literal["rabbit", "background", "process", "memory"]
+    _executor: Union[WorkerPool, None]
+    _process_pool: Union[ProcessPoolExecutor, None]
+    _event_loop: Union[AbstractEventLoop, None]
+    _codec: Union[str, Codec]
+    _connection_pool: "Union[ConnectionPool, None]"
+    _publish_batch_size: int
+    _publish_linger_ms: float
+    _publisher_confirms: bool
+    _concurrency: int
+    _prefetch_count: Union[int, None]
+    _consume: bool
+    _result_store: ResultStore
+    _dispatcher: Union[CompletionDispatcher, None]
+    _batch_size: int
+    _batch_linger_ms: float
+    _max_priority: Union[int, None]
+    _functions: (
+        "List[Union[DecoratedBackgroundFunction[Any, Any], RabbitBackgroundFunction[Any, Any]]]"
+    )
 
-    def __init__(
+    def __init__(  # noqa: PLR0913
         self,
         connection_settings: Union[Connection, None, str, Path] = None,
         queue: Union[str, None] = None,
-        mode: Literal["rabbit", "background"] = "background",
+        mode: Literal["rabbit", "background", "process", "memory"] = "background",
+        max_workers: Union[int, None] = None,
+        max_queue: int = 0,
+        backpressure: Backpressure = "block",
+        event_loop: Union[AbstractEventLoop, None] = None,
+        codec: Union[str, Codec] = "json",
+        connection_pool: "Union[ConnectionPool, None]" = None,
+        publish_batch_size: int = 1,
+        publish_linger_ms: float = 0,
+        publisher_confirms: bool = False,
+        concurrency: int = 1,
+        prefetch_count: Union[int, None] = None,
+        consume: bool = True,
+        result_store: Union[ResultStore, None] = None,
+        dispatcher: Union[CompletionDispatcher, None] = None,
+        batch_size: int = 1,
+        batch_linger_ms: float = 0,
+        max_priority: Union[int, None] = None,
     ) -> None:
         """
         Initializes a Coleridge object.
@@ -32,8 +83,58 @@ class Coleridge:
             connection_settings (Union[Connection, None, str, Path]): The connection \
                 settings for the Coleridge object. Defaults to None.
             queue (Union[str, None]): The queue for the Coleridge object. Defaults to None.
-            mode (Literal["rabbit", "background"]): The mode for the Coleridge object. \
-              Defaults to "background".
+            mode (Literal["rabbit", "background", "process", "memory"]): The mode for the \
+              Coleridge object. "memory" works like "rabbit", with an in-process broker \
+              instead of RabbitMQ. Defaults to "background".
+            max_workers (Union[int, None]): The maximum number of worker threads (or \
+                processes in "process" mode) shared by the decorated functions. Defaults \
+                to None, which starts a new thread for every task, or as many processes \
+                as CPUs.
+            max_queue (int): The maximum number of tasks waiting for a worker. \
+                Defaults to 0, which means unbounded. Ignored without `max_workers`.
+            backpressure (Literal["block", "reject", "drop_oldest"]): What to do when \
+                the queue is full. Defaults to "block". Ignored without `max_workers`.
+            event_loop (Union[AbstractEventLoop, None]): The event loop running the \
+                async functions in "background" mode. Defaults to None, which uses a \
+                shared event loop running in its own thread.
+            codec (Union[str, Codec]): The codec of the messages in "rabbit" mode: \
+                "json", "msgpack" or "pickle". Defaults to "json".
+            connection_pool (Union[ConnectionPool, None]): The pool the rabbit functions \
+                take their channels from. Defaults to None, which uses the process-wide pool \
+                (of the process-wide memory broker in "memory" mode), use \
+                `MemoryBroker().connection_pool()` for an isolated broker.
+            publish_batch_size (int): The number of messages published together in \
+                "rabbit" mode. Defaults to 1, which publishes every message right away.
+            publish_linger_ms (float): The maximum time in milliseconds a message waits \
+                for its batch to fill up in "rabbit" mode. Defaults to 0.
+            publisher_confirms (bool): Whether to wait for the broker to confirm every \
+                message in "rabbit" mode, failing the tasks whose message is unroutable. \
+                It costs a round trip to the broker per message. Defaults to False.
+            concurrency (int): The number of messages each rabbit function \
+                handles at the same time. Defaults to 1.
+            prefetch_count (Union[int, None]): The maximum number of messages \
+                delivered to a rabbit function but not acknowledged yet. Defaults to \
+                None, which is twice the concurrency.
+            consume (bool): Whether the rabbit functions also consume their \
+                queue when `run` is called. Set it to False in producers whose tasks are \
+                handled by workers. Defaults to True.
+            result_store (Union[ResultStore, None]): The store keeping the results of \
+                the tasks of all the decorated functions. Defaults to None, which creates \
+                a `MemoryResultStore`.
+            dispatcher (Union[CompletionDispatcher, None]): The dispatcher running the \
+                `on_finish`, `on_finish_signal` and `on_error` callbacks, for example \
+                `CompletionDispatcher(max_workers=4)` or `CompletionDispatcher(inline=True)`. \
+                Defaults to None, which uses the process-wide one.
+            batch_size (int): The maximum number of single inputs passed together, as a \
+                list, to the functions in "background" or "process" mode, which must return \
+                a list of outputs in the same order. Defaults to 1, which calls them once \
+                per input.
+            batch_linger_ms (float): The maximum time in milliseconds an input waits for \
+                its batch to fill up. Defaults to 0.
+            max_priority (Union[int, None]): The highest message priority of the queues \
+                in "rabbit" or "memory" mode, declared with `x-max-priority`. Existing \
+                queues must have been declared with the same value. Defaults to None, \
+                which declares queues without priorities.
 
         Returns:
             None
@@ -41,16 +142,180 @@ class Coleridge:
         self._connection_settings = connection_settings
         self._queue = queue
         self._mode = mode
+        self._event_loop = event_loop
+        self._codec = codec
+        self._connection_pool = connection_pool
+        self._publish_batch_size = publish_batch_size
+        self._publish_linger_ms = publish_linger_ms
+        self._publisher_confirms = publisher_confirms
+        self._concurrency = concurrency
+        self._prefetch_count = prefetch_count
+        self._consume = consume
+        self._result_store = result_store if result_store is not None else MemoryResultStore()
+        self._dispatcher = dispatcher
+        self._batch_size = batch_size
+        self._batch_linger_ms = batch_linger_ms
+        self._max_priority = max_priority
+        self._functions = []
+        self._executor = None
+        self._process_pool = None
+        if max_workers is not None and mode == "background":
+            self._executor = WorkerPool(max_workers, max_queue, backpressure)
+        if mode == "process":
+            self._process_pool = ProcessPoolExecutor(max_workers=max_workers)
+
+    @property
+    def executor(self) -> Union[WorkerPool, None]:
+        """The worker pool shared by the background functions, if any"""
+        return self._executor
+
+    @property
+    def connection_pool(self) -> "ConnectionPool":
+        """The pool the rabbit functions take their channels from"""
+        # pylint: disable=import-outside-toplevel
+        if self._connection_pool is None and self._mode == "memory":
+            from .memory import get_memory_pool
+
+            self._connection_pool = get_memory_pool()
+        elif self._connection_pool is None:
+            from .pool import get_connection_pool
+
+            self._connection_pool = get_connection_pool()
+        return self._connection_pool
+
+    @property
+    def result_store(self) -> ResultStore:
+        """The store keeping the results of the decorated functions"""
+        return self._result_store
+
+    def get_result(self, uuid: str) -> Union[ResultModel[Any], None]:
+        """
+        Look up the result of a task by its uuid. With a persistent result store, \
+        this also finds the results of other processes and of previous runs.
+
+        Args:
+            uuid (str): The uuid of the task.
+
+        Returns:
+            Union[ResultModel[Any], None]: The result, or None if it is not stored.
+        """
+        return self._result_store.get(uuid)
+
+    def metrics(self) -> Dict[str, FunctionMetrics]:
+        """
+        Take a snapshot of the metrics of the decorated functions.
+
+        Returns:
+            Dict[str, FunctionMetrics]: The metrics, by function name (`module.qualname`).
+        """
+        return {func.metrics.name: func.metrics.snapshot() for func in self._functions}
+
+    def serve_metrics(self, port: int = 9464, host: str = "127.0.0.1") -> MetricsServer:
+        """
+        Serve the metrics of the decorated functions over HTTP, in the Prometheus text \
+        format, at `/metrics`.
+
+        Args:
+            port (int): The port. Defaults to 9464, 0 picks a free one.
+            host (str): The address to listen on. Defaults to "127.0.0.1".
+
+        Returns:
+            MetricsServer: The server, to close it.
+        """
+        return MetricsServer(lambda: self.metrics().values(), port, host)
+
+    @property
+    def process_pool(self) -> Union[ProcessPoolExecutor, None]:
+        """The process pool shared by the functions in "process" mode"""
+        return self._process_pool
+
+    @property
+    def functions(
+        self,
+    ) -> "List[Union[DecoratedBackgroundFunction[Any, Any], RabbitBackgroundFunction[Any, Any]]]":
+        """The functions decorated so far"""
+        return list(self._functions)
+
+    def serve(
+        self,
+        concurrency: Union[int, None] = None,
+        prefetch_count: Union[int, None] = None,
+        stop: Union[Event, None] = None,
+    ) -> None:
+        """
+        Consume the queues of all the decorated functions until stopped, for example \
+        by SIGINT or SIGTERM. This lets a worker process run the tasks published by \
+        other processes.
+
+        Args:
+            concurrency (Union[int, None]): The number of messages each function \
+                handles at the same time. Defaults to None, which keeps the configured one.
+            prefetch_count (Union[int, None]): The maximum number of unacknowledged \
+                messages per function. Defaults to None, which keeps the configured one.
+            stop (Union[Event, None]): An event stopping the worker when set. \
+                Defaults to None.
+
+        Raises:
+            RuntimeError: If the mode is not "rabbit" or "memory".
+
+        Returns:
+            None
+        """
+        if self._mode not in ("rabbit", "memory"):
+            raise RuntimeError("Only the functions in 'rabbit' or 'memory' mode can be served")
+        # pylint: disable=import-outside-toplevel
+        from .rabbit import RabbitBackgroundFunction
+        from .worker import serve
+
+        serve(
+            [func for func in self._functions if isinstance(func, RabbitBackgroundFunction)],
+            concurrency=concurrency,
+            prefetch_count=prefetch_count,
+            stop=stop,
+        )
+
+    def chain(
+        self,
+        *stages: Union[
+            DecoratedBackgroundFunction[Any, Any],
+            "RabbitBackgroundFunction[Any, Any]",
+            Pipeline[Any, Any],
+            Callable[[Any], Any],
+        ],
+    ) -> Pipeline[Any, Any]:
+        """
+        Chain functions into a pipeline, the output of each one being the input of the \
+        next one: `coleridge.chain(parse, enrich, store)` is `parse | enrich | store`.
+
+        Args:
+            stages: The decorated functions or pipelines, in order. Plain functions are \
+                decorated with this object first.
+
+        Raises:
+            ValueError: If there are no stages.
+            TypeError: If the output type of a stage is not the input type of the next one.
+
+        Returns:
+            Pipeline[Any, Any]: The pipeline, sharing the result store and the dispatcher \
+                of this object.
+        """
+        decorated = [
+            self(stage) if isfunction(stage) else cast("Union[Stage, Pipeline[Any, Any]]", stage)
+            for stage in stages
+        ]
+        return Pipeline(*decorated, result_store=self._result_store, dispatcher=self._dispatcher)
 
-    def magic_decorator(
+    def magic_decorator(  # noqa: PLR0913
         self,
         queue: Union[str, None] = None,
         on_finish: Union[Callable[[Union[U, List[U]]], None], None] = None,
         on_error: Union[Callable[[Exception], None], None] = None,
         on_finish_signal: Union[Callable[[], None], None] = None,
+        codec: Union[str, Codec, None] = None,
+        on_item: Union[Callable[[U], None], None] = None,
     ) -> Callable[
-        [Callable[[Union[T, List[T]]], Union[U, List[U]]]],
-        Union[DecoratedBackgroundFunction[T, U], RabbitBackgroundFunction[T, U]],
+        [Callable[[Union[T, List[T]]], Union[U, List[U], Awaitable[Union[U, List[U]]]]]],
+        "Union[DecoratedBackgroundFunction[T, U], RabbitBackgroundFunction[T, U]]",
     ]:
         """
         A decorator function that creates a ColeridgeDecorator instance and \
@@ -64,6 +329,11 @@ class Coleridge:
             executed when the decorated function encounters an error.
         on_finish_signal (Union[Callable[[], None], None]): The callback function to be \
         executed when the decorated function finishes with a signal.
+        codec (Union[str, Codec, None]): The codec of the messages in "rabbit" mode, \
+        if different from the one of the Coleridge object.
+        on_item (Union[Callable[[U], None], None]): The function called with every \
+        item of a generator function in "background" mode, instead of streaming them \
+        to the result.
         
         Returns:
         Callable[[Callable[[Union[T, List[T]]], Union[U, List[U]]]], \
@@ -73,20 +343,22 @@ class Coleridge:
         """
 
         def _inner(
-            func: Callable[[Union[T, List[T]]], Union[U, List[U]]]
-        ) -> Union[DecoratedBackgroundFunction[T, U], RabbitBackgroundFunction[T, U]]:
+            func: Callable[[Union[T, List[T]]], Union[U, List[U], Awaitable[Union[U, List[U]]]]]
+        ) -> "Union[DecoratedBackgroundFunction[T, U], RabbitBackgroundFunction[T, U]]":
             """
             Inner function of the magic decorator, responsible for creating a \
                 ColeridgeDecorator instance.
             
             Parameters:
-            func (Callable[[Union[T, List[T]]], Union[U, List[U]]]): The function to be decorated.
+            func (Callable[[Union[T, List[T]]], Union[U, List[U]]]): The function to be \
+                decorated, either sync or async.
             
             Returns:
             Union[DecoratedBackgroundFunction[T, U], RabbitBackgroundFunction[T, U]]: The \
             decorated function.
             """
-            input_type, output_type = get_params_type(func)
+            _func = cast("Callable[[Union[T, List[T]]], Union[U, List[U]]]", func)
+            input_type, output_type = get_params_type(_func)
             dec = ColeridgeDecorator(
                 input_type,
                 output_type,
@@ -96,27 +368,47 @@ class Coleridge:
                 on_finish=on_finish,
                 on_error=on_error,
                 on_finish_signal=on_finish_signal,
+                on_item=on_item,
+                executor=self._executor,
+                process_pool=self._process_pool,
+                event_loop=self._event_loop,
+                codec=self._codec if codec is None else codec,
+                connection_pool=self._connection_pool,
+                publish_batch_size=self._publish_batch_size,
+                publish_linger_ms=self._publish_linger_ms,
+                publisher_confirms=self._publisher_confirms,
+                concurrency=self._concurrency,
+                prefetch_count=self._prefetch_count,
+                consume=self._consume,
+                result_store=self._result_store,
+                dispatcher=self._dispatcher,
+                batch_size=self._batch_size,
+                batch_linger_ms=self._batch_linger_ms,
+                max_priority=self._max_priority,
             )
-            return dec(func)
+            decorated = dec(_func)
+            self._functions.append(decorated)
+            return decorated
 
         return _inner
 
     def __call__(
         self,
-        func: Callable[[Union[T, List[T]]], Union[U, List[U]]],
-    ) -> Union[DecoratedBackgroundFunction[T, U], RabbitBackgroundFunction[T, U]]:
+        func: Callable[[Union[T, List[T]]], Union[U, List[U], Awaitable[Union[U, List[U]]]]],
+    ) -> "Union[DecoratedBackgroundFunction[T, U], RabbitBackgroundFunction[T, U]]":
         """
         Calls the magic decorator function with the provided function as an argument.
 
         Parameters:
-        func (Callable[[Union[T, List[T]]], Union[U, List[U]]]): The function to be decorated.
+        func (Callable[[Union[T, List[T]]], Union[U, List[U]]]): The function to be \
+            decorated, either sync or async.
 
         Returns:
         Union[DecoratedBackgroundFunction[T, U], RabbitBackgroundFunction[T, U]]: \
             The decorated function.
         """
         return cast(
-            Union[DecoratedBackgroundFunction[T, U], RabbitBackgroundFunction[T, U]],
+            "Union[DecoratedBackgroundFunction[T, U], RabbitBackgroundFunction[T, U]]",
             self.magic_decorator()(
                 func,  # type: ignore[arg-type]
             ),
@@ -1,10 +1,10 @@
 """Cron background operations"""
 
-from typing import Callable
-from datetime import datetime
-from time import sleep
-from threading import Thread
-from croniter import croniter  # type: ignore[import-untyped]
+from typing import TypeVar, Union
+from pydantic import BaseModel
+from .scheduler import CronJob, CronScheduler, Misfire, Target, get_scheduler
+
+F = TypeVar("F", bound=Target)
 
 
 class CronDecorator:
@@ -17,45 +17,88 @@ class CronDecorator:
     def funk():
         print('Called')
     ```
+
+    All the jobs share a single scheduler thread, which sleeps until the next one is due \
+    and hands it over to a worker pool. A background (or rabbit) function can be \
+    decorated too, it is then `run` with `input_value`.
     """
 
     _expr: str
-    _cron: croniter
-
-    def __init__(self, expr: str) -> None:
+    _scheduler: CronScheduler
+    _job: Union[CronJob, None]
+    _max_instances: int
+    _misfire: Misfire
+    _misfire_grace_time: float
+    _input_value: Union[BaseModel, None]
+
+    def __init__(  # noqa: PLR0913
+        self,
+        expr: str,
+        scheduler: Union[CronScheduler, None] = None,
+        *,
+        max_instances: int = 1,
+        misfire: Misfire = "coalesce",
+        misfire_grace_time: float = 1.0,
+        input_value: Union[BaseModel, None] = None,
+    ) -> None:
         """Initializes a new instance of the CronDecorator class.
 
         Args:
             expr (str): The cron expression.
+            scheduler (Union[CronScheduler, None], optional): The scheduler running the \
+                job. Defaults to None, which uses the process-wide scheduler.
+            max_instances (int, optional): The maximum number of runs in flight, the \
+                other fire times are skipped. Defaults to 1.
+            misfire (Literal["coalesce", "skip", "run_all"], optional): What to do \
+                when the job is late. Defaults to "coalesce".
+            misfire_grace_time (float, optional): How late, in seconds, the job can \
+                still run with the "skip" policy. Defaults to 1.
+            input_value (Union[BaseModel, None], optional): The input of a background \
+                function. Defaults to None, which is `Empty()`.
 
         Returns:
             None
         """
         self._expr = expr
-        self._cron = croniter(str(self._expr), datetime.now(), datetime)
-
-    def __call__(self, func: Callable[[], None]) -> Callable[[], None]:
+        self._scheduler = scheduler if scheduler is not None else get_scheduler()
+        self._job = None
+        self._max_instances = max_instances
+        self._misfire = misfire
+        self._misfire_grace_time = misfire_grace_time
+        self._input_value = input_value
+
+    @property
+    def job(self) -> Union[CronJob, None]:
+        """The scheduled job, once a function is decorated"""
+        return self._job
+
+    def __call__(self, func: F) -> F:
         """Decorate a function to be executed according to a cron expression.
 
         Args:
-            func (Callable[[], None]): The function to be decorated.
+            func (F): The function to be decorated, plain or background.
 
         Returns:
-            Callable[[], None]: The decorated function.
+            F: The decorated function.
         """
-
-        def _inner(cron: croniter, func: Callable[[], None]) -> None:
-            _next: datetime = cron.get_next(datetime)
-            while True:
-                if _next > datetime.now():
-                    sleep(0.5)
-                    continue
-                func()
-                _next = cron.get_next()
-
-        _t: Thread = Thread(target=_inner, args=(self._cron, func), daemon=True)
-        _t.start()
+        self._job = self._scheduler.add(
+            self._expr,
+            func,
+            max_instances=self._max_instances,
+            misfire=self._misfire,
+            misfire_grace_time=self._misfire_grace_time,
+            input_value=self._input_value,
+        )
         return func
 
+    def cancel(self) -> None:
+        """Stop running the decorated function.
+
+        Returns:
+            None
+        """
+        if self._job is not None:
+            self._scheduler.remove(self._job)
+
 
 __all__ = ("CronDecorator",)
@@ -1,55 +1,161 @@
 """Decorated background function"""
 
+from asyncio import AbstractEventLoop, get_running_loop, run_coroutine_threadsafe
 from datetime import datetime
+from inspect import isasyncgenfunction, iscoroutinefunction, isgeneratorfunction
 from uuid import uuid4
+from warnings import warn
 from threading import Thread
-from json import loads
-from typing import TypeVar, Generic, Callable, Union, List, Dict, Type, cast
-from pydantic import BaseModel
+from typing import (
+    TYPE_CHECKING,
+    TypeVar,
+    Generic,
+    AsyncGenerator,
+    Generator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Iterator,
+    Union,
+    List,
+    Tuple,
+    Type,
+    Any,
+    cast,
+)
+from pydantic import BaseModel, TypeAdapter
+from .aio import get_event_loop
+from .batching import Batcher
+from .codecs import get_adapter
+from .dispatch import CompletionDispatcher
+from .executor import WorkerPool
+from .metrics import MetricsRecorder, function_name
 from .models.response import ResultModel
-from .result import ExecutionResult as Result
+from .pipeline import Pipeline
+from .result import ExecutionResult as Result, stream
+from .store import MemoryResultStore, ResultStore
 
 T = TypeVar("T", bound=BaseModel)
 U = TypeVar("U", bound=BaseModel)
+V = TypeVar("V", bound=BaseModel)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .rabbit import RabbitBackgroundFunction
 
 
 class DecoratedBackgroundFunction(Generic[T, U]):
     """Decorated background function"""
 
-    _data: Dict[str, ResultModel[U]]
+    _store: ResultStore
+    _dispatcher: Union[CompletionDispatcher, None]
+    _metrics: MetricsRecorder
     _input_type: Type[T]
     _output_type: Type[U]
+    _input_adapter: TypeAdapter[Any]
+    _output_adapter: TypeAdapter[Any]
     _on_finish: Callable[[Union[U, List[U]]], None]
     _on_error: Callable[[Exception], None]
     _on_finish_signal: Callable[[], None]
+    _on_item: Union[Callable[[U], None], None]
+    _streaming: bool
+    _max_buffer: int
+    _batcher: Union[Batcher[Tuple[T, ResultModel[U], int]], None]
+    _executor: Union[WorkerPool, None]
+    _event_loop: Union[AbstractEventLoop, None]
     func: Callable[[Union[T, List[T]]], Union[U, List[U]]]
 
-    def __init__(
+    def __init__(  # noqa: PLR0913
         self,
         func: Callable[[Union[T, List[T]]], Union[U, List[U]]],
         input_type: Type[T],
         output_type: Type[U],
+        executor: Union[WorkerPool, None] = None,
+        event_loop: Union[AbstractEventLoop, None] = None,
+        result_store: Union[ResultStore, None] = None,
+        dispatcher: Union[CompletionDispatcher, None] = None,
+        max_buffer: int = 64,
+        batch_size: int = 1,
+        batch_linger_ms: float = 0,
     ) -> None:
         """
         Initializes a new instance of the DecoratedBackgroundFunction class.
 
+        With a `batch_size`, the single models passed to `run` are collected and the \
+        function is called once per batch, with a list: it must return a list of \
+        outputs, in the same order, which are split back to the results of the inputs. \
+        An error fails the results of the whole batch.
+
+        Generator functions (sync or async) stream their items while they run: to \
+        `on_item` if it is set, and then their result is an empty list. Otherwise the \
+        items are collected into the list of their result, until the iterator of the \
+        result, `items()`, is used: from then on they go through a buffer of \
+        `max_buffer` items, the function waits while the buffer is full, and is \
+        stopped if the iterator is closed.
+
         Args:
             func: A callable function that takes a single argument of type T or a list of T \
                 and returns a single value of type U or a list of U.
             input_type: The type of the input argument.
             output_type: The type of the output value.
+            executor: The worker pool running the tasks. Defaults to None, which \
+                starts a new thread for every task.
+            event_loop: The event loop running the function, if it is async. Defaults \
+                to None, which uses a shared event loop running in its own thread.
+            result_store: The store keeping the results of the tasks. Defaults to None, \
+                which creates a `MemoryResultStore`.
+            dispatcher: The dispatcher running the callbacks of the tasks. Defaults to \
+                None, which uses the process-wide one.
+            max_buffer: The maximum number of items of a generator function waiting for \
+                the consumer of its result. Defaults to 64.
+            batch_size: The maximum number of inputs passed together, as a list, to the \
+                function. Defaults to 1, which calls it once per input.
+            batch_linger_ms: The maximum time in milliseconds an input waits for its \
+                batch to fill up. Defaults to 0.
 
         Returns:
             None
         """
         self.func = func
-        self._data = {}
+        self._store = result_store if result_store is not None else MemoryResultStore()
+        self._store.register_model(output_type)
+        self._dispatcher = dispatcher
+        self._metrics = MetricsRecorder(function_name(func))
         self._input_type = input_type
         self._output_type = output_type
+        self._input_adapter = get_adapter(input_type)
+        self._output_adapter = get_adapter(output_type)
+        self._executor = executor
+        self._event_loop = event_loop
 
         self._on_finish = lambda x: None
         self._on_error = lambda x: None
         self._on_finish_signal = lambda: None
+        self._on_item = None
+        self._streaming = isgeneratorfunction(func) or isasyncgenfunction(func)
+        self._max_buffer = max_buffer
+        self._batcher = None
+        if batch_size > 1 and not self._streaming:
+            self._batcher = Batcher(self._run_batch, batch_size, batch_linger_ms / 1000)
+
+    @property
+    def metrics(self) -> MetricsRecorder:
+        """The metrics of the function"""
+        return self._metrics
+
+    @property
+    def executor(self) -> Union[WorkerPool, None]:
+        """The worker pool running the tasks, if any"""
+        return self._executor
+
+    @property
+    def input_type(self) -> Type[T]:
+        """The type of the input argument"""
+        return self._input_type
+
+    @property
+    def output_type(self) -> Type[U]:
+        """The type of the output value"""
+        return self._output_type
 
     @property
     def on_finish(self) -> Callable[[Union[U, List[U]]], None]:
@@ -81,78 +187,334 @@ class DecoratedBackgroundFunction(Generic[T, U]):
         """Set a function to be called when a message is received"""
         self._on_finish_signal = value
 
+    @property
+    def on_item(self) -> Union[Callable[[U], None], None]:
+        """Get the function called with every item of a generator function, if any"""
+        return self._on_item
+
+    @on_item.setter
+    def on_item(self, value: Union[Callable[[U], None], None]) -> None:
+        """Set a function called with every item of a generator function, by the thread \
+        running it, instead of streaming the items to the result"""
+        self._on_item = value
+
+    @property
+    def streaming(self) -> bool:
+        """Whether the function is a generator, streaming its items"""
+        return self._streaming
+
     def _run_background(
         self,
         input_value: Union[T, List[T], str],
-        uuid: str,
+        entry: ResultModel[U],
     ) -> None:
         """
-        Runs the decorated function in the background with the provided input value and uuid.
+        Runs the decorated function in the background with the provided input value.
 
         Args:
             input_value: The input value to be passed to the decorated function. It can be a \
                   string, a list, or a dictionary.
-            uuid: A unique identifier for the background task.
+            entry: The result of the background task.
 
         Returns:
             None
         """
+        self._waited(entry)
         try:
-            if isinstance(input_value, str):
-                input_value = loads(input_value)
-            if isinstance(input_value, list):
-                input_value = [
-                    self._input_type.model_validate(i) if isinstance(i, dict) else i
-                    for i in input_value
-                ]
-            if isinstance(input_value, dict):
-                # pylint: disable=line-too-long
-                input_value = self._input_type.model_validate(input_value)  # type: ignore[unreachable]
-                # pylint: enable=line-too-long
-            self._data[uuid].result = self.func(cast("Union[T, List[T]]", input_value))
+            with self._metrics.time("deserialization"):
+                value = self._parse(input_value)
+            with self._metrics.time("execution"):
+                output = self.func(value)
+                if self._streaming:
+                    output = self._deliver(cast("Generator[U, None, None]", output), entry)
+                entry.result = output
         except Exception as ex:  # pylint: disable=broad-except
-            self._data[uuid].error = ex
+            entry.error = ex
+            self._metrics.execution_error()
         finally:
-            self._data[uuid].completed = datetime.now()
+            entry.set_completed()
+
+    async def _run_background_async(
+        self,
+        input_value: Union[T, List[T], str],
+        entry: ResultModel[U],
+    ) -> None:
+        """
+        Runs the decorated async function on the event loop with the provided input value.
+
+        Args:
+            input_value: The input value to be passed to the decorated function. It can be a \
+                  string, a list, or a dictionary.
+            entry: The result of the background task.
+
+        Returns:
+            None
+        """
+        self._waited(entry)
+        try:
+            with self._metrics.time("deserialization"):
+                value = self._parse(input_value)
+            with self._metrics.time("execution"):
+                if self._streaming:
+                    items = cast("AsyncGenerator[U, None]", self.func(value))
+                    entry.result = await self._deliver_async(items, entry)
+                else:
+                    entry.result = await cast("Awaitable[Union[U, List[U]]]", self.func(value))
+        except Exception as ex:  # pylint: disable=broad-except
+            entry.error = ex
+            self._metrics.execution_error()
+        finally:
+            entry.set_completed()
+
+    def _deliver(self, items: "Generator[U, None, None]", entry: ResultModel[U]) -> List[U]:
+        """Hand the items of a generator over to `on_item`, or to the result."""
+        for item in items:
+            if self._on_item is not None:
+                self._on_item(item)
+            elif not entry.add_item(item):
+                items.close()
+                break
+        return entry.take_items()
+
+    async def _deliver_async(
+        self, items: "AsyncGenerator[U, None]", entry: ResultModel[U]
+    ) -> List[U]:
+        """Hand the items of an async generator over to `on_item`, or to the result, \
+        waiting for room in its stream without blocking the event loop."""
+        async for item in items:
+            if self._on_item is not None:
+                self._on_item(item)
+                continue
+            stream = entry.item_stream
+            if stream is not None and stream.full:
+                delivered = await get_running_loop().run_in_executor(None, entry.add_item, item)
+            else:
+                delivered = entry.add_item(item)
+            if not delivered:
+                await items.aclose()
+                break
+        return entry.take_items()
+
+    def _waited(self, entry: ResultModel[U]) -> None:
+        """Record how long a task waited before running."""
+        if entry.started is not None:
+            self._metrics.observe("queue_wait", (datetime.now() - entry.started).total_seconds())
+
+    def _parse(self, input_value: Union[T, List[T], str]) -> Union[T, List[T]]:
+        """Turn the input value into a model or a list of models.
+
+        Models are passed through as they are, JSON strings are validated in a single \
+        pass straight from the text, and lists and dictionaries in a single call to \
+        the cached adapter, which only checks the items that are already models."""
+        if isinstance(input_value, self._input_type):
+            return input_value
+        if isinstance(input_value, (str, bytes)):
+            return cast("Union[T, List[T]]", self._input_adapter.validate_json(input_value))
+        return cast("Union[T, List[T]]", self._input_adapter.validate_python(input_value))
+
+    def _drop(self, entry: ResultModel[U], error: Exception) -> None:
+        """Complete a task that was dropped before running."""
+        entry.error = error
+        entry.set_completed()
+
+    def _submit(
+        self, input_value: Union[T, List[T], str], entry: ResultModel[U], priority: int = 0
+    ) -> None:
+        """Hand the task over to the executor, or to a new thread if there is none. \
+        Async functions run on the event loop instead. Only the executor honors the \
+        priority."""
+        if iscoroutinefunction(self.func) or isasyncgenfunction(self.func):
+            run_coroutine_threadsafe(
+                self._run_background_async(input_value, entry),
+                self._event_loop if self._event_loop is not None else get_event_loop(),
+            )
+            return
+        if self._executor is None:
+            t = Thread(target=self._run_background, args=(input_value, entry))
+            t.start()
+            return
+        self._executor.submit(
+            lambda: self._run_background(input_value, entry),
+            on_drop=lambda ex: self._drop(entry, ex),
+            priority=priority,
+        )
+
+    def _honors_priority(self) -> bool:
+        """Whether the tasks are queued by priority: only a worker pool does it, for \
+        sync functions."""
+        return self._executor is not None and not (
+            iscoroutinefunction(self.func) or isasyncgenfunction(self.func)
+        )
 
     def run(  # noqa: D102
         self,
         input_value: Union[T, List[T], str],
-        timeout: Union[float, None] = None,  # pylint: disable=unused-argument
+        timeout: Union[float, None] = None,
+        priority: Union[int, None] = None,
     ) -> Result[U]:
         """
         Run a background task with the given input value and optional timeout.
 
         Args:
             input_value: The input value to be processed by the background task.
-            timeout: The maximum time in seconds to wait for the task to complete.
+            timeout: The maximum time in seconds to wait for the task to complete \
+                before `on_error` is called with a `TimeoutError`.
+            priority: The priority of the task in the queue of the worker pool, higher \
+                runs first. Waiting raises it too, so low priority tasks still run. It is \
+                only honored by a worker pool (`max_workers`) running a sync function: \
+                otherwise a `RuntimeWarning` is issued and the tasks start in submission \
+                order. Defaults to None, which is 0.
+
+        Raises:
+            QueueFullError: If the executor queue is full and the task cannot be queued.
 
         Returns:
             A Result object representing the outcome of the background task.
         """
+        if priority is not None and not self._honors_priority():
+            warn(
+                f"{self._metrics.name} ignores the priority of its tasks: only a worker pool "
+                "running a sync function queues them by priority",
+                RuntimeWarning,
+                stacklevel=2,
+            )
         uuid = str(uuid4())
-        self._data[uuid] = ResultModel(started=datetime.now())
+        entry: ResultModel[U] = ResultModel(started=datetime.now())
+        if self._streaming and self._on_item is None:
+            entry.expect_items(self._max_buffer)
+        self._store.put(uuid, entry)
 
-        t = Thread(target=self._run_background, args=(input_value, uuid))
-        t.start()
+        try:
+            if self._batcher is not None and isinstance(input_value, self._input_type):
+                self._batcher.add((input_value, entry, priority or 0))
+            else:
+                self._submit(input_value, entry, priority or 0)
+        except Exception:
+            self._store.discard(uuid)
+            raise
+        self._metrics.track(entry)
         res: Result[U] = Result(
             uuid,
             self,
             self._on_finish,
             self._on_error,
             self._on_finish_signal,
+            timeout,
+            entry,
         )
-        res.connect()
+        res.connect(self._dispatcher)
         return res
 
+    def _run_batch(self, batch: List[Tuple[T, ResultModel[U], int]]) -> None:
+        """Call the function once for a batch of inputs, with their highest priority."""
+        entry: ResultModel[U] = ResultModel(started=batch[0][1].started)
+        entry.add_done_callback(lambda: self._split(batch, entry))
+        try:
+            self._submit(
+                [value for value, _, _ in batch], entry, max(priority for _, _, priority in batch)
+            )
+        except Exception as ex:  # pylint: disable=broad-except
+            self._drop(entry, ex)
+
+    def _split(self, batch: List[Tuple[T, ResultModel[U], int]], entry: ResultModel[U]) -> None:
+        """Hand the outputs of a batch over to the results of its inputs, in order."""
+        outputs = entry.result
+        if entry.error is None and (not isinstance(outputs, list) or len(outputs) != len(batch)):
+            count = len(outputs) if isinstance(outputs, list) else 1
+            entry.error = ValueError(
+                f"The function returned {count} outputs for a batch of {len(batch)} inputs"
+            )
+        for index, (_, item, _) in enumerate(batch):
+            if entry.error is not None:
+                item.error = entry.error
+            else:
+                item.result = cast(List[U], outputs)[index]
+            item.set_completed()
+
+    def flush(self) -> None:
+        """
+        Run the inputs waiting for their batch to fill up right away.
+
+        Returns:
+            None
+        """
+        if self._batcher is not None:
+            self._batcher.flush()
+
+    def map(
+        self,
+        iterable: Iterable[Union[T, List[T], str]],
+        chunk_size: int = 64,
+        ordered: bool = False,
+        timeout: Union[float, None] = None,
+    ) -> Iterator[Union[U, List[U]]]:
+        """
+        Run a task for every input and yield the results as they finish.
+
+        The inputs are consumed lazily and at most `chunk_size` tasks are in flight, \
+        so memory stays flat however long the iterable is.
+
+        Args:
+            iterable: The input values, for example a generator.
+            chunk_size: The maximum number of tasks in flight. Defaults to 64.
+            ordered: Yield the results in the order of the inputs. Defaults to False.
+            timeout: The maximum time in seconds to wait for the next result.
+
+        Raises:
+            TimeoutError: If no result finishes within the timeout.
+            Exception: The first error raised by a task.
+
+        Returns:
+            An iterator over the results.
+        """
+        return stream(self.run, iterable, chunk_size, ordered, timeout)
+
+    async def run_async(
+        self,
+        input_value: Union[T, List[T], str],
+        timeout: Union[float, None] = None,
+    ) -> Union[U, List[U]]:
+        """
+        Run a background task and wait for its result without blocking the event loop.
+
+        Args:
+            input_value: The input value to be processed by the background task.
+            timeout: The maximum time in seconds to wait for the task to complete.
+
+        Raises:
+            TimeoutError: If the task is not finished within the timeout.
+            Exception: The error raised by the task, if any.
+
+        Returns:
+            The result of the background task.
+        """
+        return await self.run(input_value, timeout).get_async(timeout)
+
+    def __or__(
+        self,
+        other: Union[
+            "DecoratedBackgroundFunction[U, V]", "RabbitBackgroundFunction[U, V]", "Pipeline[U, V]"
+        ],
+    ) -> "Pipeline[T, V]":
+        """Chain another decorated function (or a pipeline) after this one."""
+        return Pipeline(self, other, dispatcher=self._dispatcher)
+
+    @property
+    def result_store(self) -> ResultStore:
+        """The store keeping the results of the tasks"""
+        return self._store
+
     def __getitem__(self, key: str) -> ResultModel[U]:
         """Get the result."""
-        return self._data[key]
+        entry = self._store.get(key)
+        if entry is None:
+            raise KeyError(key)
+        return cast("ResultModel[U]", entry)
 
     def __setitem__(self, key: str, value: ResultModel[U]) -> None:
         """Set the result."""
-        self._data[key] = value
+        self._store.put(key, value)
 
     def __delitem__(self, key: str) -> None:
         """Delete the result."""
-        del self._data[key]
+        self._store.discard(key)
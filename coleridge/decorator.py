@@ -1,11 +1,21 @@
 """Decorator utils"""
 
+from asyncio import AbstractEventLoop
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Generic, TypeVar, Type, Union, List, Callable, Literal
+from typing import TYPE_CHECKING, Generic, TypeVar, Type, Union, List, Callable, Literal
 from pydantic import BaseModel
+from .codecs import Codec
 from .decorated import DecoratedBackgroundFunction
+from .executor import WorkerPool
 from .models.connection import Connection
-from .rabbit import RabbitBackgroundFunction
+from .process import ProcessBackgroundFunction
+from .dispatch import CompletionDispatcher
+from .store import ResultStore
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .pool import ConnectionPool
+    from .rabbit import RabbitBackgroundFunction
 
 T = TypeVar("T", bound=BaseModel)
 U = TypeVar("U", bound=BaseModel)
@@ -19,21 +29,55 @@ class ColeridgeDecorator(Generic[T, U]):
     _on_finish: Union[Callable[[Union[U, List[U]]], None], None]
     _on_error: Union[Callable[[Exception], None], None]
     _on_finish_signal: Union[Callable[[], None], None]
-    _mode: Literal["rabbit", "background"]
+    _on_item: Union[Callable[[U], None], None]
+    _mode: Literal["rabbit", "background", "process", "memory"]
     _connection_settings: Union[Connection, None, str, Path]
     _queue: Union[str, None]
+    _executor: Union[WorkerPool, None]
+    _process_pool: Union[ProcessPoolExecutor, None]
+    _event_loop: Union[AbstractEventLoop, None]
+    _codec: Union[str, Codec]
+    _connection_pool: "Union[ConnectionPool, None]"
+    _publish_batch_size: int
+    _publish_linger_ms: float
+    _publisher_confirms: bool
+    _concurrency: int
+    _prefetch_count: Union[int, None]
+    _consume: bool
+    _result_store: Union[ResultStore, None]
+    _dispatcher: Union[CompletionDispatcher, None]
+    _batch_size: int
+    _batch_linger_ms: float
+    _max_priority: Union[int, None]
 
     def __init__(  # noqa: PLR0913
         self,
         input_type: Type[T],
         output_type: Type[U],
         *,
-        mode: Literal["rabbit", "background"] = "background",
+        mode: Literal["rabbit", "background", "process", "memory"] = "background",
         connection_settings: Union[Connection, None, str, Path] = None,
         queue: Union[str, None] = None,
         on_finish: Union[Callable[[Union[U, List[U]]], None], None] = None,
         on_error: Union[Callable[[Exception], None], None] = None,
         on_finish_signal: Union[Callable[[], None], None] = None,
+        on_item: Union[Callable[[U], None], None] = None,
+        executor: Union[WorkerPool, None] = None,
+        process_pool: Union[ProcessPoolExecutor, None] = None,
+        event_loop: Union[AbstractEventLoop, None] = None,
+        codec: Union[str, Codec] = "json",
+        connection_pool: "Union[ConnectionPool, None]" = None,
+        publish_batch_size: int = 1,
+        publish_linger_ms: float = 0,
+        publisher_confirms: bool = False,
+        concurrency: int = 1,
+        prefetch_count: Union[int, None] = None,
+        consume: bool = True,
+        result_store: Union[ResultStore, None] = None,
+        dispatcher: Union[CompletionDispatcher, None] = None,
+        batch_size: int = 1,
+        batch_linger_ms: float = 0,
+        max_priority: Union[int, None] = None,
     ) -> None:
         """
         Initializes a new instance of the ColeridgeDecorator class.
@@ -41,8 +85,9 @@ class ColeridgeDecorator(Generic[T, U]):
         Args:
             input_type (Type[T]): The type of the input data.
             output_type (Type[U]): The type of the output data.
-            mode (Literal["rabbit", "background"], optional): The mode \
-                of the decorator. Defaults to "background".
+            mode (Literal["rabbit", "background", "process", "memory"], optional): The mode \
+                of the decorator. "memory" works like "rabbit", with an in-process broker \
+                instead of RabbitMQ. Defaults to "background".
             connection_settings (Union[Connection, None, str, Path], optional): The connection \
                 settings. Defaults to None.
             queue (Union[str, None], optional): The queue name. Defaults to None.
@@ -52,6 +97,49 @@ class ColeridgeDecorator(Generic[T, U]):
               function to call when an error occurs. Defaults to None.
             on_finish_signal (Union[Callable[[], None], None], optional): The callback \
             function to call when the task is finished with a signal. Defaults to None.
+            on_item (Union[Callable[[U], None], None], optional): The function called \
+                with every item of a generator function in "background" mode, instead of \
+                streaming them to the result. Defaults to None.
+            executor (Union[WorkerPool, None], optional): The worker pool running the \
+                background tasks. Defaults to None, which starts a thread per task.
+            process_pool (Union[ProcessPoolExecutor, None], optional): The process pool \
+                running the tasks in "process" mode. Defaults to None, which creates one.
+            event_loop (Union[AbstractEventLoop, None], optional): The event loop running \
+                async functions in "background" mode. Defaults to None, which uses a \
+                shared event loop running in its own thread.
+            codec (Union[str, Codec], optional): The codec of the messages in "rabbit" \
+                mode: "json", "msgpack" or "pickle". Defaults to "json".
+            connection_pool (Union[ConnectionPool, None], optional): The pool the rabbit \
+                channels are taken from. Defaults to None, which uses the process-wide pool \
+                (of the process-wide memory broker in "memory" mode).
+            publish_batch_size (int, optional): The number of messages published together \
+                in "rabbit" mode. Defaults to 1, which publishes every message right away.
+            publish_linger_ms (float, optional): The maximum time in milliseconds a message \
+                waits for its batch to fill up in "rabbit" mode. Defaults to 0.
+            publisher_confirms (bool, optional): Whether to wait for the broker to confirm \
+                every message in "rabbit" mode. Defaults to False.
+            concurrency (int, optional): The number of messages each rabbit function \
+                handles at the same time. Defaults to 1.
+            prefetch_count (Union[int, None], optional): The maximum number of messages \
+                delivered to a rabbit function but not acknowledged yet. Defaults to \
+                None, which is twice the concurrency.
+            consume (bool, optional): Whether the rabbit functions also consume their \
+                queue when `run` is called. Set it to False in producers whose tasks are \
+                handled by workers. Defaults to True.
+            result_store (Union[ResultStore, None], optional): The store keeping the \
+                results of the tasks. Defaults to None, which creates a `MemoryResultStore` \
+                per function.
+            dispatcher (Union[CompletionDispatcher, None], optional): The dispatcher \
+                running the callbacks of the tasks. Defaults to None, which uses the \
+                process-wide one.
+            batch_size (int, optional): The maximum number of single inputs passed \
+                together, as a list, to the function in "background" or "process" mode. \
+                Defaults to 1, which calls it once per input.
+            batch_linger_ms (float, optional): The maximum time in milliseconds an input \
+                waits for its batch to fill up. Defaults to 0.
+            max_priority (Union[int, None], optional): The highest message priority of the \
+                queues in "rabbit" or "memory" mode, declared with `x-max-priority`. \
+                Defaults to None, which declares queues without priorities.
 
         Returns:
             None
@@ -61,17 +149,52 @@ class ColeridgeDecorator(Generic[T, U]):
         self._on_finish = on_finish
         self._on_error = on_error
         self._on_finish_signal = on_finish_signal
+        self._on_item = on_item
 
         self._mode = mode
         self._connection_settings = connection_settings
         self._queue = queue
+        self._executor = executor
+        self._process_pool = process_pool
+        self._event_loop = event_loop
+        self._codec = codec
+        if connection_pool is None and mode == "memory":
+            # pylint: disable=import-outside-toplevel
+            from .memory import get_memory_pool
+
+            connection_pool = get_memory_pool()
+        self._connection_pool = connection_pool
+        self._publish_batch_size = publish_batch_size
+        self._publish_linger_ms = publish_linger_ms
+        self._publisher_confirms = publisher_confirms
+        self._concurrency = concurrency
+        self._prefetch_count = prefetch_count
+        self._consume = consume
+        self._result_store = result_store
+        self._dispatcher = dispatcher
+        self._batch_size = batch_size
+        self._batch_linger_ms = batch_linger_ms
+        self._max_priority = max_priority
+
+    def _attach(
+        self, func: "Union[DecoratedBackgroundFunction[T, U], RabbitBackgroundFunction[T, U]]"
+    ) -> None:
+        """Set the callbacks of a decorated function."""
+        if self._on_finish is not None:
+            func.on_finish = self._on_finish
+        if self._on_error is not None:
+            func.on_error = self._on_error
+        if self._on_finish_signal is not None:
+            func.on_finish_signal = self._on_finish_signal
 
     def __call__(
         self,
         func: Callable[[Union[T, List[T]]], Union[U, List[U]]],
-    ) -> Union[DecoratedBackgroundFunction[T, U], RabbitBackgroundFunction[T, U]]:
+    ) -> "Union[DecoratedBackgroundFunction[T, U], RabbitBackgroundFunction[T, U]]":
         """
-        Calls the decorated function with the provided parameters.
+        Calls the decorated function with the provided parameters. The rabbit \
+        transport (and pika) is only imported by the functions in "rabbit" or \
+        "memory" mode.
 
         Args:
             func (Callable[[Union[T, List[T]]], Union[U, List[U]]]): The function to be called.
@@ -81,32 +204,60 @@ class ColeridgeDecorator(Generic[T, U]):
             The result of the function call, which can be either a \
             DecoratedBackgroundFunction or a RabbitBackgroundFunction.
         """
-        if self._mode == "rabbit":
+        if self._mode in ("rabbit", "memory"):
+            from .rabbit import (  # pylint: disable=import-outside-toplevel
+                RabbitBackgroundFunction,
+            )
+
             rabbit: RabbitBackgroundFunction[T, U] = RabbitBackgroundFunction(
                 func,
                 self._input_type,
                 self._output_type,
                 connection_settings=self._connection_settings,
                 queue=self._queue,
+                codec=self._codec,
+                connection_pool=self._connection_pool,
+                publish_batch_size=self._publish_batch_size,
+                publish_linger_ms=self._publish_linger_ms,
+                publisher_confirms=self._publisher_confirms,
+                concurrency=self._concurrency,
+                prefetch_count=self._prefetch_count,
+                consume=self._consume,
+                result_store=self._result_store,
+                dispatcher=self._dispatcher,
+                max_priority=self._max_priority,
             )
-            if self._on_finish is not None:
-                rabbit.on_finish = self._on_finish
-            if self._on_error is not None:
-                rabbit.on_error = self._on_error
-            if self._on_finish_signal is not None:
-                rabbit.on_finish_signal = self._on_finish_signal
+            self._attach(rabbit)
             return rabbit
-        dec: DecoratedBackgroundFunction[T, U] = DecoratedBackgroundFunction(
-            func,
-            self._input_type,
-            self._output_type,
-        )
-        if self._on_finish is not None:
-            dec.on_finish = self._on_finish
-        if self._on_error is not None:
-            dec.on_error = self._on_error
-        if self._on_finish_signal is not None:
-            dec.on_finish_signal = self._on_finish_signal
+        dec: DecoratedBackgroundFunction[T, U]
+        if self._mode == "process":
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor()
+            dec = ProcessBackgroundFunction(
+                func,
+                self._input_type,
+                self._output_type,
+                self._process_pool,
+                result_store=self._result_store,
+                dispatcher=self._dispatcher,
+                batch_size=self._batch_size,
+                batch_linger_ms=self._batch_linger_ms,
+            )
+        else:
+            dec = DecoratedBackgroundFunction(
+                func,
+                self._input_type,
+                self._output_type,
+                executor=self._executor,
+                event_loop=self._event_loop,
+                result_store=self._result_store,
+                dispatcher=self._dispatcher,
+                batch_size=self._batch_size,
+                batch_linger_ms=self._batch_linger_ms,
+            )
+        self._attach(dec)
+        if self._on_item is not None:
+            dec.on_item = self._on_item
         return dec
 
 
@@ -0,0 +1,235 @@
+"""Completion dispatcher, running the callbacks of the finished tasks"""
+
+from atexit import register, unregister
+from heapq import heappop, heappush
+from itertools import count
+from logging import getLogger
+from threading import Condition, Lock, Thread
+from time import monotonic
+from typing import Any, Callable, Iterator, List, Tuple, Union
+from .executor import WorkerPool
+from .models.response import ResultModel
+
+logger = getLogger(__name__)
+
+
+class _Watch:  # pylint: disable=too-few-public-methods
+    """A task being watched: either its completion or its deadline fires, once"""
+
+    __slots__ = ("on_done", "on_timeout", "fired", "lock")
+
+    on_done: Callable[[], None]
+    on_timeout: Callable[[], None]
+    fired: bool
+    lock: Lock
+
+    def __init__(self, on_done: Callable[[], None], on_timeout: Callable[[], None]) -> None:
+        """Initializes a new instance of the _Watch class."""
+        self.on_done = on_done
+        self.on_timeout = on_timeout
+        self.fired = False
+        self.lock = Lock()
+
+    def claim(self, expired: bool) -> Union[Callable[[], None], None]:
+        """Take the callback to run, if nothing fired yet, and drop the references \
+        to the task so an expired deadline left in the heap does not keep it alive."""
+        with self.lock:
+            if self.fired:
+                return None
+            self.fired = True
+            callback = self.on_timeout if expired else self.on_done
+            self.on_done = self.on_timeout = _nothing
+            return callback
+
+
+def _nothing() -> None:
+    """Do nothing."""
+
+
+def _call(callback: Callable[[], None]) -> None:
+    """Run a callback, logging its errors."""
+    try:
+        callback()
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("A completion callback failed")
+
+
+class CompletionDispatcher:
+    """Runs the `on_finish`, `on_finish_signal` and `on_error` callbacks of the tasks.
+
+    The workers push the finished tasks into the dispatcher, which runs their callbacks \
+    on a small pool of `max_workers` threads, or right away on the worker itself when \
+    `inline` is set. The deadlines of the tasks started with a timeout are kept in a \
+    min-heap, watched by a single timer thread. No thread waits for a single task.
+    """
+
+    _max_workers: int
+    _inline: bool
+    _pool: WorkerPool
+    _heap: List[Tuple[float, int, _Watch]]
+    _cond: Condition
+    _timer: Union[Thread, None]
+    _running: bool
+    _seq: Iterator[int]
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        inline: bool = False,
+        name: str = "coleridge-callbacks",
+    ) -> None:
+        """
+        Initializes a new instance of the CompletionDispatcher class.
+
+        Args:
+            max_workers (int, optional): The number of threads running the callbacks. \
+                Defaults to 2.
+            inline (bool, optional): Run the callbacks on the thread finishing the task \
+                instead, which saves a hand-off but delays its next task. Defaults to False.
+            name (str, optional): The prefix of the thread names. \
+                Defaults to "coleridge-callbacks".
+
+        Returns:
+            None
+        """
+        self._max_workers = max_workers
+        self._inline = inline
+        self._pool = WorkerPool(max_workers, name=name)
+        self._heap = []
+        self._cond = Condition()
+        self._timer = None
+        self._running = True
+        self._seq = count()
+        register(self.shutdown)
+
+    @property
+    def max_workers(self) -> int:
+        """The number of threads running the callbacks"""
+        return self._max_workers
+
+    @property
+    def inline(self) -> bool:
+        """Whether the callbacks run on the thread finishing the task"""
+        return self._inline
+
+    @property
+    def deadlines(self) -> int:
+        """The number of deadlines being watched"""
+        with self._cond:
+            return len(self._heap)
+
+    def watch(
+        self,
+        entry: ResultModel[Any],
+        on_done: Callable[[], None],
+        on_timeout: Callable[[], None],
+        timeout: Union[float, None] = None,
+    ) -> None:
+        """
+        Run `on_done` once a task is completed, or `on_timeout` if it is not completed \
+        within `timeout` seconds. Only one of them runs.
+
+        Args:
+            entry (ResultModel): The result of the task.
+            on_done (Callable[[], None]): Called once the task is completed.
+            on_timeout (Callable[[], None]): Called if the timeout expires first.
+            timeout (Union[float, None], optional): The timeout in seconds. \
+                Defaults to None, which waits forever.
+
+        Returns:
+            None
+        """
+        watch = _Watch(on_done, on_timeout)
+        if timeout is not None:
+            with self._cond:
+                heappush(self._heap, (monotonic() + timeout, next(self._seq), watch))
+                if self._timer is None:
+                    self._timer = Thread(
+                        target=self._watch_deadlines, name="coleridge-deadlines", daemon=True
+                    )
+                    self._timer.start()
+                self._cond.notify()
+        entry.add_done_callback(lambda: self._done(watch))
+
+    def _done(self, watch: _Watch) -> None:
+        """Run the completion callback of a task. Runs on the thread finishing it."""
+        callback = watch.claim(expired=False)
+        if callback is not None:
+            self.submit(callback)
+
+    def _expired(self) -> Union[_Watch, None]:
+        """Wait for the next deadline to expire. Must be called with the lock held."""
+        while self._running:
+            while self._heap and self._heap[0][2].fired:
+                heappop(self._heap)
+            if not self._heap:
+                self._cond.wait()
+                continue
+            wait = self._heap[0][0] - monotonic()
+            if wait > 0:
+                self._cond.wait(wait)
+                continue
+            return heappop(self._heap)[2]
+        return None
+
+    def _watch_deadlines(self) -> None:
+        """Run the timeout callbacks of the tasks not completed in time."""
+        while True:
+            with self._cond:
+                watch = self._expired()
+            if watch is None:
+                return
+            self._expire(watch)
+
+    def _expire(self, watch: _Watch) -> None:
+        """Run the timeout callback of a task, unless it completed in the meantime."""
+        callback = watch.claim(expired=True)
+        if callback is not None:
+            self._submit(callback)
+
+    def submit(self, callback: Callable[[], None]) -> None:
+        """
+        Run a function like a completion callback: on the callback threads, or right \
+        away if the dispatcher is inline. Its exceptions are logged.
+
+        Args:
+            callback (Callable[[], None]): The function.
+
+        Returns:
+            None
+        """
+        if self._inline:
+            _call(callback)
+        else:
+            self._submit(callback)
+
+    def _submit(self, callback: Callable[[], None]) -> None:
+        """Run a callback on the pool, or right away once the pool is shut down."""
+        try:
+            self._pool.submit(lambda: _call(callback))
+        except RuntimeError:
+            _call(callback)
+
+    def shutdown(self) -> None:
+        """
+        Stop watching the deadlines and the callback threads.
+
+        Returns:
+            None
+        """
+        unregister(self.shutdown)
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._pool.shutdown()
+
+
+_default_dispatcher = CompletionDispatcher()
+
+
+def get_dispatcher() -> CompletionDispatcher:
+    """Get the process-wide completion dispatcher."""
+    return _default_dispatcher
+
+
+__all__ = ("CompletionDispatcher", "get_dispatcher")
@@ -0,0 +1,27 @@
+"""Errors shared by the transports"""
+
+
+class RemoteExecutionError(RuntimeError):
+    """The function raised an error while running on a (possibly remote) worker"""
+
+    error_type: str
+    message: str
+
+    def __init__(self, message: str, error_type: str = "Exception") -> None:
+        """
+        Initializes a new instance of the RemoteExecutionError class.
+
+        Args:
+            message (str): The message of the original error.
+            error_type (str, optional): The name of the class of the original error. \
+                Defaults to "Exception".
+
+        Returns:
+            None
+        """
+        super().__init__(f"{error_type}: {message}")
+        self.error_type = error_type
+        self.message = message
+
+
+__all__ = ("RemoteExecutionError",)
@@ -0,0 +1,295 @@
+"""Bounded worker pool"""
+
+from atexit import register, unregister
+from heapq import heapify, heappop, heappush
+from itertools import count
+from threading import Condition, Lock, Thread
+from time import monotonic
+from typing import Callable, Iterator, List, Literal, Tuple, Union
+
+Backpressure = Literal["block", "reject", "drop_oldest"]
+Task = Tuple[float, int, int, Callable[[], None], Callable[[Exception], None]]
+
+
+class QueueFullError(RuntimeError):
+    """The task could not be queued (or was dropped) because the queue was full"""
+
+
+class WorkerPool:
+    """A bounded pool of worker threads fed by a submission queue.
+
+    ```python
+    from coleridge import WorkerPool
+
+    pool = WorkerPool(max_workers=8, max_queue=1000, backpressure="reject")
+    pool.submit(lambda: print("Called"))
+    ```
+
+    Workers are started lazily, up to `max_workers`. When `max_queue` tasks are \
+    already waiting, the `backpressure` policy decides what happens to a new one:
+
+    - `block`: wait for a free slot (up to the timeout given to `submit`).
+    - `reject`: raise a `QueueFullError`.
+    - `drop_oldest`: drop the oldest waiting task of the lowest priority (the next in \
+      line, without priorities) to make room for the new one, or the new one itself \
+      if its priority is lower than all of them.
+
+    Tasks run in submission order, unless they are given a `priority`: a higher one \
+    runs first. Waiting counts too, so low priority tasks are not starved: a task of \
+    priority `p` is considered as submitted `p * aging` seconds earlier than it was.
+    """
+
+    _max_workers: int
+    _max_queue: int
+    _backpressure: Backpressure
+    _name: str
+    _aging: float
+    _queue: List[Task]
+    _seq: Iterator[int]
+    _workers: List[Thread]
+    _idle: int
+    _active: int
+    _shutdown: bool
+    _lock: Condition
+    _not_full: Condition
+    _drained: Condition
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_queue: int = 0,
+        backpressure: Backpressure = "block",
+        name: str = "coleridge",
+        aging: float = 1.0,
+    ) -> None:
+        """
+        Initializes a new instance of the WorkerPool class.
+
+        Args:
+            max_workers (int): The maximum number of worker threads.
+            max_queue (int, optional): The maximum number of tasks waiting for a \
+                worker. Defaults to 0, which means unbounded.
+            backpressure (Literal["block", "reject", "drop_oldest"], optional): What \
+                to do when the queue is full. Defaults to "block".
+            name (str, optional): The prefix of the worker thread names. \
+                Defaults to "coleridge".
+            aging (float, optional): The seconds of waiting worth one level of priority. \
+                Defaults to 1.0.
+
+        Returns:
+            None
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        if max_queue < 0:
+            raise ValueError("max_queue cannot be negative")
+        if backpressure not in ("block", "reject", "drop_oldest"):
+            raise ValueError(f"Unknown backpressure policy {backpressure}")
+        self._max_workers = max_workers
+        self._max_queue = max_queue
+        self._backpressure = backpressure
+        self._name = name
+        self._aging = aging
+        self._queue = []
+        self._seq = count()
+        self._workers = []
+        self._idle = 0
+        self._active = 0
+        self._shutdown = False
+        lock = Lock()
+        self._lock = Condition(lock)
+        self._not_full = Condition(lock)
+        self._drained = Condition(lock)
+        register(self.shutdown)
+
+    @property
+    def max_workers(self) -> int:
+        """The maximum number of worker threads"""
+        return self._max_workers
+
+    @property
+    def max_queue(self) -> int:
+        """The maximum number of waiting tasks (0 means unbounded)"""
+        return self._max_queue
+
+    @property
+    def backpressure(self) -> Backpressure:
+        """The policy applied when the queue is full"""
+        return self._backpressure
+
+    @property
+    def aging(self) -> float:
+        """The seconds of waiting worth one level of priority"""
+        return self._aging
+
+    @property
+    def queue_depth(self) -> int:
+        """The number of tasks waiting for a worker"""
+        with self._lock:
+            return len(self._queue)
+
+    @property
+    def active_workers(self) -> int:
+        """The number of workers currently running a task"""
+        with self._lock:
+            return self._active
+
+    @property
+    def workers(self) -> int:
+        """The number of worker threads started so far"""
+        with self._lock:
+            return len(self._workers)
+
+    def _full(self) -> bool:
+        """Whether the queue is full. Must be called with the lock held."""
+        return 0 < self._max_queue <= len(self._queue)
+
+    def _evict(self) -> Callable[[Exception], None]:
+        """Remove the oldest waiting task of the lowest priority, and return its \
+        `on_drop`. Must be called with the lock held."""
+        victim = min(range(len(self._queue)), key=lambda i: (self._queue[i][2], self._queue[i][1]))
+        task = self._queue[victim]
+        self._queue[victim] = self._queue[-1]
+        self._queue.pop()
+        heapify(self._queue)
+        return task[4]
+
+    def _wait_for_room(self, timeout: Union[float, None]) -> None:
+        """Wait until the queue is not full. Must be called with the lock held."""
+        deadline = None if timeout is None else monotonic() + timeout
+        while self._full() and not self._shutdown:
+            remaining = None if deadline is None else deadline - monotonic()
+            if remaining is not None and remaining <= 0:
+                raise QueueFullError(f"The queue is still full after {timeout} seconds")
+            self._not_full.wait(remaining)
+        if self._shutdown:
+            raise RuntimeError("Cannot submit a task to a pool that is shut down")
+
+    def submit(
+        self,
+        func: Callable[[], None],
+        on_drop: Union[Callable[[Exception], None], None] = None,
+        timeout: Union[float, None] = None,
+        priority: int = 0,
+    ) -> None:
+        """
+        Submit a task to the pool.
+
+        Args:
+            func (Callable[[], None]): The task to run on a worker.
+            on_drop (Union[Callable[[Exception], None], None], optional): Called with a \
+                `QueueFullError` if the task is dropped by the "drop_oldest" \
+                policy, which can drop it right away if its priority is the lowest. \
+                Defaults to None.
+            timeout (Union[float, None], optional): How long to wait for a free slot \
+                with the "block" policy. Defaults to None, which waits forever.
+            priority (int, optional): The priority of the task, higher runs first. \
+                Defaults to 0.
+
+        Raises:
+            QueueFullError: If the task cannot be queued.
+            RuntimeError: If the pool is shut down.
+
+        Returns:
+            None
+        """
+        dropped: Union[Callable[[Exception], None], None] = None
+        evict = False
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("Cannot submit a task to a pool that is shut down")
+            if self._full():
+                if self._backpressure == "reject":
+                    raise QueueFullError(f"The queue is full ({self._max_queue} tasks)")
+                if self._backpressure == "drop_oldest":
+                    evict = True
+                else:
+                    self._wait_for_room(timeout)
+            heappush(
+                self._queue,
+                (
+                    monotonic() - priority * self._aging,
+                    next(self._seq),
+                    priority,
+                    func,
+                    on_drop if on_drop is not None else lambda x: None,
+                ),
+            )
+            if evict:
+                dropped = self._evict()
+            if len(self._queue) > self._idle and len(self._workers) < self._max_workers:
+                worker = Thread(
+                    target=self._work,
+                    name=f"{self._name}-worker-{len(self._workers)}",
+                    daemon=True,
+                )
+                self._workers.append(worker)
+                worker.start()
+            else:
+                self._lock.notify()
+        if dropped is not None:
+            dropped(QueueFullError("The task was dropped because the queue was full"))
+
+    def _work(self) -> None:
+        """Run queued tasks until the pool is shut down"""
+        while True:
+            with self._lock:
+                while not self._queue and not self._shutdown:
+                    self._idle += 1
+                    self._lock.wait()
+                    self._idle -= 1
+                if not self._queue:
+                    return
+                func = heappop(self._queue)[3]
+                self._active += 1
+                self._not_full.notify()
+            try:
+                func()
+            except Exception:  # pylint: disable=broad-except # nosec B110
+                pass
+            finally:
+                # An idle worker must not keep its last task (and what it holds) alive
+                del func
+                with self._lock:
+                    self._active -= 1
+                    if not self._active and not self._queue:
+                        self._drained.notify_all()
+
+    def join(self, timeout: Union[float, None] = None) -> bool:
+        """
+        Wait until there are no queued or running tasks.
+
+        Args:
+            timeout (Union[float, None], optional): The maximum time to wait, in seconds. \
+                Defaults to None, which waits forever.
+
+        Returns:
+            bool: True if the pool is idle, False if the timeout expired.
+        """
+        with self._lock:
+            return self._drained.wait_for(
+                lambda: not self._active and not self._queue, timeout
+            )
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop accepting tasks. Tasks that are already queued are still executed.
+
+        Args:
+            wait (bool, optional): Wait for the queued tasks to finish. Defaults to True.
+
+        Returns:
+            None
+        """
+        unregister(self.shutdown)
+        with self._lock:
+            self._shutdown = True
+            self._lock.notify_all()
+            self._not_full.notify_all()
+            workers = list(self._workers)
+        if wait:
+            for worker in workers:
+                worker.join()
+
+
+__all__ = ("WorkerPool", "QueueFullError", "Backpressure")
@@ -1,6 +1,7 @@
 """Get the types of the parameters and return values of a function."""
 
-from typing import Tuple, Callable, Type, Union, List, TypeVar
+from collections.abc import AsyncGenerator, AsyncIterator, Generator, Iterator
+from typing import Any, Tuple, Callable, Type, Union, List, TypeVar, cast, get_args, get_origin
 from inspect import signature
 from pydantic import BaseModel
 
@@ -8,27 +9,34 @@ T = TypeVar("T", bound=BaseModel)
 U = TypeVar("U", bound=BaseModel)
 
 
+_STREAMS = (Iterator, Generator, AsyncIterator, AsyncGenerator)
+
+
+def _unwrap(annotation: Any) -> Any:
+    """Get the model out of `Union[T, List[T]]`, `List[T]` or `T`, and out of the \
+    `Iterator[T]` or `AsyncIterator[T]` (or generator) of a generator function."""
+    if get_origin(annotation) in _STREAMS:
+        annotation = get_args(annotation)[0]
+    if get_origin(annotation) is Union:
+        annotation = get_args(annotation)[0]
+    if get_origin(annotation) in (list, List):
+        annotation = get_args(annotation)[0]
+    return annotation
+
+
 def get_params_type(
     func: Callable[[Union[T, List[T]]], Union[U, List[U]]]
 ) -> Tuple[Type[T], Type[U]]:
     """Get the types of the parameters and return values of a function."""
     sig = signature(func)
     key = list(sig.parameters.keys())[0]
-    first_param_type = sig.parameters[key].annotation
-    return_type = sig.return_annotation
-    if first_param_type is Union:
-        first_param_type = first_param_type.__args__[0]
-    elif first_param_type is List:
-        first_param_type = first_param_type.__args__[0]
-    if return_type is Union:
-        return_type = return_type.__args__[0]
-    elif return_type is List:
-        return_type = return_type.__args__[0]
-    if not issubclass(first_param_type, BaseModel):
+    first_param_type = _unwrap(sig.parameters[key].annotation)
+    return_type = _unwrap(sig.return_annotation)
+    if not isinstance(first_param_type, type) or not issubclass(first_param_type, BaseModel):
         raise TypeError(f"{first_param_type} is not a BaseModel")
-    if not issubclass(return_type, BaseModel):
+    if not isinstance(return_type, type) or not issubclass(return_type, BaseModel):
         raise TypeError(f"{return_type} is not a BaseModel")
-    return first_param_type, return_type
+    return cast(Type[T], first_param_type), cast(Type[U], return_type)
 
 
 __all__ = ("get_params_type",)
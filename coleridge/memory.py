@@ -0,0 +1,705 @@
+"""In-process broker, with the interface of the pika blocking adapter.
+
+It backs the "memory" mode: the functions follow the exact code path of the "rabbit" \
+mode (named queues, prefetch, acks, redelivery, replies), without a RabbitMQ server.
+"""
+
+from collections import deque
+from functools import partial
+from itertools import count
+from threading import Condition, Lock, Timer
+from time import monotonic, sleep
+from types import SimpleNamespace
+from typing import Any, Callable, Deque, Dict, List, Tuple, Union, cast
+from uuid import uuid4
+from pika import BlockingConnection
+from pika.spec import Basic
+from .pool import ConnectionPool
+
+Callback = Callable[[Any, Any, Any, Any], None]
+
+
+class _Message:  # pylint: disable=too-few-public-methods
+    """A message waiting in a queue"""
+
+    __slots__ = ("routing_key", "body", "properties", "redelivered", "priority", "seq")
+
+    def __init__(self, routing_key: str, body: Any, properties: Any, seq: int) -> None:
+        """Initializes a new instance of the _Message class."""
+        self.routing_key = routing_key
+        self.body = body
+        self.properties = properties
+        self.redelivered = False
+        self.priority = int(getattr(properties, "priority", None) or 0)
+        self.seq = seq
+
+
+class _Consumer:  # pylint: disable=too-few-public-methods
+    """A consumer registered on a queue"""
+
+    __slots__ = ("channel", "tag", "callback", "auto_ack")
+
+    def __init__(
+        self, channel: "MemoryChannel", tag: str, callback: Callback, auto_ack: bool
+    ) -> None:
+        """Initializes a new instance of the _Consumer class."""
+        self.channel = channel
+        self.tag = tag
+        self.callback = callback
+        self.auto_ack = auto_ack
+
+
+class _Queue:
+    """A named queue"""
+
+    def __init__(
+        self, name: str, max_priority: int, owner: Union["MemoryChannel", None]
+    ) -> None:
+        """Initializes a new instance of the _Queue class."""
+        self.name = name
+        self.max_priority = max_priority
+        self.owner = owner
+        self.messages: Deque[_Message] = deque()
+        self.consumers: List[_Consumer] = []
+        self.next_consumer = 0
+
+    def put(self, message: _Message) -> None:
+        """Queue a message, keeping higher priorities first. Like RabbitMQ, priorities \
+        above the maximum of the queue count as the maximum, and are ignored by queues \
+        without priorities."""
+        message.priority = max(min(message.priority, self.max_priority), 0)
+        if self.max_priority <= 0 or not self.messages:
+            self.messages.append(message)
+            return
+        index = len(self.messages)
+        while index > 0 and self.messages[index - 1].priority < message.priority:
+            index -= 1
+        self.messages.insert(index, message)
+
+
+class MemoryBroker:
+    """An in-process broker with named queues, prefetch, acks and redelivery.
+
+    Connections to the same broker see the same queues, exactly like connections \
+    to the same RabbitMQ server.
+    """
+
+    _lock: Lock
+    _queues: Dict[str, _Queue]
+    _seq: "count[int]"
+    _confirm_latency: float
+
+    def __init__(self, confirm_latency: float = 0.0) -> None:
+        """
+        Initializes a new instance of the MemoryBroker class.
+
+        Args:
+            confirm_latency (float, optional): How long, in seconds, the confirm of a \
+                message takes, to simulate the round trip to a remote broker. Defaults \
+                to 0.
+
+        Returns:
+            None
+        """
+        self._lock = Lock()
+        self._queues = {}
+        self._seq = count()
+        self._confirm_latency = confirm_latency
+
+    @property
+    def confirm_latency(self) -> float:
+        """How long the confirm of a message takes, in seconds"""
+        return self._confirm_latency
+
+    def connect(self) -> "MemoryConnection":
+        """
+        Open a connection to the broker.
+
+        Returns:
+            MemoryConnection: The connection.
+        """
+        return MemoryConnection(self)
+
+    def connection_pool(
+        self, max_connections: int = 4, channels_per_connection: int = 64
+    ) -> ConnectionPool:
+        """
+        Get a connection pool whose connections go to this broker.
+
+        Args:
+            max_connections (int, optional): The maximum number of connections. \
+                Defaults to 4.
+            channels_per_connection (int, optional): The maximum number of channels per \
+                connection. Defaults to 64.
+
+        Returns:
+            ConnectionPool: The pool, to pass as `connection_pool`.
+        """
+        return ConnectionPool(
+            max_connections,
+            channels_per_connection,
+            connect_with=lambda _: cast(BlockingConnection, self.connect()),
+        )
+
+    def queue_depth(self, queue: str) -> int:
+        """
+        Get the number of messages waiting in a queue.
+
+        Args:
+            queue (str): The name of the queue.
+
+        Returns:
+            int: The number of messages that are not delivered yet.
+        """
+        with self._lock:
+            return len(self._queues[queue].messages) if queue in self._queues else 0
+
+    def _declare(
+        self,
+        channel: "MemoryChannel",
+        queue: str,
+        exclusive: bool,
+        arguments: Union[Dict[str, Any], None],
+    ) -> _Queue:
+        """Declare a queue, if it does not exist yet."""
+        with self._lock:
+            if not queue:
+                queue = f"amq.gen-{uuid4()}"
+            if queue not in self._queues:
+                max_priority = int((arguments or {}).get("x-max-priority", 0))
+                self._queues[queue] = _Queue(
+                    queue, max_priority, channel if exclusive else None
+                )
+            return self._queues[queue]
+
+    def _delete(self, queue: str) -> None:
+        """Delete a queue and its messages."""
+        with self._lock:
+            self._queues.pop(queue, None)
+
+    def _publish(self, routing_key: str, body: Any, properties: Any) -> bool:
+        """Put a message in a queue. Returns False if there is no such queue."""
+        with self._lock:
+            queue = self._queues.get(routing_key)
+            if queue is None:
+                return False
+            queue.put(_Message(routing_key, body, properties, next(self._seq)))
+            deliveries = self._dispatch(queue)
+        self._deliver(deliveries)
+        return True
+
+    def _dispatch(
+        self, queue: _Queue
+    ) -> List[Tuple["MemoryChannel", _Consumer, int, _Message]]:
+        """Assign the waiting messages of a queue to its consumers. Needs the lock."""
+        deliveries: List[Tuple["MemoryChannel", _Consumer, int, _Message]] = []
+        while queue.messages and queue.consumers:
+            for _ in range(len(queue.consumers)):
+                queue.next_consumer = (queue.next_consumer + 1) % len(queue.consumers)
+                consumer = queue.consumers[queue.next_consumer]
+                if consumer.channel.can_receive():
+                    break
+            else:
+                break
+            message = queue.messages.popleft()
+            tag = consumer.channel.track(queue, message, consumer.auto_ack)
+            deliveries.append((consumer.channel, consumer, tag, message))
+        return deliveries
+
+    @staticmethod
+    def _deliver(deliveries: List[Tuple["MemoryChannel", _Consumer, int, _Message]]) -> None:
+        """Hand the deliveries over to the connections of the consumers."""
+        for channel, consumer, tag, message in deliveries:
+            method = SimpleNamespace(
+                consumer_tag=consumer.tag,
+                delivery_tag=tag,
+                redelivered=message.redelivered,
+                exchange="",
+                routing_key=message.routing_key,
+            )
+            channel.connection.add_callback_threadsafe(
+                partial(consumer.callback, channel, method, message.properties, message.body)
+            )
+
+    def _consume(self, queue: str, consumer: _Consumer) -> None:
+        """Register a consumer on a queue."""
+        with self._lock:
+            if queue not in self._queues:
+                raise ValueError(f"Queue {queue} does not exist")
+            self._queues[queue].consumers.append(consumer)
+            deliveries = self._dispatch(self._queues[queue])
+        self._deliver(deliveries)
+
+    def _cancel(self, queue: str, tag: str) -> None:
+        """Remove a consumer from a queue."""
+        with self._lock:
+            if queue in self._queues:
+                self._queues[queue].consumers = [
+                    c for c in self._queues[queue].consumers if c.tag != tag
+                ]
+
+    def _settle(
+        self,
+        channel: "MemoryChannel",
+        delivery_tag: int,
+        multiple: bool,
+        requeue: bool,
+    ) -> None:
+        """Ack or nack deliveries, requeueing them if needed, and redispatch."""
+        with self._lock:
+            # pylint: disable=protected-access
+            if multiple:
+                tags = [t for t in channel._unacked if delivery_tag in (0, t) or t < delivery_tag]
+            else:
+                tags = [delivery_tag]
+            settled = [channel._unacked.pop(t) for t in tags if t in channel._unacked]
+            if requeue:
+                for queue, message in reversed(settled):
+                    message.redelivered = True
+                    queue.messages.appendleft(message)
+            deliveries = self._redispatch(channel, [q for q, _ in settled])
+        self._deliver(deliveries)
+
+    def _redispatch(
+        self, channel: "MemoryChannel", queues: List[_Queue]
+    ) -> List[Tuple["MemoryChannel", _Consumer, int, _Message]]:
+        """Dispatch the queues touched by a channel. Needs the lock."""
+        # pylint: disable=protected-access
+        names = {q.name for q in queues} | set(channel._consumers.values())
+        deliveries = []
+        for name in names:
+            if name in self._queues:
+                deliveries.extend(self._dispatch(self._queues[name]))
+        return deliveries
+
+    def _close(self, channel: "MemoryChannel") -> None:
+        """Cancel the consumers of a channel, requeue its unacked messages and drop \
+        its exclusive queues."""
+        with self._lock:
+            # pylint: disable=protected-access
+            for tag, name in channel._consumers.items():
+                if name in self._queues:
+                    self._queues[name].consumers = [
+                        c for c in self._queues[name].consumers if c.tag != tag
+                    ]
+            settled = list(channel._unacked.values())
+            channel._unacked.clear()
+            for queue, message in reversed(settled):
+                message.redelivered = True
+                queue.messages.appendleft(message)
+            for name in [n for n, q in self._queues.items() if q.owner is channel]:
+                del self._queues[name]
+            deliveries = self._redispatch(channel, [q for q, _ in settled])
+            channel._consumers.clear()
+        self._deliver(deliveries)
+
+
+class MemoryConnection:
+    """A connection to a MemoryBroker, with the interface of a pika BlockingConnection.
+
+    Like with pika, the deliveries and the thread-safe callbacks run on the thread \
+    calling `process_data_events` (or `start_consuming` on one of the channels).
+    """
+
+    _broker: MemoryBroker
+    _events: Condition
+    _pending: Deque[Callable[[], None]]
+    _channels: List["MemoryChannel"]
+    _open: bool
+
+    def __init__(self, broker: MemoryBroker) -> None:
+        """
+        Initializes a new instance of the MemoryConnection class.
+
+        Args:
+            broker (MemoryBroker): The broker to connect to.
+
+        Returns:
+            None
+        """
+        self._broker = broker
+        self._events = Condition()
+        self._pending = deque()
+        self._channels = []
+        self._open = True
+
+    @property
+    def broker(self) -> MemoryBroker:
+        """The broker of the connection"""
+        return self._broker
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the connection is open"""
+        return self._open
+
+    @property
+    def is_closed(self) -> bool:
+        """Whether the connection is closed"""
+        return not self._open
+
+    def channel(self) -> "MemoryChannel":
+        """
+        Open a channel.
+
+        Returns:
+            MemoryChannel: The channel.
+        """
+        if not self._open:
+            raise ConnectionError("The connection is closed")
+        channel = MemoryChannel(self, len(self._channels) + 1)
+        self._channels.append(channel)
+        return channel
+
+    def add_callback_threadsafe(self, callback: Callable[[], None]) -> None:
+        """
+        Run a function on the thread processing the events of the connection.
+
+        Args:
+            callback (Callable[[], None]): The function.
+
+        Returns:
+            None
+        """
+        with self._events:
+            self._pending.append(callback)
+            self._events.notify()
+
+    def process_data_events(self, time_limit: Union[float, None] = 0) -> None:
+        """
+        Run the pending deliveries and callbacks.
+
+        Args:
+            time_limit (Union[float, None], optional): How long to wait for events if \
+                there are none. None waits until there is at least one. Defaults to 0.
+
+        Returns:
+            None
+        """
+        deadline = None if time_limit is None else monotonic() + time_limit
+        with self._events:
+            while not self._pending and self._open:
+                remaining = None if deadline is None else deadline - monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._events.wait(remaining)
+            pending, self._pending = self._pending, deque()
+        for callback in pending:
+            callback()
+
+    def sleep(self, duration: float) -> None:
+        """
+        Process events for a while.
+
+        Args:
+            duration (float): How long, in seconds.
+
+        Returns:
+            None
+        """
+        deadline = monotonic() + duration
+        while monotonic() < deadline:
+            self.process_data_events(deadline - monotonic())
+
+    def close(self) -> None:
+        """
+        Close the connection and its channels.
+
+        Returns:
+            None
+        """
+        for channel in list(self._channels):
+            channel.close()
+        with self._events:
+            self._open = False
+            self._events.notify_all()
+
+
+class MemoryChannel:  # pylint: disable=too-many-instance-attributes
+    """A channel of a MemoryConnection, with the interface of a pika BlockingChannel"""
+
+    _connection: MemoryConnection
+    _number: int
+    _prefetch: int
+    _tags: "count[int]"
+    _unacked: Dict[int, Tuple[_Queue, _Message]]
+    _consumers: Dict[str, str]
+    _open: bool
+    _consuming: bool
+    _confirm: bool
+    _on_confirm: Union[Callable[[Any], None], None]
+    _on_return: List[Callable[[Any, Any, Any, Any], None]]
+    _published: "count[int]"
+    _last_published: int
+    _confirming: bool
+    _confirm_lock: Lock
+
+    def __init__(self, connection: MemoryConnection, number: int) -> None:
+        """
+        Initializes a new instance of the MemoryChannel class.
+
+        Args:
+            connection (MemoryConnection): The connection of the channel.
+            number (int): The number of the channel.
+
+        Returns:
+            None
+        """
+        self._connection = connection
+        self._number = number
+        self._prefetch = 0
+        self._tags = count(1)
+        self._unacked = {}
+        self._consumers = {}
+        self._open = True
+        self._consuming = False
+        self._confirm = False
+        self._on_confirm = None
+        self._on_return = []
+        self._published = count(1)
+        self._last_published = 0
+        self._confirming = False
+        self._confirm_lock = Lock()
+
+    @property
+    def connection(self) -> MemoryConnection:
+        """The connection of the channel"""
+        return self._connection
+
+    @property
+    def channel_number(self) -> int:
+        """The number of the channel"""
+        return self._number
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the channel is open"""
+        return self._open and self._connection.is_open
+
+    @property
+    def is_closed(self) -> bool:
+        """Whether the channel is closed"""
+        return not self.is_open
+
+    @property
+    def consumer_tags(self) -> List[str]:
+        """The tags of the consumers of the channel"""
+        return list(self._consumers)
+
+    def can_receive(self) -> bool:
+        """Whether the channel is below its prefetch limit. Needs the broker lock."""
+        return self._open and (self._prefetch <= 0 or len(self._unacked) < self._prefetch)
+
+    def track(self, queue: _Queue, message: _Message, auto_ack: bool) -> int:
+        """Assign a delivery tag to a message. Needs the broker lock."""
+        tag = next(self._tags)
+        if not auto_ack:
+            self._unacked[tag] = (queue, message)
+        return tag
+
+    def _check(self) -> None:
+        """Raise an error if the channel is closed."""
+        if not self.is_open:
+            raise ConnectionError("The channel is closed")
+
+    def queue_declare(  # noqa: PLR0913 # pylint: disable=too-many-arguments,unused-argument
+        self,
+        queue: str = "",
+        passive: bool = False,
+        durable: bool = False,
+        exclusive: bool = False,
+        auto_delete: bool = False,
+        arguments: Union[Dict[str, Any], None] = None,
+    ) -> SimpleNamespace:
+        """Declare a queue. An empty name generates a unique one."""
+        self._check()
+        declared = self._connection.broker._declare(  # pylint: disable=protected-access
+            self, queue, exclusive, arguments
+        )
+        return SimpleNamespace(
+            method=SimpleNamespace(
+                queue=declared.name,
+                message_count=len(declared.messages),
+                consumer_count=len(declared.consumers),
+            )
+        )
+
+    def queue_delete(self, queue: str) -> None:
+        """Delete a queue."""
+        self._check()
+        self._connection.broker._delete(queue)  # pylint: disable=protected-access
+
+    def basic_qos(self, prefetch_size: int = 0, prefetch_count: int = 0) -> None:
+        """Limit the number of unacked deliveries of the channel."""
+        # pylint: disable=unused-argument
+        self._check()
+        self._prefetch = prefetch_count
+
+    def confirm_delivery(
+        self,
+        ack_nack_callback: Union[Callable[[Any], None], None] = None,
+        callback: Union[Callable[[Any], None], None] = None,
+    ) -> None:
+        """Enable publisher confirms. Like pika's blocking channel, publishing waits for \
+        the `confirm_latency` of the broker; with `ack_nack_callback`, like pika's \
+        asynchronous channel, it does not wait, and the broker acks all the messages \
+        received during a round trip at once, through the events of the connection."""
+        # pylint: disable=unused-argument
+        self._check()
+        self._confirm = True
+        self._on_confirm = ack_nack_callback
+
+    def add_on_return_callback(self, callback: Callable[[Any, Any, Any, Any], None]) -> None:
+        """Call a function with the unroutable mandatory messages, in confirm mode."""
+        self._on_return.append(callback)
+
+    def _confirm_later(self, tag: int) -> None:
+        """Ack a published message, with the ones published meanwhile, once the \
+        `confirm_latency` of the broker elapsed."""
+        if self._connection.broker.confirm_latency <= 0:
+            self._confirmed(tag, False)
+            return
+        with self._confirm_lock:
+            self._last_published = tag
+            if self._confirming:
+                return
+            self._confirming = True
+        self._round_trip(tag)
+
+    def _round_trip(self, tag: int) -> None:
+        """Ack the messages up to `tag` after the `confirm_latency` of the broker."""
+        timer = Timer(self._connection.broker.confirm_latency, self._confirmed, (tag, True))
+        timer.daemon = True
+        timer.start()
+
+    def _confirmed(self, tag: int, multiple: bool) -> None:
+        """Hand an ack over to the connection, and start the next round trip if needed."""
+        if self._on_confirm is not None and self.is_open:
+            frame = SimpleNamespace(method=Basic.Ack(delivery_tag=tag, multiple=multiple))
+            self._connection.add_callback_threadsafe(partial(self._on_confirm, frame))
+        if not multiple:
+            return
+        with self._confirm_lock:
+            if self._last_published == tag or not self.is_open:
+                self._confirming = False
+                return
+            tag = self._last_published
+        self._round_trip(tag)
+
+    def basic_publish(  # pylint: disable=too-many-arguments
+        self,
+        exchange: str,
+        routing_key: str,
+        body: Any,
+        properties: Any = None,
+        mandatory: bool = False,
+    ) -> None:
+        """Publish a message to the queue named `routing_key`."""
+        self._check()
+        routed = self._connection.broker._publish(  # pylint: disable=protected-access
+            routing_key, body, properties
+        )
+        if self._on_confirm is not None:
+            if mandatory and not routed:
+                method = Basic.Return(312, "NO_ROUTE", exchange, routing_key)
+                for callback in self._on_return:
+                    self._connection.add_callback_threadsafe(
+                        partial(callback, self, method, properties, body)
+                    )
+            self._confirm_later(next(self._published))
+            return
+        if self._confirm and self._connection.broker.confirm_latency > 0:
+            sleep(self._connection.broker.confirm_latency)
+        if mandatory and not routed:
+            raise LookupError(f"Queue {routing_key} does not exist")
+
+    def basic_consume(  # noqa: PLR0913 # pylint: disable=too-many-arguments
+        self,
+        queue: str,
+        on_message_callback: Callback,
+        auto_ack: bool = False,
+        exclusive: bool = False,
+        consumer_tag: Union[str, None] = None,
+        arguments: Union[Dict[str, Any], None] = None,
+    ) -> str:
+        """Start consuming a queue."""
+        # pylint: disable=unused-argument
+        self._check()
+        tag = consumer_tag or f"ctag{self._number}.{uuid4().hex}"
+        self._consumers[tag] = queue
+        self._connection.broker._consume(  # pylint: disable=protected-access
+            queue, _Consumer(self, tag, on_message_callback, auto_ack)
+        )
+        return tag
+
+    def basic_cancel(self, consumer_tag: str = "") -> None:
+        """Stop a consumer."""
+        queue = self._consumers.pop(consumer_tag, None)
+        if queue is not None:
+            self._connection.broker._cancel(queue, consumer_tag)  # pylint: disable=protected-access
+
+    def basic_ack(self, delivery_tag: int = 0, multiple: bool = False) -> None:
+        """Acknowledge a delivery."""
+        self._connection.broker._settle(  # pylint: disable=protected-access
+            self, delivery_tag, multiple, False
+        )
+
+    def basic_nack(
+        self, delivery_tag: int = 0, multiple: bool = False, requeue: bool = True
+    ) -> None:
+        """Reject a delivery, requeueing it by default."""
+        self._connection.broker._settle(  # pylint: disable=protected-access
+            self, delivery_tag, multiple, requeue
+        )
+
+    def basic_reject(self, delivery_tag: int = 0, requeue: bool = True) -> None:
+        """Reject a delivery, requeueing it by default."""
+        self.basic_nack(delivery_tag, False, requeue)
+
+    def start_consuming(self) -> None:
+        """Process the events of the connection until `stop_consuming` is called."""
+        self._consuming = True
+        while self._consuming and self.is_open and self._consumers:
+            self._connection.process_data_events(time_limit=1)
+
+    def stop_consuming(self, consumer_tag: Union[str, None] = None) -> None:
+        """Cancel the consumers and stop `start_consuming`."""
+        for tag in [consumer_tag] if consumer_tag else list(self._consumers):
+            self.basic_cancel(tag)
+        self._consuming = False
+        self._connection.add_callback_threadsafe(lambda: None)
+
+    def close(self) -> None:
+        """Close the channel, requeueing the unacked deliveries."""
+        if not self._open:
+            return
+        self._connection.broker._close(self)  # pylint: disable=protected-access
+        self._open = False
+
+
+_default_broker = MemoryBroker()
+_default_pool: Union[ConnectionPool, None] = None
+_default_lock = Lock()
+
+
+def get_memory_broker() -> MemoryBroker:
+    """Get the process-wide memory broker."""
+    return _default_broker
+
+
+def get_memory_pool() -> ConnectionPool:
+    """Get the process-wide pool of connections to the memory broker."""
+    global _default_pool  # pylint: disable=global-statement # noqa: PLW0603
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = _default_broker.connection_pool()
+        return _default_pool
+
+
+__all__ = (
+    "MemoryBroker",
+    "MemoryConnection",
+    "MemoryChannel",
+    "get_memory_broker",
+    "get_memory_pool",
+)
@@ -0,0 +1,367 @@
+"""Metrics of the decorated functions, and their Prometheus exporter"""
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock, Thread
+from time import perf_counter
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Sequence,
+)
+from .models.response import ResultModel
+from .models.stats import FunctionMetrics, HistogramStats
+
+if TYPE_CHECKING:  # pragma: no cover
+    from http.server import ThreadingHTTPServer
+
+Timing = Literal["queue_wait", "execution", "deserialization", "callback"]
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+SENT_HEADER = "x-coleridge-sent"
+
+_TIMINGS: Sequence[Timing] = ("queue_wait", "execution", "deserialization", "callback")
+_COUNTERS = (
+    ("submitted", "counter", "Tasks submitted by this process"),
+    ("succeeded", "counter", "Tasks submitted by this process that succeeded"),
+    ("failed", "counter", "Tasks submitted by this process that failed"),
+    ("in_flight", "gauge", "Tasks submitted by this process and not finished yet"),
+    ("execution_errors", "counter", "Errors raised by the function in this process"),
+)
+_HELP: Dict[Timing, str] = {
+    "queue_wait": "Time between the submission of a task and the start of its execution",
+    "execution": "Time spent running the function",
+    "deserialization": "Time spent decoding and validating inputs and outputs",
+    "callback": "Time spent in the on_finish, on_finish_signal and on_error callbacks",
+}
+
+
+def function_name(func: Callable[..., Any]) -> str:
+    """
+    Get the name identifying a function in the metrics.
+
+    Args:
+        func (Callable[..., Any]): The function.
+
+    Returns:
+        str: `module.qualname`.
+    """
+    qualname = getattr(func, "__qualname__", None) or type(func).__qualname__
+    return f"{getattr(func, '__module__', None) or '__main__'}.{qualname}"
+
+
+class _Histogram:
+    """A histogram with fixed buckets. Not thread safe."""
+
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    bounds: Sequence[float]
+    counts: List[int]
+    count: int
+    sum: float
+
+    def __init__(self, bounds: Sequence[float]) -> None:
+        """Initializes a new instance of the _Histogram class."""
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Add an observation."""
+        index = bisect_left(self.bounds, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> HistogramStats:
+        """Get the cumulative counts."""
+        buckets = []
+        total = 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            buckets.append((bound, total))
+        return HistogramStats(buckets=buckets, count=self.count, sum=self.sum)
+
+
+class MetricsRecorder:
+    """Collects the metrics of a decorated function.
+
+    The counters cover the tasks submitted by this process (with `run`), the histograms \
+    cover whatever runs in this process: a producer of rabbit functions only records \
+    the decoding of the replies and its callbacks, a worker records the queue wait, the \
+    decoding and the execution of the messages it handles.
+    """
+
+    _name: str
+    _lock: Lock
+    _submitted: int
+    _succeeded: int
+    _failed: int
+    _execution_errors: int
+    _histograms: Dict[Timing, _Histogram]
+
+    def __init__(self, name: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        """
+        Initializes a new instance of the MetricsRecorder class.
+
+        Args:
+            name (str): The name of the function.
+            buckets (Sequence[float], optional): The upper bounds of the histogram \
+                buckets, in seconds. Defaults to `DEFAULT_BUCKETS`.
+
+        Returns:
+            None
+        """
+        self._name = name
+        self._lock = Lock()
+        self._submitted = 0
+        self._succeeded = 0
+        self._failed = 0
+        self._execution_errors = 0
+        bounds = sorted(buckets)
+        self._histograms = {timing: _Histogram(bounds) for timing in _TIMINGS}
+
+    @property
+    def name(self) -> str:
+        """The name of the function"""
+        return self._name
+
+    def track(self, entry: ResultModel[Any]) -> None:
+        """
+        Count a submitted task, and its outcome once it is completed.
+
+        Args:
+            entry (ResultModel[Any]): The result of the task.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._submitted += 1
+        entry.add_done_callback(lambda: self._completed(entry.error is None))
+
+    def _completed(self, success: bool) -> None:
+        """Count the outcome of a task."""
+        with self._lock:
+            if success:
+                self._succeeded += 1
+            else:
+                self._failed += 1
+
+    def execution_error(self) -> None:
+        """
+        Count an error raised by the function.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._execution_errors += 1
+
+    def observe(self, timing: Timing, seconds: float) -> None:
+        """
+        Record a duration.
+
+        Args:
+            timing (Literal["queue_wait", "execution", "deserialization", "callback"]): \
+                What was timed.
+            seconds (float): The duration.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._histograms[timing].observe(max(seconds, 0.0))
+
+    @contextmanager
+    def time(self, timing: Timing) -> Iterator[None]:
+        """
+        Record the duration of a block, even if it raises.
+
+        Args:
+            timing (Literal["queue_wait", "execution", "deserialization", "callback"]): \
+                What is timed.
+
+        Returns:
+            Iterator[None]: The context manager.
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(timing, perf_counter() - start)
+
+    def snapshot(self) -> FunctionMetrics:
+        """
+        Get the current metrics.
+
+        Returns:
+            FunctionMetrics: The metrics.
+        """
+        with self._lock:
+            return FunctionMetrics(
+                name=self._name,
+                submitted=self._submitted,
+                succeeded=self._succeeded,
+                failed=self._failed,
+                in_flight=self._submitted - self._succeeded - self._failed,
+                execution_errors=self._execution_errors,
+                **{timing: hist.snapshot() for timing, hist in self._histograms.items()},
+            )
+
+
+def _label(value: str) -> str:
+    """Escape a label value."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    """Format a number, the Prometheus way."""
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(metrics: Iterable[FunctionMetrics]) -> str:
+    """
+    Render metrics in the Prometheus text exposition format.
+
+    Args:
+        metrics (Iterable[FunctionMetrics]): The metrics of the functions.
+
+    Returns:
+        str: The text.
+    """
+    snapshots = list(metrics)
+    lines: List[str] = []
+    for counter, kind, description in _COUNTERS:
+        name = f"coleridge_tasks_{counter}" + ("_total" if kind == "counter" else "")
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for snap in snapshots:
+            lines.append(f'{name}{{function="{_label(snap.name)}"}} {getattr(snap, counter)}')
+    for timing in _TIMINGS:
+        name = f"coleridge_{timing}_seconds"
+        lines.append(f"# HELP {name} {_HELP[timing]}")
+        lines.append(f"# TYPE {name} histogram")
+        for snap in snapshots:
+            hist: HistogramStats = getattr(snap, timing)
+            label = f'function="{_label(snap.name)}"'
+            for bound, count in hist.buckets:
+                lines.append(f'{name}_bucket{{{label},le="{_number(bound)}"}} {count}')
+            lines.append(f'{name}_bucket{{{label},le="+Inf"}} {hist.count}')
+            lines.append(f"{name}_sum{{{label}}} {_number(hist.sum)}")
+            lines.append(f"{name}_count{{{label}}} {hist.count}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serves metrics over HTTP, in the Prometheus text format, at `/metrics`.
+
+    ```python
+    server = MetricsServer(lambda: [func.metrics.snapshot()], port=9464)
+    ```
+
+    The HTTP server (and `http.server`) is only imported when a server is started.
+    """
+
+    _server: "ThreadingHTTPServer"
+    _thread: Thread
+
+    def __init__(
+        self,
+        source: Callable[[], Iterable[FunctionMetrics]],
+        port: int = 9464,
+        host: str = "127.0.0.1",
+    ) -> None:
+        """
+        Initializes a new instance of the MetricsServer class, and starts serving.
+
+        Args:
+            source (Callable[[], Iterable[FunctionMetrics]]): Gets the metrics to serve.
+            port (int, optional): The port. Defaults to 9464, 0 picks a free one.
+            host (str, optional): The address to listen on. Defaults to "127.0.0.1".
+
+        Returns:
+            None
+        """
+        # pylint: disable=import-outside-toplevel
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class _Handler(BaseHTTPRequestHandler):
+            """Serve the metrics"""
+
+            def do_GET(self) -> None:  # noqa: N802 # pylint: disable=invalid-name
+                """Serve the metrics, or 404."""
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = render_prometheus(source()).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+                """Do not log the requests."""
+                # pylint: disable=redefined-builtin
+
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._thread = Thread(
+            target=self._server.serve_forever, name="coleridge-metrics", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def port(self) -> int:
+        """The port the server listens on"""
+        return int(self._server.server_address[1])
+
+    @property
+    def url(self) -> str:
+        """The URL of the metrics"""
+        return f"http://{self._server.server_address[0]!s}:{self.port}/metrics"
+
+    def close(self) -> None:
+        """
+        Stop serving.
+
+        Returns:
+            None
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+
+__all__ = (
+    "DEFAULT_BUCKETS",
+    "MetricsRecorder",
+    "MetricsServer",
+    "function_name",
+    "render_prometheus",
+)
@@ -3,11 +3,16 @@
 from .connection import Connection
 from .empty import Empty
 from .response import ResultModel
+from .stats import FunctionMetrics, HistogramStats, JobStats, StoreStats
 from .value import Value
 
 __all__ = (
     "Connection",
     "Empty",
     "ResultModel",
+    "StoreStats",
+    "JobStats",
+    "HistogramStats",
+    "FunctionMetrics",
     "Value",
 )
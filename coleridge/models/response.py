@@ -1,8 +1,10 @@
 """Response model"""
 
 from datetime import datetime
-from typing import Union, TypeVar, Generic, List
-from pydantic import BaseModel
+from threading import Event, Lock
+from typing import Callable, Union, TypeVar, Generic, List
+from pydantic import BaseModel, PrivateAttr
+from ..streaming import ItemStream
 
 T = TypeVar("T", bound=BaseModel)
 
@@ -14,11 +16,136 @@ class ResultModel(BaseModel, Generic[T]):
     started: Union[datetime, None] = None
     completed: Union[datetime, None] = None
     error: Union[Exception, None] = None
+    _done: Event = PrivateAttr(default_factory=Event)
+    _lock: Lock = PrivateAttr(default_factory=Lock)
+    _callbacks: List[Callable[[], None]] = PrivateAttr(default_factory=list)
+    _stream: Union[ItemStream[T], None] = PrivateAttr(default=None)
+    _items: Union[List[T], None] = PrivateAttr(default=None)
+    _max_items: int = PrivateAttr(default=64)
 
     class Config:  # pylint: disable=too-few-public-methods
         """Pydantic config"""
 
         arbitrary_types_allowed = True
 
+    @property
+    def item_stream(self) -> Union[ItemStream[T], None]:
+        """The items of a generator function, streamed while it runs, if any"""
+        return self._stream
+
+    def expect_items(self, max_items: int = 64) -> None:
+        """
+        Collect the items of a generator function, until a consumer opens a stream.
+
+        Args:
+            max_items (int, optional): The maximum number of items buffered by the \
+                stream, once it is opened. Defaults to 64.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._items = []
+            self._max_items = max_items
+
+    def add_item(self, item: T) -> bool:
+        """
+        Hand an item of a generator function over to the stream, waiting while it is \
+        full, or add it to the collected items if no stream is open.
+
+        Args:
+            item (T): The item.
+
+        Returns:
+            bool: False if the stream is closed and the item was refused.
+        """
+        with self._lock:
+            stream = self._stream
+            if stream is None:
+                if self._items is not None:
+                    self._items.append(item)
+                return True
+        return stream.put(item)
+
+    def take_items(self) -> List[T]:
+        """
+        Stop collecting the items, which become the result of the generator function.
+
+        Returns:
+            List[T]: The items collected while no stream was open.
+        """
+        with self._lock:
+            items, self._items = self._items, None
+        return items if items is not None else []
+
+    def open_stream(self) -> Union[ItemStream[T], None]:
+        """
+        Stream the items of a generator function through a bounded buffer, starting \
+        with the items collected so far. The stream is finished when the execution \
+        is completed.
+
+        Returns:
+            Union[ItemStream[T], None]: The stream, or None if the items are not \
+                collected, or not anymore.
+        """
+        with self._lock:
+            if self._stream is None and self._items is not None and not self._done.is_set():
+                self._stream = ItemStream(self._max_items, self._items)
+                self._items = []
+            return self._stream
+
+    def set_completed(self, completed: Union[datetime, None] = None) -> None:
+        """
+        Mark the execution as completed and wake up whoever is waiting for it.
+
+        Args:
+            completed (Union[datetime, None], optional): When the execution was completed. \
+                Defaults to None, which means now.
+
+        Returns:
+            None
+        """
+        self.completed = completed if completed is not None else datetime.now()
+        with self._lock:
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+            stream = self._stream
+        if stream is not None:
+            stream.finish()
+        for callback in callbacks:
+            callback()
+
+    def add_done_callback(self, callback: Callable[[], None]) -> None:
+        """
+        Call a function once the execution is completed.
+
+        The function is called by the thread completing the execution, or right away \
+        if the execution is already completed.
+
+        Args:
+            callback (Callable[[], None]): The function to call.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def wait(self, timeout: Union[float, None] = None) -> bool:
+        """
+        Block until the execution is completed.
+
+        Args:
+            timeout (Union[float, None], optional): The maximum time in seconds to wait. \
+                Defaults to None, which waits forever.
+
+        Returns:
+            bool: True if the execution is completed, False if the timeout expired.
+        """
+        return self._done.wait(timeout)
+
 
 __all__ = ("ResultModel",)
@@ -0,0 +1,85 @@
+"""Statistics models"""
+
+from typing import List, Tuple, Union
+from pydantic import BaseModel, Field
+
+
+class StoreStats(BaseModel):
+    """Statistics of a result store"""
+
+    entries: int = 0
+    bytes: int = 0
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    persisted: int = 0
+
+
+class JobStats(BaseModel):
+    """Statistics of a cron job"""
+
+    runs: int = 0
+    failures: int = 0
+    skipped: int = 0
+    misfires: int = 0
+    running: int = 0
+    last_latency: Union[float, None] = None
+    max_latency: float = 0.0
+    last_duration: Union[float, None] = None
+
+
+class HistogramStats(BaseModel):
+    """Snapshot of a histogram of durations, in seconds.
+
+    `buckets` maps every upper bound to the number of observations less than or equal \
+    to it, as in Prometheus. The observations above the last bound only count in `count`.
+    """
+
+    buckets: List[Tuple[float, int]] = Field(default_factory=list)
+    count: int = 0
+    sum: float = 0.0
+
+    @property
+    def mean(self) -> Union[float, None]:
+        """The mean of the observations"""
+        return self.sum / self.count if self.count else None
+
+    def quantile(self, q: float) -> Union[float, None]:
+        """
+        Estimate a quantile, interpolating inside its bucket like Prometheus does.
+
+        Args:
+            q (float): The quantile, between 0 and 1.
+
+        Returns:
+            Union[float, None]: The estimate, or None without observations.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        lower, below = 0.0, 0
+        for bound, cumulative in self.buckets:
+            if cumulative >= rank:
+                inside = cumulative - below
+                return lower + (bound - lower) * ((rank - below) / inside if inside else 0)
+            lower, below = bound, cumulative
+        return lower
+
+
+class FunctionMetrics(BaseModel):
+    """Metrics of a decorated function"""
+
+    name: str
+    submitted: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    in_flight: int = 0
+    execution_errors: int = 0
+    queue_wait: HistogramStats = Field(default_factory=HistogramStats)
+    execution: HistogramStats = Field(default_factory=HistogramStats)
+    deserialization: HistogramStats = Field(default_factory=HistogramStats)
+    callback: HistogramStats = Field(default_factory=HistogramStats)
+
+
+__all__ = ("StoreStats", "JobStats", "HistogramStats", "FunctionMetrics")
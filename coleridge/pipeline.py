@@ -0,0 +1,295 @@
+"""Pipelines of decorated functions"""
+
+from datetime import datetime
+from uuid import uuid4
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+    cast,
+)
+from pydantic import BaseModel
+from .dispatch import CompletionDispatcher, get_dispatcher
+from .metrics import MetricsRecorder
+from .models.response import ResultModel
+from .result import ExecutionResult as Result, stream
+from .store import MemoryResultStore, ResultStore
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .decorated import DecoratedBackgroundFunction
+    from .rabbit import RabbitBackgroundFunction
+
+T = TypeVar("T", bound=BaseModel)
+U = TypeVar("U", bound=BaseModel)
+V = TypeVar("V", bound=BaseModel)
+
+Stage = Union["DecoratedBackgroundFunction[Any, Any]", "RabbitBackgroundFunction[Any, Any]"]
+
+
+class Pipeline(Generic[T, U]):
+    """Decorated functions chained together: the output of each stage is the input of \
+    the next one, and the whole chain has a single result.
+
+    ```python
+    pipeline = parse | enrich | store
+    result = pipeline.run(RawEvent(...))
+    ```
+
+    The stages are checked when the pipeline is built: the output type of each stage \
+    must be the input type of the next one. The models are handed over as they are \
+    from one stage to the next, so only the stages in "rabbit" or "process" mode \
+    serialize them, at their own boundary. The next stage is started by the \
+    callback threads of the dispatcher, never by the thread finishing the previous one.
+    """
+
+    _stages: Tuple[Stage, ...]
+    _store: ResultStore
+    _dispatcher: Union[CompletionDispatcher, None]
+    _metrics: MetricsRecorder
+    _on_finish: Callable[[Union[U, List[U]]], None]
+    _on_error: Callable[[Exception], None]
+    _on_finish_signal: Callable[[], None]
+
+    def __init__(
+        self,
+        *stages: Union[Stage, "Pipeline[Any, Any]"],
+        result_store: Union[ResultStore, None] = None,
+        dispatcher: Union[CompletionDispatcher, None] = None,
+    ) -> None:
+        """
+        Initializes a new instance of the Pipeline class.
+
+        Args:
+            stages: The decorated functions, or other pipelines, in order.
+            result_store: The store keeping the results of the pipeline. Defaults to \
+                None, which creates a `MemoryResultStore`.
+            dispatcher: The dispatcher running the callbacks and starting the stages. \
+                Defaults to None, which uses the process-wide one.
+
+        Raises:
+            ValueError: If there are no stages.
+            TypeError: If the output type of a stage is not the input type of the next one.
+
+        Returns:
+            None
+        """
+        flat: List[Stage] = []
+        for stage in stages:
+            flat.extend(stage.stages if isinstance(stage, Pipeline) else [stage])
+        if not flat:
+            raise ValueError("A pipeline needs at least one stage")
+        for previous, following in zip(flat, flat[1:]):
+            if not issubclass(previous.output_type, following.input_type):
+                raise TypeError(
+                    f"{previous.metrics.name} returns {previous.output_type.__name__}, "
+                    f"but {following.metrics.name} expects {following.input_type.__name__}"
+                )
+        self._stages = tuple(flat)
+        self._store = result_store if result_store is not None else MemoryResultStore()
+        self._dispatcher = dispatcher
+        self._metrics = MetricsRecorder(" | ".join(stage.metrics.name for stage in flat))
+
+        self._on_finish = lambda x: None
+        self._on_error = lambda x: None
+        self._on_finish_signal = lambda: None
+
+    @property
+    def stages(self) -> Tuple[Stage, ...]:
+        """The decorated functions of the pipeline, in order"""
+        return self._stages
+
+    @property
+    def metrics(self) -> MetricsRecorder:
+        """The metrics of the pipeline as a whole"""
+        return self._metrics
+
+    @property
+    def input_type(self) -> Type[T]:
+        """The type of the input of the first stage"""
+        return cast(Type[T], self._stages[0].input_type)
+
+    @property
+    def output_type(self) -> Type[U]:
+        """The type of the output of the last stage"""
+        return cast(Type[U], self._stages[-1].output_type)
+
+    @property
+    def on_finish(self) -> Callable[[Union[U, List[U]]], None]:
+        """Get a function to be called when the pipeline is finished with a result"""
+        return self._on_finish
+
+    @on_finish.setter
+    def on_finish(self, value: Callable[[Union[U, List[U]]], None]) -> None:
+        """Set a function to be called when the pipeline is finished with a result"""
+        self._on_finish = value
+
+    @property
+    def on_error(self) -> Callable[[Exception], None]:
+        """Get a function to be called when a stage raises an exception"""
+        return self._on_error
+
+    @on_error.setter
+    def on_error(self, value: Callable[[Exception], None]) -> None:
+        """Set a function to be called when a stage raises an exception"""
+        self._on_error = value
+
+    @property
+    def on_finish_signal(self) -> Callable[[], None]:
+        """Get a function to be called when the pipeline is finished"""
+        return self._on_finish_signal
+
+    @on_finish_signal.setter
+    def on_finish_signal(self, value: Callable[[], None]) -> None:
+        """Set a function to be called when the pipeline is finished"""
+        self._on_finish_signal = value
+
+    @property
+    def result_store(self) -> ResultStore:
+        """The store keeping the results of the pipeline"""
+        return self._store
+
+    def __or__(
+        self,
+        other: Union[
+            "DecoratedBackgroundFunction[U, V]", "RabbitBackgroundFunction[U, V]", "Pipeline[U, V]"
+        ],
+    ) -> "Pipeline[T, V]":
+        """Append a stage (or another pipeline) to the pipeline."""
+        return Pipeline(self, other, result_store=self._store, dispatcher=self._dispatcher)
+
+    def _start(self, index: int, value: Any, entry: ResultModel[U]) -> None:
+        """Run a stage, and hand its result over to the next one once it is finished."""
+        res = self._stages[index].run(value)
+        dispatcher = self._dispatcher if self._dispatcher is not None else get_dispatcher()
+        res.add_done_callback(
+            lambda finished: dispatcher.submit(lambda: self._advance(index, finished, entry))
+        )
+
+    def _advance(self, index: int, finished: Result[Any], entry: ResultModel[U]) -> None:
+        """Start the stage after a finished one, or complete the pipeline."""
+        if finished.error is not None:
+            entry.error = finished.error
+        elif index + 1 < len(self._stages):
+            try:
+                self._start(index + 1, finished.result, entry)
+                return
+            except Exception as ex:  # pylint: disable=broad-except
+                entry.error = ex
+        else:
+            entry.result = cast("Union[U, List[U], None]", finished.result)
+        entry.set_completed()
+
+    def run(
+        self,
+        input_value: Union[T, List[T], str],
+        timeout: Union[float, None] = None,
+    ) -> Result[U]:
+        """
+        Run the pipeline with the given input value and optional timeout.
+
+        Args:
+            input_value: The input value of the first stage.
+            timeout: The maximum time in seconds to wait for the whole pipeline \
+                before `on_error` is called with a `TimeoutError`.
+
+        Raises:
+            QueueFullError: If the first stage cannot be queued.
+
+        Returns:
+            A Result object representing the outcome of the last stage, or the error \
+                of the first stage failing.
+        """
+        uuid = str(uuid4())
+        entry: ResultModel[U] = ResultModel(started=datetime.now())
+        self._store.put(uuid, entry)
+
+        try:
+            self._start(0, input_value, entry)
+        except Exception:
+            self._store.discard(uuid)
+            raise
+        self._metrics.track(entry)
+        res: Result[U] = Result(
+            uuid,
+            self,
+            self._on_finish,
+            self._on_error,
+            self._on_finish_signal,
+            timeout,
+            entry,
+        )
+        res.connect(self._dispatcher)
+        return res
+
+    def map(
+        self,
+        iterable: Iterable[Union[T, List[T], str]],
+        chunk_size: int = 64,
+        ordered: bool = False,
+        timeout: Union[float, None] = None,
+    ) -> Iterator[Union[U, List[U]]]:
+        """
+        Run the pipeline for every input and yield the results as they finish, with at \
+        most `chunk_size` of them in flight.
+
+        Args:
+            iterable: The input values, for example a generator.
+            chunk_size: The maximum number of pipelines in flight. Defaults to 64.
+            ordered: Yield the results in the order of the inputs. Defaults to False.
+            timeout: The maximum time in seconds to wait for the next result.
+
+        Raises:
+            TimeoutError: If no result finishes within the timeout.
+            Exception: The first error raised by a stage.
+
+        Returns:
+            An iterator over the results.
+        """
+        return stream(self.run, iterable, chunk_size, ordered, timeout)
+
+    async def run_async(
+        self,
+        input_value: Union[T, List[T], str],
+        timeout: Union[float, None] = None,
+    ) -> Union[U, List[U]]:
+        """
+        Run the pipeline and wait for its result without blocking the event loop.
+
+        Args:
+            input_value: The input value of the first stage.
+            timeout: The maximum time in seconds to wait for the pipeline to complete.
+
+        Raises:
+            TimeoutError: If the pipeline is not finished within the timeout.
+            Exception: The error raised by a stage, if any.
+
+        Returns:
+            The result of the last stage.
+        """
+        return await self.run(input_value, timeout).get_async(timeout)
+
+    def __getitem__(self, key: str) -> ResultModel[U]:
+        """Get the result."""
+        entry = self._store.get(key)
+        if entry is None:
+            raise KeyError(key)
+        return cast("ResultModel[U]", entry)
+
+    def __setitem__(self, key: str, value: ResultModel[U]) -> None:
+        """Set the result."""
+        self._store.put(key, value)
+
+    def __delitem__(self, key: str) -> None:
+        """Delete the result."""
+        self._store.discard(key)
+
+
+__all__ = ("Pipeline", "Stage")
@@ -0,0 +1,396 @@
+"""Connection pool shared by the rabbit functions"""
+
+from logging import getLogger
+from pathlib import Path
+from threading import Event, Lock, Thread, current_thread
+from time import sleep
+from typing import Any, Callable, Dict, List, Tuple, TypeVar, Union, cast
+from yaml import load, SafeLoader
+from pika import BlockingConnection, ConnectionParameters, PlainCredentials
+from pika.adapters.blocking_connection import BlockingChannel
+from pika.exceptions import AMQPConnectionError
+from .models.connection import Connection
+
+R = TypeVar("R")
+
+logger = getLogger(__name__)
+
+
+def resolve_connection(connection_settings: Union[Connection, None, str, Path]) -> Connection:
+    """
+    Resolve the connection settings, loading them from a yaml file if needed.
+
+    Args:
+        connection_settings (Union[Connection, None, str, Path]): The settings, the path \
+            of a yaml file with a `rabbit` section, or None for the defaults.
+
+    Returns:
+        Connection: The connection settings.
+    """
+    if connection_settings is None:
+        connection_settings = Connection()
+    if isinstance(connection_settings, str):
+        connection_settings = Path(connection_settings)
+    if isinstance(connection_settings, Path):
+        if not connection_settings.exists():
+            raise FileNotFoundError(f"File {connection_settings} does not exist")
+        with open(connection_settings, "r", encoding="utf-8") as _f:
+            _settings = load(_f, Loader=SafeLoader)
+            if not isinstance(_settings, dict):
+                raise TypeError(f"{_settings} is not a dict")
+            _settings = cast(Dict[str, Any], _settings)
+            if "rabbit" not in _settings:
+                raise ValueError(f"{_settings} does not contain 'rabbit'")
+            _settings = cast(Dict[str, Any], _settings["rabbit"])
+            if not isinstance(_settings, dict):
+                raise TypeError(f"{_settings} is not a dict")
+            _settings = cast(Dict[str, Any], _settings)
+            connection_settings = Connection.model_validate(_settings)
+    return connection_settings
+
+
+def connect(connection_settings: Connection) -> BlockingConnection:
+    """
+    Open a connection to RabbitMQ, retrying as configured in the settings.
+
+    Args:
+        connection_settings (Connection): The connection settings.
+
+    Returns:
+        BlockingConnection: The connection.
+    """
+    _username: Union[str, None] = connection_settings.username
+    _password: Union[str, None] = connection_settings.password
+    _credentials: PlainCredentials
+    if (
+        _username is None
+        or _username.strip() == ""
+        or _password is None
+        or _password.strip() == ""
+    ):
+        _credentials = ConnectionParameters.DEFAULT_CREDENTIALS
+    else:
+        _credentials = PlainCredentials(_username, _password)
+    _retries: int = max(connection_settings.retries, 1)
+    _sleep_between: float = max(connection_settings.time_between_retries, 0.1)
+    for _i in range(_retries):
+        try:
+            return BlockingConnection(
+                ConnectionParameters(
+                    host=connection_settings.host,
+                    port=connection_settings.port,
+                    credentials=_credentials,
+                )
+            )
+        except AMQPConnectionError as _e:
+            if (_i + 1) == _retries:
+                raise _e
+            sleep(_sleep_between)
+    raise AMQPConnectionError(f"Cannot connect to {connection_settings.host}")
+
+
+class PooledConnection:
+    """A broker connection shared by several channels.
+
+    pika connections are not thread safe, so every connection has its own IO thread \
+    processing its events (deliveries included), and the operations on its channels \
+    are marshalled to that thread with `call` or `call_soon`.
+    """
+
+    _client: BlockingConnection
+    _channels: int
+    _running: bool
+    _thread: Thread
+    _lock: Lock
+    _stopped: bool
+    _on_close: List[Callable[[], None]]
+
+    def __init__(self, client: BlockingConnection) -> None:
+        """
+        Initializes a new instance of the PooledConnection class.
+
+        Args:
+            client (BlockingConnection): The connection to drive.
+
+        Returns:
+            None
+        """
+        self._client = client
+        self._channels = 0
+        self._running = True
+        self._lock = Lock()
+        self._stopped = False
+        self._on_close = []
+        self._thread = Thread(target=self._loop, name="coleridge-io", daemon=True)
+        self._thread.start()
+
+    @property
+    def client(self) -> BlockingConnection:
+        """The pika connection"""
+        return self._client
+
+    @property
+    def channels(self) -> int:
+        """The number of channels handed out"""
+        return self._channels
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the connection is open and its IO thread is running"""
+        return self._running and bool(self._client.is_open) and self._thread.is_alive()
+
+    def _loop(self) -> None:
+        """Process the events of the connection until it is closed."""
+        while self._running:
+            try:
+                self._client.process_data_events(time_limit=1)
+            except Exception as ex:  # pylint: disable=broad-except
+                if self._running:
+                    logger.warning(f"Lost the connection to the broker: {ex}")
+                self._running = False
+        with self._lock:
+            self._stopped = True
+            callbacks, self._on_close = self._on_close, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("A connection close callback failed")
+
+    def add_close_callback(self, callback: Callable[[], None]) -> None:
+        """
+        Call a function once the connection is lost or closed, from its IO thread, or \
+        right away if it is already.
+
+        Args:
+            callback (Callable[[], None]): The function to call.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if not self._stopped:
+                self._on_close.append(callback)
+                return
+        callback()
+
+    def call(self, func: Callable[[], R]) -> R:
+        """
+        Run a function on the IO thread and wait for its result.
+
+        Args:
+            func (Callable[[], R]): The function, usually doing something with a channel.
+
+        Raises:
+            ConnectionError: If the connection is lost before the function runs.
+
+        Returns:
+            R: The return value of the function.
+        """
+        if current_thread() is self._thread:
+            return func()
+        done = Event()
+        outcome: List[Tuple[bool, Any]] = []
+
+        def _run() -> None:
+            try:
+                outcome.append((True, func()))
+            except BaseException as ex:  # pylint: disable=broad-except
+                outcome.append((False, ex))
+            finally:
+                done.set()
+
+        self.call_soon(_run)
+        while not done.wait(1.0):
+            if not self._thread.is_alive():
+                raise ConnectionError("The connection to the broker was lost")
+        success, value = outcome[0]
+        if not success:
+            raise value
+        return cast(R, value)
+
+    def call_soon(self, func: Callable[[], None]) -> None:
+        """
+        Run a function on the IO thread, without waiting for it.
+
+        Args:
+            func (Callable[[], None]): The function.
+
+        Raises:
+            ConnectionError: If the connection is closed.
+
+        Returns:
+            None
+        """
+        if not self.is_open:
+            raise ConnectionError("The connection to the broker is closed")
+        self._client.add_callback_threadsafe(func)
+
+    def open_channel(self) -> BlockingChannel:
+        """
+        Open a new channel on the connection.
+
+        Returns:
+            BlockingChannel: The channel.
+        """
+        channel = self.call(self._client.channel)
+        self._channels += 1
+        return channel
+
+    def close_channel(self, channel: BlockingChannel) -> None:
+        """
+        Close a channel of the connection.
+
+        Args:
+            channel (BlockingChannel): The channel.
+
+        Returns:
+            None
+        """
+        self._channels = max(self._channels - 1, 0)
+        if self.is_open and channel.is_open:
+            self.call(channel.close)
+
+    def close(self) -> None:
+        """
+        Close the connection and stop its IO thread.
+
+        Returns:
+            None
+        """
+        if not self._running:
+            return
+        if current_thread() is self._thread:
+            self._running = False
+            self._client.close()
+            return
+        try:
+            self.call(self._client.close)
+        finally:
+            self._running = False
+            self._thread.join(timeout=5)
+
+
+class ConnectionPool:
+    """A pool of broker connections, keyed by the connection settings.
+
+    Channels are opened on the least busy connection. A new connection is only opened \
+    when all of them have `channels_per_connection` channels, and never more than \
+    `max_connections` per broker. Dead connections are dropped and replaced.
+    """
+
+    _max_connections: int
+    _channels_per_connection: int
+    _connect: Callable[[Connection], BlockingConnection]
+    _connections: Dict[str, List[PooledConnection]]
+    _lock: Lock
+
+    def __init__(
+        self,
+        max_connections: int = 4,
+        channels_per_connection: int = 64,
+        connect_with: Callable[[Connection], BlockingConnection] = connect,
+    ) -> None:
+        """
+        Initializes a new instance of the ConnectionPool class.
+
+        Args:
+            max_connections (int, optional): The maximum number of connections to each \
+                broker. Defaults to 4.
+            channels_per_connection (int, optional): The number of channels after which \
+                a new connection is opened. Defaults to 64.
+            connect_with (Callable[[Connection], BlockingConnection], optional): Opens a \
+                connection. Defaults to `connect`.
+
+        Returns:
+            None
+        """
+        if max_connections < 1:
+            raise ValueError("max_connections must be at least 1")
+        self._max_connections = max_connections
+        self._channels_per_connection = max(channels_per_connection, 1)
+        self._connect = connect_with
+        self._connections = {}
+        self._lock = Lock()
+
+    @property
+    def max_connections(self) -> int:
+        """The maximum number of connections to each broker"""
+        return self._max_connections
+
+    @property
+    def connections(self) -> int:
+        """The number of open connections"""
+        with self._lock:
+            return sum(
+                1 for conns in self._connections.values() for conn in conns if conn.is_open
+            )
+
+    def get_connection(self, connection_settings: Connection) -> PooledConnection:
+        """
+        Get the connection a new channel should be opened on.
+
+        Args:
+            connection_settings (Connection): The settings of the broker.
+
+        Returns:
+            PooledConnection: The connection.
+        """
+        key = connection_settings.model_dump_json()
+        with self._lock:
+            conns = [c for c in self._connections.get(key, []) if c.is_open]
+            self._connections[key] = conns
+            best = min(conns, key=lambda c: c.channels, default=None)
+            if best is not None and (
+                best.channels < self._channels_per_connection
+                or len(conns) >= self._max_connections
+            ):
+                return best
+            conn = PooledConnection(self._connect(connection_settings))
+            conns.append(conn)
+            return conn
+
+    def acquire(
+        self, connection_settings: Connection
+    ) -> Tuple[PooledConnection, BlockingChannel]:
+        """
+        Open a channel to a broker.
+
+        Args:
+            connection_settings (Connection): The settings of the broker.
+
+        Returns:
+            Tuple[PooledConnection, BlockingChannel]: The connection and the channel.
+        """
+        conn = self.get_connection(connection_settings)
+        return conn, conn.open_channel()
+
+    def close(self) -> None:
+        """
+        Close all the connections.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            conns = [c for cs in self._connections.values() for c in cs]
+            self._connections = {}
+        for conn in conns:
+            conn.close()
+
+
+_default_pool = ConnectionPool()
+
+
+def get_connection_pool() -> ConnectionPool:
+    """Get the process-wide connection pool."""
+    return _default_pool
+
+
+__all__ = (
+    "ConnectionPool",
+    "PooledConnection",
+    "connect",
+    "get_connection_pool",
+    "resolve_connection",
+)
@@ -0,0 +1,164 @@
+"""Decorated function running in a process pool"""
+
+from asyncio import run
+from concurrent.futures import Future, ProcessPoolExecutor
+from importlib import import_module
+from inspect import isasyncgen, isawaitable, isgenerator
+from time import time
+from typing import Any, Callable, List, Tuple, Type, TypeVar, Union, cast
+from pydantic import BaseModel
+from .codecs import get_adapter
+from .decorated import DecoratedBackgroundFunction
+from .get_types import get_params_type
+from .models.response import ResultModel
+from .dispatch import CompletionDispatcher
+from .store import ResultStore
+from .streaming import gather_items
+
+T = TypeVar("T", bound=BaseModel)
+U = TypeVar("U", bound=BaseModel)
+
+
+def _resolve(module: str, qualname: str) -> Any:
+    """Import a function by its module and qualified name."""
+    obj: Any = import_module(module)
+    for part in qualname.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+def _execute(module: str, qualname: str, payload: bytes) -> Tuple[float, float, bytes]:
+    """
+    Run a decorated function inside a worker process.
+
+    The function is looked up by name, so only the JSON payloads cross the process \
+    boundary.
+
+    Args:
+        module (str): The module of the decorated function.
+        qualname (str): The qualified name of the decorated function.
+        payload (bytes): The input value, as JSON.
+
+    Returns:
+        Tuple[float, float, bytes]: When the execution started and ended, as \
+            timestamps, and the output value, as JSON.
+    """
+    started = time()
+    func = _resolve(module, qualname)
+    if isinstance(func, DecoratedBackgroundFunction):
+        input_type, output_type, func = func.input_type, func.output_type, func.func
+    else:
+        input_type, output_type = get_params_type(func)
+    output = func(get_adapter(input_type).validate_json(payload))
+    if isasyncgen(output):
+        output = gather_items(output)
+    if isgenerator(output):
+        output = list(output)
+    if isawaitable(output):
+        output = run(output)  # type: ignore[arg-type]
+    return started, time(), get_adapter(output_type).dump_json(output)
+
+
+class ProcessBackgroundFunction(DecoratedBackgroundFunction[T, U]):
+    """Decorated function running in a process pool, for CPU-bound work.
+
+    The function must be defined at module level, so the worker processes can \
+    import it. Inputs and outputs are sent to and from the workers as JSON. The items \
+    of generator functions are collected by the worker into a list, which is the result.
+    """
+
+    _pool: ProcessPoolExecutor
+
+    def __init__(  # noqa: PLR0913
+        self,
+        func: Callable[[Union[T, List[T]]], Union[U, List[U]]],
+        input_type: Type[T],
+        output_type: Type[U],
+        pool: ProcessPoolExecutor,
+        result_store: Union[ResultStore, None] = None,
+        dispatcher: Union[CompletionDispatcher, None] = None,
+        batch_size: int = 1,
+        batch_linger_ms: float = 0,
+    ) -> None:
+        """
+        Initializes a new instance of the ProcessBackgroundFunction class.
+
+        Args:
+            func: A callable function that takes a single argument of type T or a list of T \
+                and returns a single value of type U or a list of U.
+            input_type: The type of the input argument.
+            output_type: The type of the output value.
+            pool: The process pool running the tasks.
+            result_store: The store keeping the results of the tasks. Defaults to None, \
+                which creates a `MemoryResultStore`.
+            dispatcher: The dispatcher running the callbacks of the tasks. Defaults to \
+                None, which uses the process-wide one.
+            batch_size: The maximum number of inputs sent together, as a list, to the \
+                function. Defaults to 1, which calls it once per input.
+            batch_linger_ms: The maximum time in milliseconds an input waits for its \
+                batch to fill up. Defaults to 0.
+
+        Returns:
+            None
+        """
+        if "<locals>" in func.__qualname__:
+            raise TypeError(
+                f"{func.__qualname__} must be defined at module level to run in a process"
+            )
+        super().__init__(
+            func,
+            input_type,
+            output_type,
+            result_store=result_store,
+            dispatcher=dispatcher,
+            batch_size=batch_size,
+            batch_linger_ms=batch_linger_ms,
+        )
+        self._pool = pool
+        self._streaming = False
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        """The process pool running the tasks"""
+        return self._pool
+
+    def _collect(self, future: "Future[Tuple[float, float, bytes]]", entry: ResultModel[U]) -> None:
+        """Store the outcome of a task once the worker process is done with it."""
+        try:
+            started, ended, output = future.result()
+            if entry.started is not None:
+                self._metrics.observe("queue_wait", started - entry.started.timestamp())
+            self._metrics.observe("execution", ended - started)
+            with self._metrics.time("deserialization"):
+                entry.result = cast(
+                    "Union[U, List[U], None]",
+                    self._output_adapter.validate_json(output),
+                )
+        except Exception as ex:  # pylint: disable=broad-except
+            entry.error = ex
+            if not future.cancelled() and future.exception() is not None:
+                self._metrics.execution_error()
+        finally:
+            entry.set_completed()
+
+    def _honors_priority(self) -> bool:
+        """The process pool runs the tasks in submission order."""
+        return False
+
+    def _submit(
+        self, input_value: Union[T, List[T], str], entry: ResultModel[U], priority: int = 0
+    ) -> None:
+        """Serialize the input and hand the task over to the process pool, which runs \
+        the tasks in submission order whatever their priority."""
+        payload: bytes
+        if isinstance(input_value, str):
+            payload = input_value.encode("utf-8")
+        else:
+            payload = self._input_adapter.dump_json(input_value)
+        future = self._pool.submit(
+            _execute, self.func.__module__, self.func.__qualname__, payload
+        )
+        future.add_done_callback(lambda f: self._collect(f, entry))
+
+
+__all__ = ("ProcessBackgroundFunction",)
@@ -0,0 +1,313 @@
+"""Batched publisher, with optional publisher confirms"""
+
+from functools import partial
+from threading import Condition, Lock
+from typing import Any, Callable, Dict, List, Tuple, Union
+from pika import BasicProperties
+from pika.adapters.blocking_connection import BlockingChannel, ReturnedMessage
+from pika.exceptions import NackError, UnroutableError
+from pika.spec import Basic
+from .batching import Batcher
+from .models.connection import Connection
+from .pool import ConnectionPool, PooledConnection
+
+Message = Tuple[bytes, BasicProperties]
+Buffered = Tuple[bytes, BasicProperties, Callable[[Exception], None]]
+Unconfirmed = Tuple[Union[str, None], List[Union[Exception, None]], int]
+
+
+def _asynchronous(channel: BlockingChannel) -> Any:
+    """The channel publishing without waiting for the confirms: pika's blocking channel \
+    wraps an asynchronous one, the memory channel does both."""
+    return getattr(channel, "_impl", channel)
+
+
+class Publisher:  # pylint: disable=too-many-instance-attributes
+    """Publishes the messages of a queue through a dedicated channel.
+
+    Messages can be published right away (`publish_many`) or buffered (`publish`) and \
+    sent in batches, when `batch_size` messages are waiting or the oldest one has \
+    waited `linger` seconds. A batch is sent in one go on the IO thread of the \
+    connection, and the queue is only declared once per channel.
+
+    With `confirm`, the channel is in confirm mode and the messages are mandatory, so \
+    unroutable or rejected messages fail. The messages are published without waiting \
+    for their confirm: the delivery tags are tracked, and the broker acks (or nacks) \
+    them as they arrive, usually many at once, so a batch waits for about one round \
+    trip to the broker, not one per message.
+    """
+
+    _pool: ConnectionPool
+    _settings: Connection
+    _declare: Callable[[BlockingChannel], None]
+    _routing_key: str
+    _connection: Union[PooledConnection, None]
+    _channel: Union[BlockingChannel, None]
+    _lock: Lock
+    _batcher: Batcher[Buffered]
+    _declared: bool
+    _confirm: bool
+    _confirmed: Condition
+    _unconfirmed: Dict[int, Unconfirmed]
+    _returned: Dict[Union[str, None], Exception]
+    _published: int
+
+    def __init__(  # noqa: PLR0913
+        self,
+        pool: ConnectionPool,
+        connection_settings: Connection,
+        routing_key: str,
+        declare: Callable[[BlockingChannel], None],
+        batch_size: int = 1,
+        linger: float = 0.0,
+        confirm: bool = False,
+    ) -> None:
+        """
+        Initializes a new instance of the Publisher class.
+
+        Args:
+            pool (ConnectionPool): The pool the channel is taken from.
+            connection_settings (Connection): The settings of the broker.
+            routing_key (str): The queue the messages are sent to.
+            declare (Callable[[BlockingChannel], None]): Declares the queue.
+            batch_size (int, optional): The number of buffered messages sent together. \
+                Defaults to 1.
+            linger (float, optional): The maximum time in seconds a buffered message \
+                waits for its batch to fill up. Defaults to 0.
+            confirm (bool, optional): Whether to wait for the broker to confirm every \
+                message. Defaults to False.
+
+        Returns:
+            None
+        """
+        self._pool = pool
+        self._settings = connection_settings
+        self._routing_key = routing_key
+        self._declare = declare
+        self._connection = None
+        self._channel = None
+        self._lock = Lock()
+        self._batcher = Batcher(self._send, batch_size, linger, name="coleridge-publisher")
+        self._declared = False
+        self._confirm = confirm
+        self._confirmed = Condition(Lock())
+        self._unconfirmed = {}
+        self._returned = {}
+        self._published = 0
+
+    @property
+    def buffered(self) -> bool:
+        """Whether `publish` buffers the messages"""
+        return self._batcher.batch_size > 1 or self._batcher.linger > 0
+
+    @property
+    def confirm(self) -> bool:
+        """Whether the broker confirms every message"""
+        return self._confirm
+
+    def _ensure(self) -> Tuple[PooledConnection, BlockingChannel]:
+        """Get the connection and the publisher channel, opening them if needed."""
+        with self._lock:
+            if (
+                self._connection is None
+                or self._channel is None
+                or not self._connection.is_open
+                or not self._channel.is_open
+            ):
+                connection, channel = self._pool.acquire(self._settings)
+                if self._confirm:
+                    self._fail_unconfirmed()
+                    connection.call(partial(self._select, channel))
+                self._connection, self._channel = connection, channel
+                self._declared = False
+            return self._connection, self._channel
+
+    def _select(self, channel: BlockingChannel) -> None:
+        """Put a new channel in confirm mode. Runs on the IO thread."""
+        self._published = 0
+        target = _asynchronous(channel)
+        target.confirm_delivery(ack_nack_callback=partial(self._on_confirm, target))
+        target.add_on_return_callback(self._on_return)
+
+    def _on_return(self, _channel: Any, method: Any, properties: Any, body: bytes) -> None:
+        """Remember an unroutable message, the broker acks it right after."""
+        self._returned[properties.message_id] = UnroutableError(
+            [ReturnedMessage(method, properties, body)]
+        )
+
+    def _on_confirm(self, target: Any, frame: Any) -> None:
+        """Settle the messages acked or nacked by the broker."""
+        if self._channel is None or _asynchronous(self._channel) is not target:
+            return
+        method = frame.method
+        with self._confirmed:
+            if method.multiple:
+                tags = [t for t in self._unconfirmed if t <= method.delivery_tag]
+            else:
+                tags = [method.delivery_tag]
+            for tag in tags:
+                if tag not in self._unconfirmed:
+                    continue
+                message_id, errors, index = self._unconfirmed.pop(tag)
+                returned = self._returned.pop(message_id, None)
+                errors[index] = NackError([]) if isinstance(method, Basic.Nack) else returned
+            self._confirmed.notify_all()
+
+    def _fail_unconfirmed(self) -> None:
+        """Fail the messages still waiting for a confirm, when their channel is lost."""
+        with self._confirmed:
+            for _, errors, index in self._unconfirmed.values():
+                errors[index] = ConnectionError(
+                    "The publisher channel was closed before the broker confirmed the message"
+                )
+            self._unconfirmed.clear()
+            self._returned.clear()
+            self._confirmed.notify_all()
+
+    def _wait_confirms(
+        self, connection: PooledConnection, channel: BlockingChannel, tags: List[int]
+    ) -> None:
+        """Wait until the broker confirms the messages, or their channel is lost."""
+        with self._confirmed:
+            while any(t in self._unconfirmed for t in tags):
+                if not connection.is_open or not channel.is_open:
+                    break
+                self._confirmed.wait(1)
+            else:
+                return
+        self._fail_unconfirmed()
+
+    def _send_on(
+        self,
+        channel: BlockingChannel,
+        messages: List[Message],
+        errors: List[Union[Exception, None]],
+        tags: List[int],
+    ) -> None:
+        """Publish messages, collecting the errors and the delivery tags waiting for a \
+        confirm. Runs on the IO thread."""
+        if not self._declared:
+            self._declare(channel)
+            self._declared = True
+        target = _asynchronous(channel) if self._confirm else channel
+        for index, (body, properties) in enumerate(messages):
+            if not channel.is_open:
+                errors[index] = ConnectionError("The publisher channel was closed")
+                continue
+            try:
+                target.basic_publish(
+                    exchange="",
+                    routing_key=self._routing_key,
+                    body=body,
+                    properties=properties,
+                    mandatory=self._confirm,
+                )
+            except Exception as ex:  # pylint: disable=broad-except
+                errors[index] = ex
+                continue
+            if self._confirm:
+                self._published += 1
+                with self._confirmed:
+                    self._unconfirmed[self._published] = (properties.message_id, errors, index)
+                tags.append(self._published)
+
+    def publish_many(self, messages: List[Message]) -> List[Union[Exception, None]]:
+        """
+        Publish messages right away, waiting for the broker to confirm them in \
+        confirm mode.
+
+        Args:
+            messages (List[Tuple[bytes, BasicProperties]]): The bodies and the \
+                properties of the messages.
+
+        Returns:
+            List[Union[Exception, None]]: For each message, the error preventing its \
+                delivery, or None if it was published (and confirmed, in confirm mode).
+        """
+        try:
+            connection, channel = self._ensure()
+        except Exception as ex:  # pylint: disable=broad-except
+            return [ex for _ in messages]
+
+        errors: List[Union[Exception, None]] = [None for _ in messages]
+        tags: List[int] = []
+        try:
+            connection.call(partial(self._send_on, channel, messages, errors, tags))
+        except Exception as ex:  # pylint: disable=broad-except
+            if tags:
+                self._fail_unconfirmed()
+            return [ex for _ in messages]
+        if tags:
+            self._wait_confirms(connection, channel, tags)
+        return errors
+
+    def publish(
+        self,
+        body: bytes,
+        properties: BasicProperties,
+        on_error: Callable[[Exception], None],
+    ) -> None:
+        """
+        Publish a message. If the publisher is buffered, the message is only queued \
+        and sent with the next batch.
+
+        Args:
+            body (bytes): The body of the message.
+            properties (BasicProperties): The properties of the message.
+            on_error (Callable[[Exception], None]): Called if the message cannot be \
+                delivered.
+
+        Raises:
+            RuntimeError: If the publisher is closed.
+
+        Returns:
+            None
+        """
+        if not self.buffered:
+            error = self.publish_many([(body, properties)])[0]
+            if error is not None:
+                on_error(error)
+            return
+        self._batcher.add((body, properties, on_error))
+
+    def _send(self, batch: List[Buffered]) -> None:
+        """Publish a batch and report the failures."""
+        errors = self.publish_many([(body, properties) for body, properties, _ in batch])
+        for (_, _, on_error), error in zip(batch, errors):
+            if error is not None:
+                on_error(error)
+
+    def redeclare(self) -> None:
+        """
+        Declare the queue again before the next message, for example after deleting it.
+
+        Returns:
+            None
+        """
+        self._declared = False
+
+    def flush(self) -> None:
+        """
+        Send the buffered messages right away.
+
+        Returns:
+            None
+        """
+        self._batcher.flush()
+
+    def close(self) -> None:
+        """
+        Send the buffered messages and close the publisher channel.
+
+        Returns:
+            None
+        """
+        self._batcher.close()
+        with self._lock:
+            if self._connection is not None and self._channel is not None:
+                self._connection.close_channel(self._channel)
+            self._connection, self._channel = None, None
+        self._fail_unconfirmed()
+
+
+__all__ = ("Publisher",)
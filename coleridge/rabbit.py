@@ -1,10 +1,11 @@
 """Module for RabbitMQ utilities
 """
 
+from asyncio import get_running_loop
 from pathlib import Path
 from datetime import datetime
 from typing import (
-    AnyStr,
+    TYPE_CHECKING,
     List,
     Union,
     Any,
@@ -12,31 +13,46 @@ from typing import (
     Type,
     Generic,
     TypeVar,
-    Dict,
+    Iterable,
+    Iterator,
+    Tuple,
     cast,
 )
-from time import sleep
 from uuid import uuid4
-from pickle import dumps, loads  # nosec B403
-from json import loads as json_loads
-from threading import Thread
-from yaml import load, SafeLoader
-from pika import BlockingConnection, ConnectionParameters, PlainCredentials
+from threading import Event, Lock
+from time import time
+from pika import BasicProperties, BlockingConnection
 from pika.adapters.blocking_connection import BlockingChannel
-from pika.exceptions import AMQPConnectionError
 from pydantic import BaseModel
+from .aio import call_blocking
+from .codecs import Codec, PickleCodec, get_codec
+from .executor import WorkerPool
+from .metrics import SENT_HEADER, MetricsRecorder, function_name
 from .models.connection import Connection
+from .pool import ConnectionPool, PooledConnection, get_connection_pool, resolve_connection
+from .publisher import Publisher
+from .dispatch import CompletionDispatcher
+from .store import MemoryResultStore, ResultStore
+from .reply import ReplyConsumer, error_headers, get_reply_consumer, reply_error
 from .models.response import ResultModel
-from .result import ExecutionResult as Result
+from .pipeline import Pipeline
+from .result import ExecutionResult as Result, stream
 
 T = TypeVar("T", bound=BaseModel)
 U = TypeVar("U", bound=BaseModel)
+V = TypeVar("V", bound=BaseModel)
+R = TypeVar("R")
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .decorated import DecoratedBackgroundFunction
 
 
 class RabbitBackgroundFunction(Generic[T, U]):
     """Background function using RabbitMQ"""
 
-    _data: Dict[str, ResultModel[U]]
+    _store: ResultStore
+    _dispatcher: Union[CompletionDispatcher, None]
+    _metrics: MetricsRecorder
     _input_type: Type[T]
     _output_type: Type[U]
     _on_finish: Callable[[Union[U, List[U]]], None]
@@ -44,20 +60,48 @@ class RabbitBackgroundFunction(Generic[T, U]):
     _on_finish_signal: Callable[[], None]
     func: Callable[[Union[T, List[T]]], Union[U, List[U]]]
     _queue: str
-    _client: BlockingConnection
-    _channel: BlockingChannel
-
-    def __init__(  # noqa: C901, PLR0912, PLR0915
+    _codec: Codec
+    _settings: Connection
+    _pool: ConnectionPool
+    _connection: Union[PooledConnection, None]
+    _channel: Union[BlockingChannel, None]
+    _consumers: List[str]
+    _handler: WorkerPool
+    _lock: Lock
+    _stopped: Event
+    _publisher: Publisher
+    _prefetch_count: Union[int, None]
+    _consume_lock: Lock
+    _replies: ReplyConsumer
+    _auto_consume: bool
+    _max_priority: Union[int, None]
+
+    def __init__(  # noqa: PLR0913
         self,
         func: Callable[[Union[T, List[T]]], Union[U, List[U]]],
         input_type: Type[T],
         output_type: Type[U],
         connection_settings: Union[Connection, None, str, Path] = None,
         queue: Union[str, None] = None,
+        codec: Union[str, Codec] = "json",
+        connection_pool: Union[ConnectionPool, None] = None,
+        publish_batch_size: int = 1,
+        publish_linger_ms: float = 0,
+        publisher_confirms: bool = False,
+        concurrency: int = 1,
+        prefetch_count: Union[int, None] = None,
+        consume: bool = True,
+        result_store: Union[ResultStore, None] = None,
+        dispatcher: Union[CompletionDispatcher, None] = None,
+        max_priority: Union[int, None] = None,
     ) -> None:
         """
         Initializes a new instance of the RabbitBackgroundFunction class.
 
+        The channel is only opened, on a connection shared through the connection pool, \
+        when the function is used for the first time. The results are sent back by the \
+        consumers, wherever they run, to a reply queue shared by the whole process.
+
         Args:
             func (Callable[[Union[T, List[T]]], Union[U, List[U]]]): The function to be \
                 executed in the background.
@@ -66,71 +110,73 @@ class RabbitBackgroundFunction(Generic[T, U]):
             connection_settings (Union[Connection, None, str, Path], optional): The connection \
                 settings for the RabbitMQ server. Defaults to None.
             queue (Union[str, None], optional): The name of the queue to use. Defaults to None.
+            codec (Union[str, Codec], optional): The codec of the messages: "json", \
+                "msgpack" or "pickle" (legacy, only use it with a broker you trust). \
+                Defaults to "json".
+            connection_pool (Union[ConnectionPool, None], optional): The pool the channel \
+                is taken from. Defaults to None, which uses the process-wide pool.
+            publish_batch_size (int, optional): The number of messages published \
+                together by `run`. Defaults to 1, which publishes every message right away.
+            publish_linger_ms (float, optional): The maximum time in milliseconds a message \
+                waits for its batch to fill up. Defaults to 0.
+            publisher_confirms (bool, optional): Whether to wait for the broker to \
+                confirm every message, failing the tasks whose message is unroutable or \
+                rejected. It costs a round trip to the broker per message. Defaults to False.
+            concurrency (int, optional): The number of messages handled at the same time. \
+                Defaults to 1.
+            prefetch_count (Union[int, None], optional): The maximum number of messages \
+                delivered but not acknowledged yet. Defaults to None, which is twice the \
+                concurrency.
+            consume (bool, optional): Whether `run` also starts consuming the queue in \
+                this process. Set it to False in producers whose tasks are handled by \
+                workers. Defaults to True.
+            result_store (Union[ResultStore, None], optional): The store keeping the \
+                results of the tasks. Defaults to None, which creates a `MemoryResultStore`.
+            dispatcher (Union[CompletionDispatcher, None], optional): The dispatcher \
+                running the callbacks of the tasks. Defaults to None, which uses the \
+                process-wide one.
+            max_priority (Union[int, None], optional): The highest message priority, \
+                declaring the queue with `x-max-priority`. An existing queue must have \
+                been declared with the same value. Defaults to None, which declares a \
+                queue without priorities.
 
         Returns:
             None
         """
-        _host: str
-        if connection_settings is None:
-            connection_settings = Connection()
-        if isinstance(connection_settings, str):
-            connection_settings = Path(connection_settings)
-        if isinstance(connection_settings, Path):
-            if not connection_settings.exists():
-                raise FileNotFoundError(f"File {connection_settings} does not exist")
-            with open(connection_settings, "r", encoding="utf-8") as _f:
-                _settings = load(_f, Loader=SafeLoader)
-                if not isinstance(_settings, dict):
-                    raise TypeError(f"{_settings} is not a dict")
-                _settings = cast(Dict[str, Any], _settings)
-                if "rabbit" not in _settings:
-                    raise ValueError(f"{_settings} does not contain 'rabbit'")
-                _settings = cast(Dict[str, Any], _settings["rabbit"])
-                if not isinstance(_settings, dict):
-                    raise TypeError(f"{_settings} is not a dict")
-                _settings = cast(Dict[str, Any], _settings)
-                connection_settings = Connection.model_validate(_settings)
-
-        _host = connection_settings.host
+        self._codec = get_codec(codec)
+        self._settings = resolve_connection(connection_settings)
 
         if queue is None:
             # It should throw an exception, because I don't know which one to use
             queue = str(uuid4())
 
-        _port: int = connection_settings.port
-
-        _username: Union[str, None] = connection_settings.username
-        _password: Union[str, None] = connection_settings.password
-        _credentials: PlainCredentials
-        if (
-            _username is None
-            or _username.strip() == ""
-            or _password is None
-            or _password.strip() == ""
-        ):
-            _credentials = ConnectionParameters.DEFAULT_CREDENTIALS
-        else:
-            _credentials = PlainCredentials(_username, _password)
-        _retries: int = connection_settings.retries
-        _retries = max(_retries, 1)
-        _sleep_between: float = connection_settings.time_between_retries
-        _sleep_between = max(_sleep_between, 0.1)
-        for _i in range(_retries):
-            try:
-                self._client = BlockingConnection(
-                    ConnectionParameters(
-                        host=_host, port=_port, credentials=_credentials
-                    )
-                )
-                break
-            except AMQPConnectionError as _e:
-                if (_i + 1) == _retries:
-                    raise _e
-                sleep(_sleep_between)
         self._queue = queue
-        self._channel = self._client.channel()
+        self._pool = connection_pool if connection_pool is not None else get_connection_pool()
+        self._connection = None
+        self._channel = None
+        self._consumers = []
+        self._handler = WorkerPool(max(concurrency, 1), name=f"coleridge-{queue}")
+        self._prefetch_count = prefetch_count
+        self._consume_lock = Lock()
+        self._replies = get_reply_consumer(self._pool, self._settings)
+        self._auto_consume = consume
+        self._max_priority = max_priority
+        self._lock = Lock()
+        self._stopped = Event()
+        self._publisher = Publisher(
+            self._pool,
+            self._settings,
+            queue,
+            self._declare_queue,
+            batch_size=publish_batch_size,
+            linger=publish_linger_ms / 1000,
+            confirm=publisher_confirms,
+        )
         self.func = func
-        self._data = {}
+        self._store = result_store if result_store is not None else MemoryResultStore()
+        self._store.register_model(output_type)
+        self._dispatcher = dispatcher
+        self._metrics = MetricsRecorder(function_name(func))
         self._input_type = input_type
         self._output_type = output_type
 
@@ -138,6 +184,63 @@ class RabbitBackgroundFunction(Generic[T, U]):
         self._on_error = lambda x: None
         self._on_finish_signal = lambda: None
 
+    @property
+    def max_priority(self) -> Union[int, None]:
+        """The highest message priority of the queue, if it has priorities"""
+        return self._max_priority
+
+    @property
+    def queue(self) -> str:
+        """The name of the queue"""
+        return self._queue
+
+    @property
+    def metrics(self) -> MetricsRecorder:
+        """The metrics of the function"""
+        return self._metrics
+
+    @property
+    def concurrency(self) -> int:
+        """The number of messages handled at the same time"""
+        return self._handler.max_workers
+
+    @concurrency.setter
+    def concurrency(self, value: int) -> None:
+        """Set the number of messages handled at the same time, before consuming"""
+        if self.is_consuming:
+            raise RuntimeError("Cannot change the concurrency while consuming")
+        self._handler.shutdown(wait=False)
+        self._handler = WorkerPool(max(value, 1), name=f"coleridge-{self._queue}")
+
+    @property
+    def prefetch_count(self) -> int:
+        """The maximum number of messages delivered but not acknowledged yet"""
+        if self._prefetch_count is not None:
+            return self._prefetch_count
+        return 2 * self._handler.max_workers
+
+    @prefetch_count.setter
+    def prefetch_count(self, value: Union[int, None]) -> None:
+        """Set the maximum number of unacknowledged messages, before consuming"""
+        if self.is_consuming:
+            raise RuntimeError("Cannot change the prefetch count while consuming")
+        self._prefetch_count = value
+
+    @property
+    def input_type(self) -> Type[T]:
+        """The type of the input argument"""
+        return self._input_type
+
+    @property
+    def output_type(self) -> Type[U]:
+        """The type of the output value"""
+        return self._output_type
+
+    @property
+    def codec(self) -> Codec:
+        """The codec of the messages"""
+        return self._codec
+
     @property
     def on_finish(self) -> Callable[[Union[U, List[U]]], None]:
         """Get a function to be called when the function is finished with a result"""
@@ -168,29 +271,46 @@ class RabbitBackgroundFunction(Generic[T, U]):
         """Set a function to be called when a message is received"""
         self._on_finish_signal = value
 
-    def run(self, what: Union[T, List[T], str]) -> Result[U]:
-        """Send a message to the queue"""
-        uuid = str(uuid4())
-        self._data[uuid] = ResultModel(started=datetime.now())
+    def run(
+        self,
+        what: Union[T, List[T], str],
+        timeout: Union[float, None] = None,
+        priority: Union[int, None] = None,
+    ) -> Result[U]:
+        """
+        Send a message to the queue.
 
-        self._channel.queue_declare(queue=self._queue)
-        self._channel.basic_publish(
-            exchange="", routing_key=self._queue, body=dumps(what)
-        )
+        Args:
+            what: The input value to be processed by the consumer.
+            timeout: The maximum time in seconds to wait for the task to complete \
+                before `on_error` is called with a `TimeoutError`.
+            priority: The priority of the message, higher is delivered first. The \
+                broker only honors it up to `max_priority`. Defaults to None.
 
-        def _background_task(
-            func: Callable[[Union[T, List[T], str]], Union[U, List[U]]],
-        ) -> None:
-            """Listen for messages in a separate thread"""
-            self._listen(uuid, func)
-            self._start()
-
-        _th: Thread = Thread(
-            target=_background_task,
-            args=(self.func,),
-            daemon=True,
-        )
-        _th.start()
+        Returns:
+            A Result object representing the outcome of the task.
+        """
+        body = self._codec.encode(what)
+        uuid = str(uuid4())
+        entry: ResultModel[U] = ResultModel(started=datetime.now())
+        self._store.put(uuid, entry)
+
+        try:
+            properties = self._properties(uuid, entry, priority)
+            if self._publisher.buffered:
+                self._publisher.publish(
+                    body, properties, lambda ex: self._fail(uuid, entry, ex)
+                )
+            else:
+                error = self._publisher.publish_many([(body, properties)])[0]
+                if error is not None:
+                    raise error
+            if self._auto_consume:
+                self.consume()
+        except Exception:
+            del self[uuid]
+            raise
+        self._metrics.track(entry)
 
         res: Result[U] = Result(
             uuid,
@@ -198,109 +318,437 @@ class RabbitBackgroundFunction(Generic[T, U]):
             self._on_finish,
             self._on_error,
             self._on_finish_signal,
+            timeout,
+            entry,
         )
-        res.connect()
+        res.connect(self._dispatcher)
         return res
 
-    def _listen(
+    def run_many(
         self,
-        uuid: str,
-        callback: Callable[[Union[T, List[T], str]], Union[U, List[U]]],
-    ) -> None:
-        """Listen for messages in a separate thread"""
-        self._channel.queue_declare(queue=self._queue)
-
-        # pylint: disable=unused-argument,invalid-name
-        def _internal_callback(a: Any, b: Any, c: Any, bingpot: AnyStr) -> None:
-            """Listen for messages in a separate thread"""
-            # pylint: disable=unused-argument
-            try:
-                if isinstance(bingpot, bytes):
-                    bingpot = loads(bingpot)
-                if isinstance(bingpot, str):
-                    bingpot = json_loads(bingpot)
-                if isinstance(bingpot, list):
-                    bingpot = [
-                        self._input_type.model_validate(i) if isinstance(i, dict) else i
-                        for i in bingpot
-                    ]
-                if isinstance(bingpot, dict):
-                    bingpot = self._input_type.model_validate(bingpot)
-                self._data[uuid].result = callback(cast("Union[T, List[T]]", bingpot))
-            except Exception as ex:  # pylint: disable=broad-except
-                self._data[uuid].error = ex
-            finally:
-                self._data[uuid].completed = datetime.now()
-
-        # pylint: enable=unused-argument,invalid-name
-        self._channel.basic_consume(
-            queue=self._queue, on_message_callback=_internal_callback, auto_ack=True
-        )
+        what: Iterable[Union[T, List[T], str]],
+        timeout: Union[float, None] = None,
+        priority: Union[int, None] = None,
+    ) -> List[Result[U]]:
+        """
+        Send many messages to the queue at once, in a single handoff to the IO thread.
+
+        Args:
+            what: The input values to be processed by the consumer, one per message.
+            timeout: The maximum time in seconds to wait for each task to complete \
+                before `on_error` is called with a `TimeoutError`.
+            priority: The priority of the messages, higher is delivered first. \
+                Defaults to None.
+
+        Returns:
+            The Result objects of the tasks, in the same order. Messages that could not \
+            be published (or confirmed, with `publisher_confirms`) have already failed.
+        """
+        bodies = [self._codec.encode(item) for item in what]
+        entries: List[Tuple[str, ResultModel[U]]] = []
+        messages: List[Tuple[bytes, BasicProperties]] = []
+        try:
+            for body in bodies:
+                uuid = str(uuid4())
+                entry: ResultModel[U] = ResultModel(started=datetime.now())
+                self._store.put(uuid, entry)
+                entries.append((uuid, entry))
+                messages.append((body, self._properties(uuid, entry, priority)))
+        except Exception:
+            for uuid, _ in entries:
+                del self[uuid]
+            raise
+        for (uuid, entry), error in zip(entries, self._publisher.publish_many(messages)):
+            if error is not None:
+                self._fail(uuid, entry, error)
+        if entries and self._auto_consume:
+            self.consume()
+        results: List[Result[U]] = []
+        for uuid, entry in entries:
+            self._metrics.track(entry)
+            res: Result[U] = Result(
+                uuid,
+                self,
+                self._on_finish,
+                self._on_error,
+                self._on_finish_signal,
+                timeout,
+                entry,
+            )
+            res.connect(self._dispatcher)
+            results.append(res)
+        return results
+
+    def flush(self) -> None:
+        """Publish the buffered messages right away."""
+        self._publisher.flush()
+
+    def map(
+        self,
+        iterable: Iterable[Union[T, List[T], str]],
+        chunk_size: int = 64,
+        ordered: bool = False,
+        timeout: Union[float, None] = None,
+    ) -> Iterator[Union[U, List[U]]]:
+        """
+        Run a task for every input and yield the results as they finish.
+
+        The inputs are consumed lazily and at most `chunk_size` tasks are in flight, \
+        so memory stays flat however long the iterable is.
+
+        Args:
+            iterable: The input values, for example a generator.
+            chunk_size: The maximum number of tasks in flight. Defaults to 64.
+            ordered: Yield the results in the order of the inputs. Defaults to False.
+            timeout: The maximum time in seconds to wait for the next result.
+
+        Raises:
+            TimeoutError: If no result finishes within the timeout.
+            Exception: The first error raised by a task.
+
+        Returns:
+            An iterator over the results.
+        """
+        return stream(self.run, iterable, chunk_size, ordered, timeout)
+
+    async def run_async(
+        self,
+        what: Union[T, List[T], str],
+        timeout: Union[float, None] = None,
+    ) -> Union[U, List[U]]:
+        """
+        Send a message to the queue and wait for its result without blocking the event loop.
+
+        Args:
+            what: The input value to be processed by the consumer.
+            timeout: The maximum time in seconds to wait for the task to complete.
 
-    _th: Union[Thread, None] = None
+        Raises:
+            TimeoutError: If the task is not finished within the timeout.
+            Exception: The error raised by the task, if any.
+
+        Returns:
+            The result of the task.
+        """
+        res = await get_running_loop().run_in_executor(None, self.run, what, timeout)
+        return await res.get_async(timeout)
 
-    def _start(self, background: bool = True) -> None:
-        """Start consuming messages."""
-        if background:
-            if self._th is None:
+    def __or__(
+        self,
+        other: Union[
+            "DecoratedBackgroundFunction[U, V]", "RabbitBackgroundFunction[U, V]", "Pipeline[U, V]"
+        ],
+    ) -> "Pipeline[T, V]":
+        """Chain another decorated function (or a pipeline) after this one."""
+        return Pipeline(self, other, dispatcher=self._dispatcher)
+
+    def _decode(self, body: bytes, content_type: Union[str, None]) -> Union[T, List[T]]:
+        """
+        Decode the body of a message into the input type, according to its content type.
+
+        Messages without a content type are decoded with the codec of the function. \
+        Pickled messages are only accepted if the codec of the function is pickle.
+        """
+        codec = self._codec_for(content_type)
+        return cast("Union[T, List[T]]", codec.decode(body, self._input_type))
+
+    def _codec_for(self, content_type: Union[str, None]) -> Codec:
+        """Get the codec of a message, refusing pickle unless it is the one of the function."""
+        codec = self._codec if content_type is None else get_codec(content_type)
+        if isinstance(codec, PickleCodec) and not isinstance(self._codec, PickleCodec):
+            raise ValueError("Refusing to unpickle a message, the codec is not pickle")
+        return codec
+
+    def _properties(
+        self, uuid: str, entry: ResultModel[U], priority: Union[int, None] = None
+    ) -> BasicProperties:
+        """Get the properties of a message, waiting for its reply."""
+        reply_to = self._replies.register(
+            uuid,
+            lambda properties, body: self._on_reply(entry, properties, body),
+            lambda ex: self._fail(uuid, entry, ex),
+        )
+        return BasicProperties(
+            content_type=self._codec.content_type,
+            message_id=uuid,
+            correlation_id=uuid,
+            reply_to=reply_to,
+            priority=priority,
+            headers={SENT_HEADER: time()},
+        )
 
-                self._th = Thread(target=self._channel.start_consuming)
-                self._th.start()
+    def _on_reply(self, entry: ResultModel[U], properties: BasicProperties, body: bytes) -> None:
+        """Complete a task with the reply of the consumer."""
+        try:
+            error = reply_error(properties)
+            if error is not None:
+                raise error
+            with self._metrics.time("deserialization"):
+                entry.result = self._codec_for(properties.content_type).decode(
+                    body, self._output_type
+                )
+        except Exception as ex:  # pylint: disable=broad-except
+            entry.error = ex
+        finally:
+            entry.set_completed()
+
+    def _declare_queue(self, channel: BlockingChannel) -> None:
+        """Declare the queue of the function, with its priorities if any."""
+        if self._max_priority is None:
+            channel.queue_declare(queue=self._queue)
         else:
-            self._channel.start_consuming()
+            channel.queue_declare(
+                queue=self._queue, arguments={"x-max-priority": self._max_priority}
+            )
+
+    def _fail(self, uuid: str, entry: ResultModel[U], error: Exception) -> None:
+        """Complete a task whose message could not be delivered."""
+        self._replies.forget(uuid)
+        entry.error = error
+        entry.set_completed()
+
+    def _ensure(self) -> Tuple[PooledConnection, BlockingChannel]:
+        """Get the connection and the channel of the function, opening them if needed \
+        or if the connection was lost."""
+        with self._lock:
+            if (
+                self._connection is None
+                or self._channel is None
+                or not self._connection.is_open
+                or not self._channel.is_open
+            ):
+                self._connection, self._channel = self._pool.acquire(self._settings)
+                self._consumers = []
+            return self._connection, self._channel
+
+    def _call(self, func: Callable[[BlockingChannel], R]) -> R:
+        """Do something with the channel, on the IO thread of its connection."""
+        connection, channel = self._ensure()
+        return connection.call(lambda: func(channel))
+
+    def _handle(
+        self,
+        callback: Callable[[Union[T, List[T]]], Union[U, List[U]]],
+        settle: Callable[[bool, Union[Tuple[bytes, BasicProperties], None]], None],
+        properties: BasicProperties,
+        body: bytes,
+    ) -> None:
+        """Run the function on a message, then send the reply (if the producer asked for \
+        one) and acknowledge it. Messages that fail are rejected without being requeued, \
+        so they are not redelivered forever."""
+        success = False
+        reply: Union[Tuple[bytes, BasicProperties], None] = None
+        correlation_id = properties.correlation_id or properties.message_id
+        sent = (properties.headers or {}).get(SENT_HEADER)
+        if isinstance(sent, (int, float)):
+            self._metrics.observe("queue_wait", time() - sent)
+        try:
+            with self._metrics.time("deserialization"):
+                value = self._decode(body, properties.content_type)
+            with self._metrics.time("execution"):
+                output = call_blocking(callback, value)
+            success = True
+            if properties.reply_to:
+                reply = (
+                    self._codec.encode(output),
+                    BasicProperties(
+                        content_type=self._codec.content_type, correlation_id=correlation_id
+                    ),
+                )
+        except Exception as ex:  # pylint: disable=broad-except
+            self._metrics.execution_error()
+            if properties.reply_to:
+                reply = (
+                    b"",
+                    BasicProperties(correlation_id=correlation_id, headers=error_headers(ex)),
+                )
+        finally:
+            settle(success, reply)
+
+    def _listen(self, callback: Callable[[Union[T, List[T]]], Union[U, List[U]]]) -> str:
+        """Listen for messages. They are delivered on the IO thread of the connection, \
+        handed over to the handler workers, and acknowledged back on the IO thread once \
+        the function has run. At most `prefetch_count` messages are unacknowledged."""
+        connection, _ = self._ensure()
+
+        def _settler(
+            channel: BlockingChannel, delivery_tag: int, reply_to: Union[str, None]
+        ) -> Callable[[bool, Union[Tuple[bytes, BasicProperties], None]], None]:
+            def _settle(success: bool, reply: Union[Tuple[bytes, BasicProperties], None]) -> None:
+                def _ack() -> None:
+                    if not channel.is_open:
+                        return
+                    if reply is not None and reply_to:
+                        channel.basic_publish(
+                            exchange="", routing_key=reply_to, body=reply[0], properties=reply[1]
+                        )
+                    if success:
+                        channel.basic_ack(delivery_tag=delivery_tag)
+                    else:
+                        channel.basic_nack(delivery_tag=delivery_tag, requeue=False)
+
+                try:
+                    connection.call_soon(_ack)
+                except ConnectionError:
+                    # The broker redelivers the unacknowledged messages
+                    pass
+
+            return _settle
+
+        def _internal_callback(
+            channel: BlockingChannel, method: Any, properties: BasicProperties, bingpot: bytes
+        ) -> None:
+            """Hand a message over to the handler workers, in order of priority"""
+            settle = _settler(channel, method.delivery_tag, properties.reply_to)
+            self._handler.submit(
+                lambda: self._handle(callback, settle, properties, bingpot),
+                priority=properties.priority or 0,
+            )
+
+        def _consume(channel: BlockingChannel) -> str:
+            self._declare_queue(channel)
+            channel.basic_qos(prefetch_count=self.prefetch_count)
+            return str(
+                channel.basic_consume(queue=self._queue, on_message_callback=_internal_callback)
+            )
+
+        return self._call(_consume)
+
+    @property
+    def is_consuming(self) -> bool:
+        """Whether the function is consuming its queue"""
+        return bool(self._consumers)
+
+    def consume(self) -> None:
+        """
+        Start consuming the queue, if the function is not consuming it already. The \
+        messages are delivered by the IO thread of the connection, so this does not block.
+
+        Returns:
+            None
+        """
+        with self._consume_lock:
+            if self._consumers and self._is_connected():
+                return
+            self._consumers = [self._listen(self.func)]
+            self._stopped.clear()
+
+    def serve(self) -> None:
+        """
+        Consume the queue until `stop` is called.
+
+        Returns:
+            None
+        """
+        self.consume()
+        self._stopped.wait()
+
+    def drain(self, timeout: Union[float, None] = None) -> bool:
+        """
+        Wait for the messages being handled to be processed and acknowledged.
+
+        Args:
+            timeout (Union[float, None], optional): The maximum time to wait, in seconds. \
+                Defaults to None, which waits forever.
+
+        Returns:
+            bool: True if all the messages were processed in time.
+        """
+        return self._handler.join(timeout)
 
     def stop(self) -> None:
         """Stop consuming. This is called while exiting the context."""
-        self._channel.stop_consuming()
+        with self._consume_lock:
+            consumers, self._consumers = self._consumers, []
+
+        def _cancel(channel: BlockingChannel) -> None:
+            for tag in consumers:
+                channel.basic_cancel(tag)
+
+        if consumers and self._is_connected():
+            self._call(_cancel)
+        self._stopped.set()
 
     def delete_queue(self) -> None:
         """Delete the queue."""
-        self._channel.queue_delete(self._queue)
+        self._call(lambda channel: channel.queue_delete(self._queue))
+        self._publisher.redeclare()
 
     def close(self) -> None:
-        """Close the connection and deletes the queue."""
+        """Stop consuming, delete the queue, close the channel and stop the handler \
+        threads. The connection is shared with the other functions, so it stays open."""
+        self._publisher.close()
         self.stop()
         self.delete_queue()
-        self._client.close()
+        self._handler.shutdown(wait=False)
+        with self._lock:
+            if self._connection is not None and self._channel is not None:
+                self._connection.close_channel(self._channel)
+            self._connection, self._channel = None, None
 
     def _is_connected(self) -> bool:
         """Check if the connection is open."""
-        return bool(self._client.is_open)
+        return (
+            self._connection is not None
+            and self._channel is not None
+            and self._connection.is_open
+            and bool(self._channel.is_open)
+        )
 
     @property
     def client(self) -> BlockingConnection:
-        """The RabbitMQ client.
+        """The RabbitMQ client, shared with the other functions using the same broker.
 
         Returns:
             BlockingConnection: The pika client
         """
-        return self._client
+        return self._ensure()[0].client
 
     @property
     def channel(self) -> BlockingChannel:
-        """The BlockingChannel (if you want to do something fancy with it)
+        """The BlockingChannel (if you want to do something fancy with it). \
+        pika is not thread safe, so use it from the IO thread of the connection, \
+        for example through `connection.call`.
 
         Returns:
             BlockingChannel
         """
-        return self._channel
+        return self._ensure()[1]
+
+    @property
+    def connection(self) -> PooledConnection:
+        """The pooled connection of the function
+
+        Returns:
+            PooledConnection
+        """
+        return self._ensure()[0]
 
     @property
     def is_connected(self) -> bool:
         """Check if the connection is open."""
         return self._is_connected()
 
+    @property
+    def result_store(self) -> ResultStore:
+        """The store keeping the results of the tasks"""
+        return self._store
+
     def __getitem__(self, key: str) -> ResultModel[U]:
         """Get the result."""
-        return self._data[key]
+        entry = self._store.get(key)
+        if entry is None:
+            raise KeyError(key)
+        return cast("ResultModel[U]", entry)
 
     def __setitem__(self, key: str, value: ResultModel[U]) -> None:
         """Set the result."""
-        self._data[key] = value
+        self._store.put(key, value)
 
     def __delitem__(self, key: str) -> None:
-        """Delete the result."""
-        del self._data[key]
+        """Delete the result, and stop waiting for its reply."""
+        self._replies.forget(key)
+        self._store.discard(key)
 
 
 __all__ = (
@@ -0,0 +1,234 @@
+"""Request/reply: the results of the rabbit functions are sent back to the producer"""
+
+from logging import getLogger
+from threading import Lock, RLock
+from typing import Any, Callable, Dict, Tuple, Union
+from weakref import ReferenceType, WeakKeyDictionary, finalize, ref
+from pika import BasicProperties
+from pika.adapters.blocking_connection import BlockingChannel
+from .errors import RemoteExecutionError
+from .executor import WorkerPool
+from .models.connection import Connection
+from .pool import ConnectionPool, PooledConnection
+
+ERROR_HEADER = "x-coleridge-error"
+ERROR_TYPE_HEADER = "x-coleridge-error-type"
+
+logger = getLogger(__name__)
+
+Waiter = Callable[[BasicProperties, bytes], None]
+
+
+def error_headers(error: Exception) -> Dict[str, str]:
+    """
+    Get the headers of a reply reporting an error.
+
+    Args:
+        error (Exception): The error raised by the function.
+
+    Returns:
+        Dict[str, str]: The headers.
+    """
+    return {ERROR_HEADER: str(error), ERROR_TYPE_HEADER: type(error).__name__}
+
+
+def reply_error(properties: BasicProperties) -> Union[RemoteExecutionError, None]:
+    """
+    Get the error reported by a reply, if any.
+
+    Args:
+        properties (BasicProperties): The properties of the reply.
+
+    Returns:
+        Union[RemoteExecutionError, None]: The error, or None if the function succeeded.
+    """
+    headers = properties.headers or {}
+    if ERROR_HEADER not in headers:
+        return None
+    return RemoteExecutionError(
+        str(headers[ERROR_HEADER]), str(headers.get(ERROR_TYPE_HEADER, "Exception"))
+    )
+
+
+class ReplyConsumer:
+    """Consumes the replies sent to a producer process.
+
+    There is a single exclusive, server-named reply queue per broker, shared by all the \
+    rabbit functions of the process. Replies are matched to the waiting task through \
+    their `correlation_id`, and handed over to a worker thread so the IO thread of the \
+    connection is never blocked by decoding or callbacks.
+
+    If the reply queue is lost, with its connection or its channel, the replies sent \
+    to it will never arrive: the tasks waiting for them fail with a `ConnectionError`.
+
+    The consumer only keeps a weak reference to its pool, so it goes away with it.
+    """
+
+    _pool: "ReferenceType[ConnectionPool]"
+    _settings: Connection
+    _connection: Union[PooledConnection, None]
+    _channel: Union[BlockingChannel, None]
+    _queue: str
+    _waiters: Dict[str, Tuple[Waiter, Callable[[Exception], None]]]
+    _lock: Lock
+    _setup_lock: RLock
+    _handler: WorkerPool
+
+    def __init__(self, pool: ConnectionPool, connection_settings: Connection) -> None:
+        """
+        Initializes a new instance of the ReplyConsumer class.
+
+        Args:
+            pool (ConnectionPool): The pool the channel is taken from.
+            connection_settings (Connection): The settings of the broker.
+
+        Returns:
+            None
+        """
+        self._pool = ref(pool)
+        self._settings = connection_settings
+        self._connection = None
+        self._channel = None
+        self._queue = ""
+        self._waiters = {}
+        self._lock = Lock()
+        self._setup_lock = RLock()
+        self._handler = WorkerPool(1, name="coleridge-replies")
+        finalize(self, self._handler.shutdown, False)
+
+    @property
+    def pending(self) -> int:
+        """The number of tasks waiting for a reply"""
+        with self._lock:
+            return len(self._waiters)
+
+    @property
+    def queue(self) -> str:
+        """The name of the reply queue, declared if needed"""
+        with self._setup_lock:
+            return self._ensure()
+
+    def _ensure(self) -> str:
+        """Declare the reply queue if needed, failing the replies pending on a lost one. \
+        Must be called with the setup lock held."""
+        if (
+            self._connection is None
+            or self._channel is None
+            or not self._connection.is_open
+            or not self._channel.is_open
+        ):
+            if self._queue:
+                self._lost()
+            pool = self._pool()
+            if pool is None:
+                raise ConnectionError("The connection pool of the reply queue is gone")
+            connection, channel = pool.acquire(self._settings)
+            self._queue = connection.call(lambda: self._declare(channel))
+            self._connection, self._channel = connection, channel
+            connection.add_close_callback(lambda: self._closed(connection))
+        return self._queue
+
+    def _closed(self, connection: PooledConnection) -> None:
+        """Fail the pending replies if the connection of the reply queue is lost."""
+        with self._setup_lock:
+            if connection is self._connection:
+                self._lost()
+
+    def _lost(self) -> None:
+        """Fail the pending replies, which will not arrive. Must be called with the \
+        setup lock held."""
+        with self._lock:
+            waiters, self._waiters = self._waiters, {}
+        if waiters:
+            logger.warning(f"Lost the reply queue, failing {len(waiters)} pending replies")
+        error = ConnectionError("The reply queue was lost, the reply will not arrive")
+        for _, on_lost in waiters.values():
+            on_lost(error)
+
+    def _declare(self, channel: BlockingChannel) -> str:
+        """Declare the reply queue and consume it. Runs on the IO thread."""
+        queue = str(channel.queue_declare(queue="", exclusive=True).method.queue)
+        channel.basic_consume(queue=queue, on_message_callback=self._deliver, auto_ack=True)
+        return queue
+
+    def _deliver(
+        self, channel: Any, method: Any, properties: BasicProperties, body: bytes
+    ) -> None:
+        """Hand a reply over to its waiter"""
+        # pylint: disable=unused-argument
+        with self._lock:
+            waiter = self._waiters.pop(properties.correlation_id or "", None)
+        if waiter is not None:
+            on_reply = waiter[0]
+            self._handler.submit(lambda: on_reply(properties, body))
+
+    def register(
+        self,
+        correlation_id: str,
+        waiter: Waiter,
+        on_lost: Callable[[Exception], None],
+    ) -> str:
+        """
+        Wait for the reply to a message.
+
+        Args:
+            correlation_id (str): The correlation id of the message.
+            waiter (Callable[[BasicProperties, bytes], None]): Called with the properties \
+                and the body of the reply.
+            on_lost (Callable[[Exception], None]): Called with a `ConnectionError` if \
+                the reply queue is lost before the reply arrives.
+
+        Returns:
+            str: The reply queue, to be set as `reply_to`.
+        """
+        with self._setup_lock:
+            queue = self._ensure()
+            with self._lock:
+                self._waiters[correlation_id] = (waiter, on_lost)
+        return queue
+
+    def forget(self, correlation_id: str) -> None:
+        """
+        Stop waiting for the reply to a message.
+
+        Args:
+            correlation_id (str): The correlation id of the message.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._waiters.pop(correlation_id, None)
+
+
+_consumers: "WeakKeyDictionary[ConnectionPool, Dict[str, ReplyConsumer]]" = WeakKeyDictionary()
+_consumers_lock = Lock()
+
+
+def get_reply_consumer(pool: ConnectionPool, connection_settings: Connection) -> ReplyConsumer:
+    """
+    Get the reply consumer of the process for a broker. The consumers are kept as long \
+    as their pool.
+
+    Args:
+        pool (ConnectionPool): The pool the channel is taken from.
+        connection_settings (Connection): The settings of the broker.
+
+    Returns:
+        ReplyConsumer: The reply consumer.
+    """
+    key = connection_settings.model_dump_json()
+    with _consumers_lock:
+        consumers = _consumers.setdefault(pool, {})
+        if key not in consumers:
+            consumers[key] = ReplyConsumer(pool, connection_settings)
+        return consumers[key]
+
+
+__all__ = (
+    "RemoteExecutionError",
+    "ReplyConsumer",
+    "error_headers",
+    "get_reply_consumer",
+    "reply_error",
+)
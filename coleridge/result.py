@@ -1,42 +1,70 @@
 """Execution result"""
 
+from asyncio import TimeoutError as AsyncioTimeoutError, get_running_loop, wait_for
+from collections import deque
 from contextlib import suppress
-from typing import TYPE_CHECKING, Callable, Generic, TypeVar, Union, List, Any
+from queue import Empty, SimpleQueue
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Deque,
+    Generator,
+    Generic,
+    Iterable,
+    Iterator,
+    TypeVar,
+    Union,
+    List,
+    Any,
+)
 from datetime import datetime
-from threading import Thread
 from pydantic import BaseModel
+from .dispatch import CompletionDispatcher, get_dispatcher
+from .models.response import ResultModel
 
 T = TypeVar("T", bound=BaseModel)
 U = TypeVar("U", bound=BaseModel)
 
 if TYPE_CHECKING:  # pragma: no cover
     from .decorated import DecoratedBackgroundFunction
+    from .pipeline import Pipeline
     from .rabbit import RabbitBackgroundFunction
 
+    Source = Union[
+        DecoratedBackgroundFunction[Any, U], RabbitBackgroundFunction[Any, U], Pipeline[Any, U]
+    ]
+
 
 class ExecutionResult(Generic[U]):
     """Execution result"""
 
-    _dec: "Union[DecoratedBackgroundFunction[Any, U], RabbitBackgroundFunction[Any, U]]"
+    _dec: "Source[U]"
     _on_finish: "Callable[[Union[U, List[U]]], None]"
     _on_error: Callable[[Exception], None]
     _on_finish_signal: "Callable[[], None]"
-    _started_thread: bool
+    _connected: bool
+    _timeout: Union[float, None]
+    _model: ResultModel[U]
 
-    def __init__(  # noqa: D107 # pylint: disable=too-many-arguments
+    def __init__(  # noqa: D107, PLR0913 # pylint: disable=too-many-arguments
         self,
         uuid: str,
-        dec: "Union[DecoratedBackgroundFunction[T, U], RabbitBackgroundFunction[T, U]]",
+        dec: "Source[U]",
         on_finish: "Callable[[Union[U, List[U]]], None]",
         on_error: Callable[[Exception], None],
         on_finish_signal: "Callable[[], None]",
+        timeout: Union[float, None] = None,
+        model: Union[ResultModel[U], None] = None,
     ) -> None:
         self._uuid = uuid
         self._dec = dec
         self._on_finish = on_finish
         self._on_error = on_error
         self._on_finish_signal = on_finish_signal
-        self._started_thread = False
+        self._connected = False
+        self._timeout = timeout
+        # Keep the model itself, so the result survives an eviction from the store
+        self._model = model if model is not None else dec[uuid]
 
     _uuid: str
 
@@ -48,82 +76,340 @@ class ExecutionResult(Generic[U]):
     @property
     def result(self) -> Union[U, List[U], None]:
         """The result of the execution"""
-        return self._dec[self.uuid].result
+        return self._model.result
 
     @property
     def started(self) -> Union[datetime, None]:
         """The start time of the execution"""
-        return self._dec[self.uuid].started
+        return self._model.started
 
     @property
     def completed(self) -> Union[datetime, None]:
         """The completion time of the execution"""
-        return self._dec[self.uuid].completed
+        return self._model.completed
 
     @property
     def finished(self) -> bool:
         """Whether the execution is finished"""
-        return self._dec[self.uuid].completed is not None
+        return self._model.completed is not None
 
     @property
     def error(self) -> Union[Exception, None]:
         """The error of the execution"""
-        return self._dec[self.uuid].error
+        return self._model.error
 
     @property
     def success(self) -> bool:
         """Whether the execution was successful"""
-        return self._dec[self.uuid].error is None and self.finished
+        return self._model.error is None and self.finished
 
-    def _check(
-        self,
-        timeout: Union[float, None] = None,  # pylint: disable=unused-argument
-    ) -> None:
+    def wait(self, timeout: Union[float, None] = None) -> bool:
+        """
+        Block until the execution is finished.
+
+        Args:
+            timeout (Union[float, None], optional): The maximum time in seconds \
+                to wait. Defaults to None, which waits forever.
+
+        Returns:
+            bool: True if the execution is finished, False if the timeout expired.
+        """
+        return self._model.wait(timeout)
+
+    def get(self, timeout: Union[float, None] = None) -> Union[U, List[U]]:
+        """
+        Block until the execution is finished and return its result.
+
+        Args:
+            timeout (Union[float, None], optional): The maximum time in seconds \
+                to wait. Defaults to None, which waits forever.
+
+        Raises:
+            TimeoutError: If the execution is not finished within the timeout.
+            Exception: The error raised by the execution, if any.
+            ValueError: If the execution finished without a result.
+
+        Returns:
+            Union[U, List[U]]: The result of the execution.
+        """
+        if not self.wait(timeout):
+            raise TimeoutError(
+                f"Execution {self.uuid} did not finish within {timeout} seconds"
+            )
+        if self.error is not None:
+            raise self.error
+        data = self.result
+        if data is None:
+            raise ValueError("Result is None")
+        return data
+
+    async def wait_async(self, timeout: Union[float, None] = None) -> bool:
+        """
+        Wait until the execution is finished, without blocking the event loop.
+
+        Args:
+            timeout (Union[float, None], optional): The maximum time in seconds \
+                to wait. Defaults to None, which waits forever.
+
+        Returns:
+            bool: True if the execution is finished, False if the timeout expired.
+        """
+        loop = get_running_loop()
+        done = loop.create_future()
+
+        def _resolve() -> None:
+            if not done.done():
+                done.set_result(None)
+
+        def _wake() -> None:
+            with suppress(RuntimeError):  # The event loop is already closed
+                loop.call_soon_threadsafe(_resolve)
+
+        self._model.add_done_callback(_wake)
+        try:
+            await wait_for(done, timeout)
+        except AsyncioTimeoutError:
+            return False
+        return True
+
+    async def get_async(self, timeout: Union[float, None] = None) -> Union[U, List[U]]:
+        """
+        Wait until the execution is finished, without blocking the event loop, \
+        and return its result.
+
+        Args:
+            timeout (Union[float, None], optional): The maximum time in seconds \
+                to wait. Defaults to None, which waits forever.
+
+        Raises:
+            TimeoutError: If the execution is not finished within the timeout.
+            Exception: The error raised by the execution, if any.
+            ValueError: If the execution finished without a result.
+
+        Returns:
+            Union[U, List[U]]: The result of the execution.
+        """
+        if not await self.wait_async(timeout):
+            raise TimeoutError(
+                f"Execution {self.uuid} did not finish within {timeout} seconds"
+            )
+        return self.get(0)
+
+    def __await__(self) -> Generator[Any, None, Union[U, List[U]]]:
+        """Await the result of the execution."""
+        return self.get_async(self._timeout).__await__()
+
+    def items(self, timeout: Union[float, None] = None) -> Iterator[U]:
+        """
+        Iterate over the items of the result.
+
+        The items of a generator function are yielded while it runs, as soon as they \
+        are produced, and the function waits while the consumer is behind. Breaking \
+        out of the loop, or timing out, stops it. The other functions, and the \
+        generator functions already finished, yield the items of their result (the \
+        result itself, if it is not a list) once they are finished.
+
+        Args:
+            timeout (Union[float, None], optional): The maximum time in seconds to wait \
+                for the next item. Defaults to None, which waits forever.
+
+        Raises:
+            TimeoutError: If no item is produced within the timeout.
+            Exception: The error raised by the execution, once its items are consumed.
+
+        Returns:
+            Iterator[U]: The items.
         """
-        Check the execution result and perform the necessary actions based on the result status.
+        stream = self._model.open_stream()
+        if stream is not None:
+            try:
+                yield from stream.iterate(timeout)
+            finally:
+                stream.close()
+        elif not self.wait(timeout):
+            raise TimeoutError(
+                f"Execution {self.uuid} did not finish within {timeout} seconds"
+            )
+        if self.error is not None:
+            raise self.error
+        if stream is None and self.result is not None:
+            yield from self.result if isinstance(self.result, list) else [self.result]
 
-        This method continuously checks the status of the execution result. If an error is \
-              present, it calls the `_on_error` callback function with the error as an \
-              argument and returns. If the execution is finished, it retrieves the \
-              result and checks if it is None. If it is None, it calls \
-              the `_on_error` callback function with a `ValueError` indicating that\
-              the result is None and returns. If the result is not None, it calls\
-              the `_on_finish` callback function with the result as an argument, \
-              calls the `_on_finish_signal` callback function, and returns.
+    def __iter__(self) -> Iterator[U]:
+        """Iterate over the items of the result, as they are produced."""
+        return self.items(self._timeout)
 
-        Parameters:
-            timeout (Union[float, None], optional): The maximum time in seconds\
-                  to wait for the execution to complete. Defaults to None.
+    def add_done_callback(self, callback: "Callable[[ExecutionResult[U]], None]") -> None:
+        """
+        Call a function with this execution result once it is finished.
+
+        The function is called by the thread finishing the execution, or right away \
+        if the execution is already finished.
+
+        Args:
+            callback (Callable[[ExecutionResult[U]], None]): The function to call.
 
         Returns:
             None
         """
-        # TODO: timeout
-        while True:
-            if self.error is not None:
-                self._on_error(self.error)
-                return
-            if self.finished:
-                data = self.result
-                if data is None:
-                    self._on_error(ValueError("Result is None"))
-                    return
-                self._on_finish(data)
-                self._on_finish_signal()
+        self._model.add_done_callback(lambda: callback(self))
+
+    def _dispatch(self) -> None:
+        """
+        Call the callbacks of the finished execution.
+
+        If an error is present, it calls the `_on_error` callback function with the \
+              error as an argument. If the result is None, it calls the `_on_error` \
+              callback function with a `ValueError` indicating that the result is None. \
+              Otherwise it calls the `_on_finish` callback function with the result as \
+              an argument and then the `_on_finish_signal` callback function.
+
+        Returns:
+            None
+        """
+        with self._dec.metrics.time("callback"):
+            try:
+                data = self.get(0)
+            except Exception as ex:  # pylint: disable=broad-except
+                self._on_error(ex)
                 return
+            self._on_finish(data)
+            self._on_finish_signal()
+
+    def _expire(self) -> None:
+        """Stop streaming the items, and call the `_on_error` callback with a \
+        `TimeoutError`."""
+        self._close_stream()
+        with self._dec.metrics.time("callback"):
+            self._on_error(
+                TimeoutError(
+                    f"Execution {self.uuid} did not finish within {self._timeout} seconds"
+                )
+            )
+
+    def connect(self, dispatcher: Union[CompletionDispatcher, None] = None) -> None:
+        """
+        Connect to the background task: its callbacks are called by the dispatcher \
+        once it is finished, or with a `TimeoutError` once the timeout expires.
 
-    def connect(self) -> None:
-        """Connect to the background task"""
-        if self._started_thread:
+        Args:
+            dispatcher (Union[CompletionDispatcher, None], optional): The dispatcher \
+                running the callbacks. Defaults to None, which uses the process-wide one.
+
+        Returns:
+            None
+        """
+        if self._connected:
             return
-        t = Thread(target=self._check)
-        t.start()
-        self._started_thread = True
+        self._connected = True
+        if dispatcher is None:
+            dispatcher = get_dispatcher()
+        dispatcher.watch(self._model, self._dispatch, self._expire, self._timeout)
+
+    def _close_stream(self) -> None:
+        """Close the stream of the items, if any, so the generator function stops."""
+        stream = self._model.item_stream
+        if stream is not None:
+            stream.close()
 
     def __del__(self) -> None:
-        """Delete the result."""
-        with suppress(KeyError):
-            del self._dec[self.uuid]
+        """Stop streaming the items. The result stays in the store of the function, \
+        until its eviction policy drops it."""
+        self._close_stream()
+
+
+def as_completed(
+    results: Iterable[ExecutionResult[U]],
+    timeout: Union[float, None] = None,
+) -> Iterator[ExecutionResult[U]]:
+    """
+    Yield the execution results as they finish.
+
+    Args:
+        results (Iterable[ExecutionResult[U]]): The execution results.
+        timeout (Union[float, None], optional): The maximum time in seconds to wait \
+            for the next result. Defaults to None, which waits forever.
+
+    Raises:
+        TimeoutError: If no result finishes within the timeout.
+
+    Returns:
+        Iterator[ExecutionResult[U]]: The finished execution results.
+    """
+    finished: "SimpleQueue[ExecutionResult[U]]" = SimpleQueue()
+    count = 0
+    for res in results:
+        res.add_done_callback(finished.put)
+        count += 1
+    for _ in range(count):
+        try:
+            yield finished.get(timeout=timeout)
+        except Empty:
+            raise TimeoutError(f"No result finished within {timeout} seconds") from None
+
+
+def stream(
+    run: "Callable[[Any], ExecutionResult[U]]",
+    iterable: Iterable[Any],
+    chunk_size: int,
+    ordered: bool = False,
+    timeout: Union[float, None] = None,
+) -> Iterator[Union[U, List[U]]]:
+    """
+    Run a task for every input, keeping at most `chunk_size` of them in flight, \
+    and yield their results.
+
+    The inputs are consumed lazily, so memory stays flat however long the iterable is.
+
+    Args:
+        run (Callable[[Any], ExecutionResult[U]]): Starts a task for one input.
+        iterable (Iterable[Any]): The inputs.
+        chunk_size (int): The maximum number of tasks in flight.
+        ordered (bool, optional): Yield the results in the order of the inputs \
+            instead of as they finish. Defaults to False.
+        timeout (Union[float, None], optional): The maximum time in seconds to wait \
+            for the next result. Defaults to None, which waits forever.
+
+    Raises:
+        TimeoutError: If no result finishes within the timeout.
+        Exception: The first error raised by a task. The tasks still in flight \
+            keep running.
+
+    Returns:
+        Iterator[Union[U, List[U]]]: The results.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    items = iter(iterable)
+    in_flight: "Deque[ExecutionResult[U]]" = deque()
+    finished: "SimpleQueue[ExecutionResult[U]]" = SimpleQueue()
+    pending = 0
+    exhausted = False
+    while True:
+        while not exhausted and pending < chunk_size:
+            try:
+                res = run(next(items))
+            except StopIteration:
+                exhausted = True
+                break
+            pending += 1
+            if ordered:
+                in_flight.append(res)
+            else:
+                res.add_done_callback(finished.put)
+        if pending == 0:
+            return
+        if ordered:
+            res = in_flight.popleft()
+        else:
+            try:
+                res = finished.get(timeout=timeout)
+            except Empty:
+                raise TimeoutError(f"No result finished within {timeout} seconds") from None
+        pending -= 1
+        value = res.get(timeout)
+        del res
+        yield value
 
 
-__all__ = ("ExecutionResult", "T", "U")
+__all__ = ("ExecutionResult", "as_completed", "stream", "T", "U")
@@ -0,0 +1,427 @@
+"""Cron scheduler running all the cron jobs from a single thread"""
+
+from atexit import register, unregister
+from heapq import heappop, heappush
+from itertools import count
+from datetime import datetime
+from logging import getLogger
+from sys import modules
+from threading import Condition, Lock, Thread
+from time import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Tuple,
+    Union,
+    cast,
+)
+from croniter import croniter  # type: ignore[import-untyped]
+from pydantic import BaseModel
+from .decorated import DecoratedBackgroundFunction
+from .executor import QueueFullError, WorkerPool
+from .models.empty import Empty
+from .models.stats import JobStats
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .rabbit import RabbitBackgroundFunction
+
+Misfire = Literal["coalesce", "skip", "run_all"]
+Decorated = Union[DecoratedBackgroundFunction[Any, Any], "RabbitBackgroundFunction[Any, Any]"]
+Target = Union[Callable[[], None], Decorated]
+
+logger = getLogger(__name__)
+
+
+def _is_decorated(func: Target) -> bool:
+    """Whether the target is a background (or rabbit) function. The rabbit transport \
+    is only looked up if it was imported, so scheduling jobs does not load pika."""
+    if isinstance(func, DecoratedBackgroundFunction):
+        return True
+    rabbit = modules.get(f"{__package__}.rabbit")
+    return rabbit is not None and isinstance(func, rabbit.RabbitBackgroundFunction)
+
+
+class CronJob:  # pylint: disable=too-many-instance-attributes
+    """A function scheduled with a cron expression.
+
+    The target is either a plain function, run on the executor of the scheduler, or \
+    a background (or rabbit) function, which is `run` with `input_value`. At most \
+    `max_instances` runs of the job are in flight: the other fire times are skipped.
+
+    When the job is late (the scheduler was busy, or the process was suspended) the \
+    `misfire` policy applies: "coalesce" runs it once for all the missed fire times, \
+    "skip" runs it only if it is less than `misfire_grace_time` seconds late, and \
+    "run_all" runs it once for every missed fire time.
+    """
+
+    _expr: str
+    _func: Target
+    _input_value: BaseModel
+    _max_instances: int
+    _misfire: Misfire
+    _misfire_grace_time: float
+    _cron: croniter
+    _next: float
+    _cancelled: bool
+    _lock: Lock
+    _stats: JobStats
+
+    def __init__(  # noqa: PLR0913
+        self,
+        expr: str,
+        func: Target,
+        max_instances: int = 1,
+        misfire: Misfire = "coalesce",
+        misfire_grace_time: float = 1.0,
+        input_value: Union[BaseModel, None] = None,
+    ) -> None:
+        """
+        Initializes a new instance of the CronJob class.
+
+        Args:
+            expr (str): The cron expression.
+            func (Target): The function to run.
+            max_instances (int, optional): The maximum number of runs in flight. \
+                Defaults to 1.
+            misfire (Literal["coalesce", "skip", "run_all"], optional): What to do \
+                when the job is late. Defaults to "coalesce".
+            misfire_grace_time (float, optional): How late, in seconds, the job can \
+                still run with the "skip" policy. Defaults to 1.
+            input_value (Union[BaseModel, None], optional): The input of a background \
+                function. Defaults to None, which is `Empty()`.
+
+        Returns:
+            None
+        """
+        if max_instances < 1:
+            raise ValueError("max_instances must be at least 1")
+        if misfire not in ("coalesce", "skip", "run_all"):
+            raise ValueError(f"Unknown misfire policy {misfire}")
+        self._expr = expr
+        self._func = func
+        self._input_value = input_value if input_value is not None else Empty()
+        self._max_instances = max_instances
+        self._misfire = misfire
+        self._misfire_grace_time = misfire_grace_time
+        # Seeded with the local time, so the expression is in local time, not UTC
+        self._cron = croniter(str(expr), datetime.now().astimezone())
+        self._next = self._fire_time()
+        self._cancelled = False
+        self._lock = Lock()
+        self._stats = JobStats()
+
+    def _fire_time(self) -> float:
+        """Get the next fire time of the expression, as a timestamp."""
+        return cast(datetime, self._cron.get_next(datetime)).timestamp()
+
+    @property
+    def expr(self) -> str:
+        """The cron expression"""
+        return self._expr
+
+    @property
+    def func(self) -> Target:
+        """The scheduled function"""
+        return self._func
+
+    @property
+    def max_instances(self) -> int:
+        """The maximum number of runs in flight"""
+        return self._max_instances
+
+    @property
+    def misfire(self) -> Misfire:
+        """What to do when the job is late"""
+        return self._misfire
+
+    @property
+    def next_run(self) -> datetime:
+        """When the job runs next"""
+        return datetime.fromtimestamp(self._next)
+
+    @property
+    def next_timestamp(self) -> float:
+        """When the job runs next, as a timestamp"""
+        return self._next
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the job was removed from its scheduler"""
+        return self._cancelled
+
+    @property
+    def stats(self) -> JobStats:
+        """The statistics of the job"""
+        with self._lock:
+            return self._stats.model_copy()
+
+    def advance(self, now: float) -> Tuple[float, bool]:
+        """
+        Move to the next fire time, according to the misfire policy.
+
+        Args:
+            now (float): The current time, as a timestamp.
+
+        Returns:
+            Tuple[float, bool]: The next fire time, and whether the job should run now.
+        """
+        late = now - self._next
+        self._next = self._fire_time()
+        if self._misfire == "run_all":
+            return self._next, True
+        missed = self._next <= now
+        while self._next <= now:
+            self._next = self._fire_time()
+        run = self._misfire == "coalesce" or late <= self._misfire_grace_time
+        if missed or not run:
+            with self._lock:
+                self._stats.misfires += 1
+        return self._next, run
+
+    def cancel(self) -> None:
+        """
+        Mark the job as cancelled, so the scheduler drops it.
+
+        Returns:
+            None
+        """
+        self._cancelled = True
+
+    def _finish(self, scheduled: float, started: float, success: bool) -> None:
+        """Record the end of a run."""
+        with self._lock:
+            self._stats.running -= 1
+            self._stats.runs += 1
+            if not success:
+                self._stats.failures += 1
+            latency = started - scheduled
+            self._stats.last_latency = latency
+            self._stats.max_latency = max(self._stats.max_latency, latency)
+            self._stats.last_duration = time() - started
+
+    def _run(self, scheduled: float) -> None:
+        """Run a plain function."""
+        started = time()
+        success = False
+        try:
+            cast(Callable[[], None], self._func)()
+            success = True
+        except Exception:  # pylint: disable=broad-except
+            logger.exception(f"The cron job {self._expr} failed")
+        finally:
+            self._finish(scheduled, started, success)
+
+    def dispatch(self, scheduled: float, executor: WorkerPool) -> bool:
+        """
+        Start a run, unless `max_instances` runs are in flight already.
+
+        Args:
+            scheduled (float): When the run was due, as a timestamp.
+            executor (WorkerPool): The pool running plain functions.
+
+        Returns:
+            bool: Whether the run was started.
+        """
+        with self._lock:
+            if self._stats.running >= self._max_instances:
+                self._stats.skipped += 1
+                return False
+            self._stats.running += 1
+        try:
+            if _is_decorated(self._func):
+                started = time()
+                result = cast(Decorated, self._func).run(self._input_value)
+                result.add_done_callback(
+                    lambda res: self._finish(scheduled, started, res.error is None)
+                )
+            else:
+                executor.submit(lambda: self._run(scheduled))
+        except (QueueFullError, RuntimeError, ConnectionError) as ex:
+            logger.warning(f"Cannot run the cron job {self._expr}: {ex}")
+            self._abort()
+            return False
+        except Exception:  # pylint: disable=broad-except
+            logger.exception(f"Cannot run the cron job {self._expr}")
+            self._abort()
+            return False
+        return True
+
+    def _abort(self) -> None:
+        """Record a run that could not be started."""
+        with self._lock:
+            self._stats.running -= 1
+            self._stats.skipped += 1
+
+
+class CronScheduler:
+    """Runs cron jobs from a single thread.
+
+    The jobs are kept in a min-heap ordered by their next fire time, and the thread \
+    sleeps exactly until the earliest one, waking up early only when a job is added \
+    or removed. The thread never runs the jobs itself: plain functions are handed \
+    over to a worker pool, background functions are started with `run`.
+    """
+
+    _heap: List[Tuple[float, int, CronJob]]
+    _jobs: Dict[int, CronJob]
+    _cond: Condition
+    _thread: Union[Thread, None]
+    _running: bool
+    _seq: Iterator[int]
+    _name: str
+    _executor: WorkerPool
+
+    def __init__(
+        self,
+        executor: Union[WorkerPool, None] = None,
+        name: str = "coleridge-cron",
+    ) -> None:
+        """
+        Initializes a new instance of the CronScheduler class.
+
+        Args:
+            executor (Union[WorkerPool, None], optional): The pool running the plain \
+                functions. Defaults to None, which creates one with 4 workers.
+            name (str, optional): The name of the scheduler thread. \
+                Defaults to "coleridge-cron".
+
+        Returns:
+            None
+        """
+        self._heap = []
+        self._jobs = {}
+        self._cond = Condition()
+        self._thread = None
+        self._running = True
+        self._seq = count()
+        self._name = name
+        self._executor = executor if executor is not None else WorkerPool(4, name=name)
+        register(self.shutdown)
+
+    @property
+    def executor(self) -> WorkerPool:
+        """The pool running the plain functions"""
+        return self._executor
+
+    @property
+    def jobs(self) -> List[CronJob]:
+        """The scheduled jobs"""
+        with self._cond:
+            return list(self._jobs.values())
+
+    def add(  # noqa: PLR0913
+        self,
+        expr: str,
+        func: Target,
+        max_instances: int = 1,
+        misfire: Misfire = "coalesce",
+        misfire_grace_time: float = 1.0,
+        input_value: Union[BaseModel, None] = None,
+    ) -> CronJob:
+        """
+        Schedule a function.
+
+        Args:
+            expr (str): The cron expression.
+            func (Target): The function to run, either plain or a background function.
+            max_instances (int, optional): The maximum number of runs in flight. \
+                Defaults to 1.
+            misfire (Literal["coalesce", "skip", "run_all"], optional): What to do \
+                when the job is late. Defaults to "coalesce".
+            misfire_grace_time (float, optional): How late, in seconds, the job can \
+                still run with the "skip" policy. Defaults to 1.
+            input_value (Union[BaseModel, None], optional): The input of a background \
+                function. Defaults to None, which is `Empty()`.
+
+        Returns:
+            CronJob: The job, to remove it later.
+        """
+        job = CronJob(expr, func, max_instances, misfire, misfire_grace_time, input_value)
+        with self._cond:
+            if not self._running:
+                raise RuntimeError("The scheduler is shut down")
+            self._jobs[id(job)] = job
+            heappush(self._heap, (job.next_timestamp, next(self._seq), job))
+            if self._thread is None:
+                self._thread = Thread(target=self._loop, name=self._name, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return job
+
+    def remove(self, job: CronJob) -> None:
+        """
+        Unschedule a job. It is dropped from the heap when it comes up.
+
+        Args:
+            job (CronJob): The job.
+
+        Returns:
+            None
+        """
+        with self._cond:
+            job.cancel()
+            self._jobs.pop(id(job), None)
+            self._cond.notify()
+
+    def _due(self) -> Union[Tuple[CronJob, float], None]:
+        """Wait for the next job to be due and take it, with its fire time. Must be \
+        called with the lock held."""
+        while self._running:
+            while self._heap and self._heap[0][2].cancelled:
+                heappop(self._heap)
+            if not self._heap:
+                self._cond.wait()
+                continue
+            now = time()
+            scheduled = self._heap[0][0]
+            if scheduled > now:
+                self._cond.wait(scheduled - now)
+                continue
+            _, _, job = heappop(self._heap)
+            next_time, run = job.advance(now)
+            heappush(self._heap, (next_time, next(self._seq), job))
+            if run:
+                return job, scheduled
+        return None
+
+    def _loop(self) -> None:
+        """Dispatch the jobs when they are due. A job failing in any way is logged and \
+        does not stop the others."""
+        while True:
+            try:
+                with self._cond:
+                    due = self._due()
+                if due is None:
+                    return
+                job, scheduled = due
+                job.dispatch(scheduled, self._executor)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("The cron scheduler failed to dispatch a job")
+
+    def shutdown(self) -> None:
+        """
+        Stop the scheduler.
+
+        Returns:
+            None
+        """
+        unregister(self.shutdown)
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+
+_default_scheduler = CronScheduler()
+
+
+def get_scheduler() -> CronScheduler:
+    """Get the process-wide cron scheduler."""
+    return _default_scheduler
+
+
+__all__ = ("CronJob", "CronScheduler", "Misfire", "get_scheduler")
@@ -0,0 +1,347 @@
+"""Persistent result store backed by SQLite"""
+
+from atexit import register, unregister
+from contextlib import suppress
+from datetime import datetime
+from logging import getLogger
+from pathlib import Path
+from sqlite3 import Connection as SQLiteConnection, connect
+from threading import Condition, Lock, Thread
+from time import monotonic, time
+from typing import Any, Dict, Iterable, List, Tuple, Type, Union
+from pydantic import BaseModel, ValidationError
+from .codecs import get_adapter
+from .errors import RemoteExecutionError
+from .models.response import ResultModel
+from .models.stats import StoreStats
+from .store import MemoryResultStore, ResultStore
+
+Row = Tuple[str, str, Union[bytes, None], Union[str, None], Union[str, None], str, str, float]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    uuid TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    result BLOB,
+    error TEXT,
+    error_type TEXT,
+    started TEXT NOT NULL,
+    completed TEXT NOT NULL,
+    stored REAL NOT NULL
+)
+"""
+_INSERT = "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+_SELECT = (
+    "SELECT model, result, error, error_type, started, completed FROM results WHERE uuid = ?"
+)
+
+logger = getLogger(__name__)
+
+
+def _open(path: str) -> SQLiteConnection:
+    """Open the database in WAL mode, so readers never wait for the writer."""
+    db = connect(path, check_same_thread=False, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute(_SCHEMA)
+    return db
+
+
+def _model_of(value: Any) -> Union[Type[BaseModel], None]:
+    """Get the model of a result, if any."""
+    first = value[0] if isinstance(value, list) and value else value
+    return type(first) if isinstance(first, BaseModel) else None
+
+
+def _model_name(model: Type[BaseModel]) -> str:
+    """The name a model is stored under, `module:qualname`."""
+    return f"{model.__module__}:{model.__qualname__}"
+
+
+class SQLiteResultStore(ResultStore):  # pylint: disable=too-many-instance-attributes
+    """Result store persisting the completed results in a SQLite database.
+
+    The results are kept in memory while the tasks run, and written once completed by \
+    a background thread, in batches of up to `batch_size` rows per transaction. The \
+    database is in WAL mode, so other processes can look results up by uuid while this \
+    one writes, and the results survive a restart. Results that are not in memory are \
+    loaded from the database, their errors as `RemoteExecutionError`. Only the models \
+    declared with `models` or `register_model` (the output types of the functions using \
+    the store) are loaded back: the names stored in the database are never imported.
+
+    A batch that cannot be written is rolled back and logged, and `flush` returns \
+    False, but the writer keeps going with the next ones.
+    """
+
+    _path: str
+    _cache: ResultStore
+    _batch_size: int
+    _flush_interval: float
+    _ttl: Union[float, None]
+    _reader: SQLiteConnection
+    _reader_lock: Lock
+    _pending: List[Row]
+    _writing: int
+    _failed: int
+    _cond: Condition
+    _writer: Union[Thread, None]
+    _closed: bool
+    _hits: int
+    _misses: int
+    _last_purge: float
+    _models: Dict[str, Type[BaseModel]]
+
+    def __init__(  # noqa: PLR0913
+        self,
+        path: Union[str, Path],
+        cache: Union[ResultStore, None] = None,
+        batch_size: int = 512,
+        flush_interval: float = 0.05,
+        ttl: Union[float, None] = None,
+        models: Iterable[Type[BaseModel]] = (),
+    ) -> None:
+        """
+        Initializes a new instance of the SQLiteResultStore class.
+
+        Args:
+            path (Union[str, Path]): The path of the database, created if needed.
+            cache (Union[ResultStore, None], optional): The store keeping the results \
+                in memory. Defaults to None, which creates a `MemoryResultStore`.
+            batch_size (int, optional): The maximum number of results written in one \
+                transaction. Defaults to 512.
+            flush_interval (float, optional): How long the writer waits for more \
+                results before writing a batch, in seconds. Defaults to 0.05.
+            ttl (Union[float, None], optional): How long the results are kept in the \
+                database, in seconds. Defaults to None, which keeps them forever.
+            models (Iterable[Type[BaseModel]], optional): The models the results can \
+                be loaded as, in addition to the output types of the functions using \
+                the store. Defaults to ().
+
+        Returns:
+            None
+        """
+        self._path = str(path)
+        self._cache = cache if cache is not None else MemoryResultStore()
+        self._batch_size = max(batch_size, 1)
+        self._flush_interval = max(flush_interval, 0.0)
+        self._ttl = ttl
+        self._reader = _open(self._path)
+        self._reader_lock = Lock()
+        self._pending = []
+        self._writing = 0
+        self._failed = 0
+        self._cond = Condition()
+        self._writer = None
+        self._closed = False
+        self._hits = 0
+        self._misses = 0
+        self._last_purge = 0.0
+        self._models = {_model_name(model): model for model in models}
+        register(self.close)
+
+    @property
+    def path(self) -> str:
+        """The path of the database"""
+        return self._path
+
+    @property
+    def cache(self) -> ResultStore:
+        """The store keeping the results in memory"""
+        return self._cache
+
+    @property
+    def stats(self) -> StoreStats:
+        """The statistics of the store"""
+        stats = self._cache.stats
+        row = self._fetch("SELECT COUNT(*) FROM results")
+        persisted = 0 if row is None else int(row[0])
+        return stats.model_copy(
+            update={"hits": self._hits, "misses": self._misses, "persisted": persisted}
+        )
+
+    def register_model(self, model: Type[BaseModel]) -> None:
+        """Allow the results to be loaded as `model`."""
+        self._models[_model_name(model)] = model
+
+    def _fetch(self, query: str, parameters: Tuple[Any, ...] = ()) -> Any:
+        """Fetch the first row of a query, or None once the store is closed."""
+        with self._reader_lock:
+            if self._closed:
+                return None
+            return self._reader.execute(query, parameters).fetchone()
+
+    def _row(self, uuid: str, entry: ResultModel[Any]) -> Row:
+        """Serialize a completed result."""
+        model = _model_of(entry.result)
+        result: Union[bytes, None] = None
+        if model is not None:
+            self.register_model(model)
+            result = get_adapter(model).dump_json(entry.result)
+        elif isinstance(entry.result, list):
+            result = b"[]"
+        error, error_type = None, None
+        if isinstance(entry.error, RemoteExecutionError):
+            error, error_type = entry.error.message, entry.error.error_type
+        elif entry.error is not None:
+            error, error_type = str(entry.error), type(entry.error).__name__
+        now = datetime.now()
+        return (
+            uuid,
+            "" if model is None else _model_name(model),
+            result,
+            error,
+            error_type,
+            (entry.started or now).isoformat(),
+            (entry.completed or now).isoformat(),
+            time(),
+        )
+
+    def _completed(self, uuid: str, entry: ResultModel[Any]) -> None:
+        """Queue a completed result for the writer."""
+        try:
+            row = self._row(uuid, entry)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception(f"Cannot serialize the result {uuid}, it is not persisted")
+            with self._cond:
+                self._failed += 1
+            return
+        with self._cond:
+            if self._closed:
+                return
+            self._pending.append(row)
+            if self._writer is None:
+                self._writer = Thread(target=self._write_loop, name="coleridge-sqlite", daemon=True)
+                self._writer.start()
+            if len(self._pending) >= self._batch_size:
+                self._cond.notify_all()
+
+    def _write_loop(self) -> None:
+        """Write the completed results in batches."""
+        db = _open(self._path)
+        try:
+            while True:
+                with self._cond:
+                    while not self._pending and not self._closed:
+                        self._cond.wait()
+                    if not self._pending:
+                        return
+                    if len(self._pending) < self._batch_size and not self._closed:
+                        self._cond.wait(self._flush_interval)
+                    batch = self._pending[: self._batch_size]
+                    self._pending = self._pending[self._batch_size :]
+                    self._writing += 1
+                written = self._write(db, batch)
+                with self._cond:
+                    self._writing -= 1
+                    if not written:
+                        self._failed += len(batch)
+                    self._cond.notify_all()
+        finally:
+            db.close()
+
+    def _write(self, db: SQLiteConnection, batch: List[Row]) -> bool:
+        """Write a batch in a single transaction, purging the expired results sometimes. \
+        Returns False if the transaction failed and was rolled back."""
+        try:
+            db.execute("BEGIN")
+            db.executemany(_INSERT, batch)
+            if self._ttl is not None and monotonic() - self._last_purge > min(self._ttl, 60):
+                db.execute("DELETE FROM results WHERE stored < ?", (time() - self._ttl,))
+                self._last_purge = monotonic()
+            db.execute("COMMIT")
+            return True
+        except Exception:  # pylint: disable=broad-except
+            logger.exception(f"Cannot write {len(batch)} results to {self._path}")
+            if db.in_transaction:
+                with suppress(Exception):
+                    db.execute("ROLLBACK")
+            return False
+
+    def _load(self, uuid: str) -> Union[ResultModel[Any], None]:
+        """Load a result from the database."""
+        row = self._fetch(_SELECT, (uuid,))
+        if row is None:
+            return None
+        model, result, error, error_type, started, completed = row
+        entry: ResultModel[Any] = ResultModel(started=datetime.fromisoformat(started))
+        if model and result is not None:
+            if model not in self._models:
+                logger.warning(f"Cannot load the result {uuid}: {model} is not a known model")
+                return None
+            try:
+                entry.result = get_adapter(self._models[model]).validate_json(result)
+            except ValidationError as ex:
+                logger.warning(f"Cannot load the result {uuid} as {model}: {ex}")
+                return None
+        elif result is not None:
+            entry.result = []
+        if error is not None:
+            entry.error = RemoteExecutionError(error, error_type or "Exception")
+        entry.set_completed(datetime.fromisoformat(completed))
+        return entry
+
+    def put(self, uuid: str, entry: ResultModel[Any]) -> None:
+        """Keep a result in memory, and persist it once completed."""
+        self._cache.put(uuid, entry)
+        entry.add_done_callback(lambda: self._completed(uuid, entry))
+
+    def get(self, uuid: str) -> Union[ResultModel[Any], None]:
+        """Get a result from memory, or from the database."""
+        entry = self._cache.get(uuid)
+        if entry is None:
+            entry = self._load(uuid)
+        if entry is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+        return entry
+
+    def discard(self, uuid: str) -> None:
+        """Drop a result from memory. It stays in the database."""
+        self._cache.discard(uuid)
+
+    def flush(self, timeout: Union[float, None] = None) -> bool:
+        """
+        Wait until the completed results are written.
+
+        Args:
+            timeout (Union[float, None], optional): The maximum time to wait, in seconds. \
+                Defaults to None, which waits forever.
+
+        Returns:
+            bool: True if everything was written in time, False if it was not or if \
+                some results could not be written meanwhile.
+        """
+        with self._cond:
+            failed = self._failed
+            self._cond.notify_all()
+            written = self._cond.wait_for(
+                lambda: not self._pending and not self._writing, timeout
+            )
+            return written and self._failed == failed
+
+    def close(self) -> None:
+        """
+        Write the completed results, stop the writer and close the database.
+
+        Returns:
+            None
+        """
+        unregister(self.close)
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+            writer = self._writer
+        if writer is not None:
+            writer.join()
+        with self._reader_lock:
+            self._reader.close()
+
+    def __len__(self) -> int:
+        """The number of results in the database"""
+        return self.stats.persisted
+
+
+__all__ = ("SQLiteResultStore",)
@@ -0,0 +1,265 @@
+"""Result stores, keeping the outcome of the tasks"""
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import Any, Dict, List, Type, Union
+from pydantic import BaseModel
+from .models.response import ResultModel
+from .models.stats import StoreStats
+
+_OVERHEAD = 256
+
+
+class ResultStore(ABC):
+    """Base class of the result stores.
+
+    A store maps the uuid of every task to its `ResultModel`. The running task and its \
+    `ExecutionResult` keep a reference to the model, so a store can drop an entry at any \
+    time: it only stops being found by uuid.
+    """
+
+    @abstractmethod
+    def put(self, uuid: str, entry: ResultModel[Any]) -> None:
+        """
+        Store the result of a task.
+
+        Args:
+            uuid (str): The uuid of the task.
+            entry (ResultModel[Any]): The result, usually not completed yet.
+
+        Returns:
+            None
+        """
+
+    @abstractmethod
+    def get(self, uuid: str) -> Union[ResultModel[Any], None]:
+        """
+        Get the result of a task.
+
+        Args:
+            uuid (str): The uuid of the task.
+
+        Returns:
+            Union[ResultModel[Any], None]: The result, or None if it is not stored (anymore).
+        """
+
+    @abstractmethod
+    def discard(self, uuid: str) -> None:
+        """
+        Drop the result of a task, if it is stored.
+
+        Args:
+            uuid (str): The uuid of the task.
+
+        Returns:
+            None
+        """
+
+    @property
+    @abstractmethod
+    def stats(self) -> StoreStats:
+        """The statistics of the store"""
+
+    def register_model(self, model: Type[BaseModel]) -> None:  # noqa: B027
+        """
+        Declare a model the results can be made of. The decorated functions declare \
+        their output type; stores persisting the results only load these models back.
+
+        Args:
+            model (Type[BaseModel]): The model.
+
+        Returns:
+            None
+        """
+
+    def __len__(self) -> int:
+        """The number of stored results"""
+        return self.stats.entries
+
+    def __contains__(self, uuid: object) -> bool:
+        """Whether the result of a task is stored"""
+        return isinstance(uuid, str) and self.get(uuid) is not None
+
+
+def estimate_size(entry: ResultModel[Any]) -> int:
+    """
+    Estimate the memory used by a result, from the size of its JSON.
+
+    Args:
+        entry (ResultModel[Any]): The result.
+
+    Returns:
+        int: The estimated size in bytes.
+    """
+    size = _OVERHEAD
+    values: List[Any] = entry.result if isinstance(entry.result, list) else [entry.result]
+    for value in values:
+        if isinstance(value, BaseModel):
+            size += len(value.model_dump_json())
+    if entry.error is not None:
+        size += len(str(entry.error))
+    return size
+
+
+class MemoryResultStore(ResultStore):  # pylint: disable=too-many-instance-attributes
+    """In-memory LRU result store.
+
+    The least recently used results are evicted when there are more than \
+    `max_entries` of them, or when their estimated size exceeds `max_bytes`. \
+    Completed results also expire `ttl` seconds after completion.
+    """
+
+    _max_entries: Union[int, None]
+    _max_bytes: Union[int, None]
+    _ttl: Union[float, None]
+    _entries: "OrderedDict[str, ResultModel[Any]]"
+    _sizes: Dict[str, int]
+    _expiry: "OrderedDict[str, float]"
+    _bytes: int
+    _lock: Lock
+    _hits: int
+    _misses: int
+    _evictions: int
+    _expirations: int
+
+    def __init__(
+        self,
+        max_entries: Union[int, None] = 10_000,
+        max_bytes: Union[int, None] = None,
+        ttl: Union[float, None] = None,
+    ) -> None:
+        """
+        Initializes a new instance of the MemoryResultStore class.
+
+        Args:
+            max_entries (Union[int, None], optional): The maximum number of results. \
+                Defaults to 10000, None means unbounded.
+            max_bytes (Union[int, None], optional): The maximum estimated size of the \
+                results, in bytes. Defaults to None, which means unbounded.
+            ttl (Union[float, None], optional): How long a completed result is kept, in \
+                seconds. Defaults to None, which keeps it until it is evicted.
+
+        Returns:
+            None
+        """
+        if max_entries is not None and max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._expiry = OrderedDict()
+        self._bytes = 0
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    @property
+    def max_entries(self) -> Union[int, None]:
+        """The maximum number of results"""
+        return self._max_entries
+
+    @property
+    def max_bytes(self) -> Union[int, None]:
+        """The maximum estimated size of the results"""
+        return self._max_bytes
+
+    @property
+    def ttl(self) -> Union[float, None]:
+        """How long a completed result is kept, in seconds"""
+        return self._ttl
+
+    @property
+    def stats(self) -> StoreStats:
+        """The statistics of the store"""
+        with self._lock:
+            self._expire()
+            return StoreStats(
+                entries=len(self._entries),
+                bytes=self._bytes,
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                expirations=self._expirations,
+            )
+
+    def _remove(self, uuid: str) -> None:
+        """Remove an entry. Must be called with the lock held."""
+        self._entries.pop(uuid, None)
+        self._expiry.pop(uuid, None)
+        self._bytes -= self._sizes.pop(uuid, 0)
+
+    def _expire(self) -> None:
+        """Remove the expired entries. Must be called with the lock held."""
+        now = monotonic()
+        while self._expiry:
+            uuid, deadline = next(iter(self._expiry.items()))
+            if deadline > now:
+                break
+            self._remove(uuid)
+            self._expirations += 1
+
+    def _evict(self) -> None:
+        """Evict the least recently used entries. Must be called with the lock held."""
+        while self._entries and (
+            (self._max_entries is not None and len(self._entries) > self._max_entries)
+            or (self._max_bytes is not None and self._bytes > self._max_bytes)
+        ):
+            self._remove(next(iter(self._entries)))
+            self._evictions += 1
+
+    def _completed(self, uuid: str, entry: ResultModel[Any]) -> None:
+        """Account for the size and the expiry of a result once it is completed."""
+        with self._lock:
+            if self._entries.get(uuid) is not entry:
+                return
+            if self._ttl is not None:
+                self._expiry[uuid] = monotonic() + self._ttl
+            if self._max_bytes is not None:
+                size = estimate_size(entry)
+                self._bytes += size - self._sizes.get(uuid, 0)
+                self._sizes[uuid] = size
+                self._evict()
+
+    def put(self, uuid: str, entry: ResultModel[Any]) -> None:
+        """Store the result of a task, evicting the least recently used ones if needed."""
+        with self._lock:
+            self._expire()
+            self._remove(uuid)
+            self._entries[uuid] = entry
+            if self._max_bytes is not None:
+                self._sizes[uuid] = _OVERHEAD
+                self._bytes += _OVERHEAD
+            self._evict()
+        if self._ttl is not None or self._max_bytes is not None:
+            entry.add_done_callback(lambda: self._completed(uuid, entry))
+
+    def get(self, uuid: str) -> Union[ResultModel[Any], None]:
+        """Get the result of a task, marking it as recently used."""
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(uuid)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(uuid)
+            self._hits += 1
+            return entry
+
+    def discard(self, uuid: str) -> None:
+        """Drop the result of a task, if it is stored."""
+        with self._lock:
+            self._remove(uuid)
+
+    def __len__(self) -> int:
+        """The number of stored results"""
+        with self._lock:
+            return len(self._entries)
+
+
+__all__ = ("ResultStore", "MemoryResultStore", "estimate_size")
@@ -0,0 +1,139 @@
+"""Items of the generator functions, streamed while they run"""
+
+from collections import deque
+from threading import Condition
+from typing import Any, AsyncIterator, Deque, Generic, Iterable, Iterator, List, TypeVar, Union
+
+T = TypeVar("T")
+
+
+class ItemStream(Generic[T]):
+    """A bounded buffer between a generator function and the consumer of its items.
+
+    The thread running the generator waits while `max_items` items are buffered, so a \
+    slow consumer slows the function down instead of filling up the memory. Once the \
+    consumer closes the stream, the items are refused and the generator is stopped.
+    """
+
+    _cond: Condition
+    _items: Deque[T]
+    _max_items: int
+    _finished: bool
+    _closed: bool
+
+    def __init__(self, max_items: int = 64, items: Iterable[T] = ()) -> None:
+        """
+        Initializes a new instance of the ItemStream class.
+
+        Args:
+            max_items (int, optional): The maximum number of buffered items. Defaults to 64.
+            items (Iterable[T], optional): The items produced before the stream was \
+                opened, buffered first even beyond `max_items`. Defaults to none.
+
+        Raises:
+            ValueError: If `max_items` is less than 1.
+
+        Returns:
+            None
+        """
+        if max_items < 1:
+            raise ValueError("max_items must be at least 1")
+        self._cond = Condition()
+        self._items = deque(items)
+        self._max_items = max_items
+        self._finished = False
+        self._closed = False
+
+    @property
+    def full(self) -> bool:
+        """Whether adding an item would wait"""
+        with self._cond:
+            return not self._closed and len(self._items) >= self._max_items
+
+    @property
+    def closed(self) -> bool:
+        """Whether the consumer closed the stream"""
+        return self._closed
+
+    def put(self, item: T) -> bool:
+        """
+        Add an item, waiting while the buffer is full.
+
+        Args:
+            item (T): The item.
+
+        Returns:
+            bool: False if the stream is closed and the item was refused.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._closed or len(self._items) < self._max_items)
+            if self._closed:
+                return False
+            self._items.append(item)
+            self._cond.notify_all()
+            return True
+
+    def finish(self) -> None:
+        """
+        Mark the end of the items: the consumer stops once the buffer is empty.
+
+        Returns:
+            None
+        """
+        with self._cond:
+            self._finished = True
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        """
+        Stop consuming: the buffered items are dropped and the next ones refused.
+
+        Returns:
+            None
+        """
+        with self._cond:
+            self._closed = True
+            self._items.clear()
+            self._cond.notify_all()
+
+    def iterate(self, timeout: Union[float, None] = None) -> Iterator[T]:
+        """
+        Yield the items as they are added, until the stream is finished.
+
+        Args:
+            timeout (Union[float, None], optional): The maximum time in seconds to wait \
+                for the next item. Defaults to None, which waits forever.
+
+        Raises:
+            TimeoutError: If no item is added within the timeout.
+
+        Returns:
+            Iterator[T]: The items.
+        """
+        while True:
+            with self._cond:
+                if not self._cond.wait_for(
+                    lambda: self._items or self._finished or self._closed, timeout
+                ):
+                    raise TimeoutError(f"No item was produced within {timeout} seconds")
+                if not self._items:
+                    return
+                item = self._items.popleft()
+                self._cond.notify_all()
+            yield item
+
+
+async def gather_items(items: AsyncIterator[Any]) -> List[Any]:
+    """
+    Collect the items of an async generator into a list.
+
+    Args:
+        items (AsyncIterator[Any]): The async generator.
+
+    Returns:
+        List[Any]: The items.
+    """
+    return [item async for item in items]
+
+
+__all__ = ("ItemStream", "gather_items")
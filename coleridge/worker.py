@@ -0,0 +1,111 @@
+"""Long-running worker consuming the queues of rabbit functions"""
+
+from logging import getLogger
+from signal import SIGINT, SIGTERM, Signals, getsignal, signal
+from threading import Event, current_thread, main_thread
+from types import FrameType
+from typing import Any, Dict, Iterable, List, Union
+from .rabbit import RabbitBackgroundFunction
+
+logger = getLogger(__name__)
+
+
+def serve(  # noqa: PLR0913
+    functions: Iterable[RabbitBackgroundFunction[Any, Any]],
+    concurrency: Union[int, None] = None,
+    prefetch_count: Union[int, None] = None,
+    stop: Union[Event, None] = None,
+    drain_timeout: Union[float, None] = 30,
+) -> None:
+    """
+    Consume the queues of rabbit functions until stopped.
+
+    When called from the main thread, SIGINT and SIGTERM stop the worker. Once \
+    stopped, the consumers are cancelled and the messages being handled are \
+    processed and acknowledged before returning.
+
+    Args:
+        functions (Iterable[RabbitBackgroundFunction]): The functions to serve.
+        concurrency (Union[int, None], optional): The number of messages each function \
+            handles at the same time. Defaults to None, which keeps the one of the function.
+        prefetch_count (Union[int, None], optional): The maximum number of unacknowledged \
+            messages per function. Defaults to None, which keeps the one of the function.
+        stop (Union[Event, None], optional): An event stopping the worker when set. \
+            Defaults to None.
+        drain_timeout (Union[float, None], optional): How long to wait for the messages \
+            being handled when stopping, in seconds. Defaults to 30.
+
+    Raises:
+        ValueError: If there are no functions to serve.
+
+    Returns:
+        None
+    """
+    funcs: List[RabbitBackgroundFunction[Any, Any]] = list(
+        {id(func): func for func in functions}.values()
+    )
+    if not funcs:
+        raise ValueError("There are no rabbit functions to serve")
+    if stop is None:
+        stop = Event()
+    for func in funcs:
+        if concurrency is not None:
+            func.concurrency = concurrency
+        if prefetch_count is not None:
+            func.prefetch_count = prefetch_count
+
+    previous = _handle_signals(stop)
+    try:
+        for func in funcs:
+            func.consume()
+            logger.info(f"Consuming {func.queue} with concurrency {func.concurrency}")
+        while not stop.wait(1.0):
+            _reconnect(funcs)
+    finally:
+        _shutdown(funcs, drain_timeout)
+        for signum, handler in previous.items():
+            signal(signum, handler)
+
+
+def _handle_signals(stop: Event) -> Dict[Signals, Any]:
+    """Set the stop event on SIGINT and SIGTERM, returning the previous handlers. \
+    Signal handlers can only be installed from the main thread."""
+    previous: Dict[Signals, Any] = {}
+    if current_thread() is not main_thread():
+        return previous
+
+    def _on_signal(signum: int, frame: Union[FrameType, None]) -> None:
+        # pylint: disable=unused-argument
+        logger.info(f"Received signal {signum}, stopping")
+        stop.set()
+
+    for signum in (SIGINT, SIGTERM):
+        previous[signum] = getsignal(signum)
+        signal(signum, _on_signal)
+    return previous
+
+
+def _shutdown(
+    funcs: List[RabbitBackgroundFunction[Any, Any]], drain_timeout: Union[float, None]
+) -> None:
+    """Cancel the consumers, then wait for the messages being handled."""
+    for func in funcs:
+        func.stop()
+    for func in funcs:
+        if not func.drain(drain_timeout):
+            logger.warning(f"Some messages of {func.queue} were not processed in time")
+
+
+def _reconnect(funcs: List[RabbitBackgroundFunction[Any, Any]]) -> None:
+    """Consume again the queues whose connection was lost."""
+    for func in funcs:
+        if func.is_connected:
+            continue
+        logger.warning(f"Reconnecting to the broker for {func.queue}")
+        try:
+            func.consume()
+        except Exception as ex:  # pylint: disable=broad-except
+            logger.error(f"Cannot consume {func.queue}: {ex}")
+
+
+__all__ = ("serve",)
@@ -0,0 +1,117 @@
+"""Tests of the micro-batching of single submissions"""
+
+from threading import Event
+from time import monotonic, sleep
+from typing import List, Union
+from coleridge import Coleridge, Value
+from coleridge.batching import Batcher
+
+
+class _Collector:
+    """Collects the batches handed over by a batcher"""
+
+    def __init__(self, expected: int = 0) -> None:
+        self.batches: List[List[int]] = []
+        self.handed: List[float] = []
+        self.expected = expected
+        self.done = Event()
+
+    def __call__(self, batch: List[int]) -> None:
+        self.batches.append(batch)
+        self.handed.append(monotonic())
+        if sum(len(b) for b in self.batches) >= self.expected:
+            self.done.set()
+
+
+def test_full_batches_are_handed_over() -> None:
+    """A batch is handed over as soon as it has `batch_size` items."""
+    collector = _Collector(expected=6)
+    batcher: Batcher[int] = Batcher(collector, batch_size=3, linger=10)
+    for i in range(6):
+        batcher.add(i)
+    assert collector.done.wait(5)
+    assert collector.batches == [[0, 1, 2], [3, 4, 5]]
+    batcher.close()
+
+
+def test_partial_batches_linger() -> None:
+    """A partial batch is handed over once its oldest item has waited `linger`."""
+    collector = _Collector(expected=2)
+    batcher: Batcher[int] = Batcher(collector, batch_size=10, linger=0.1)
+    started = monotonic()
+    batcher.add(1)
+    batcher.add(2)
+    assert collector.done.wait(5)
+    assert collector.batches == [[1, 2]]
+    assert collector.handed[0] - started >= 0.09
+    batcher.close()
+
+
+def test_leftovers_keep_their_own_linger() -> None:
+    """Items added while a batch is handled wait `linger` from their own arrival."""
+    collector = _Collector(expected=3)
+
+    def _slow(batch: List[int]) -> None:
+        collector(batch)
+        if len(collector.batches) == 1:
+            sleep(0.2)
+
+    batcher: Batcher[int] = Batcher(_slow, batch_size=2, linger=0.3)
+    batcher.add(1)
+    batcher.add(2)
+    added = monotonic()
+    batcher.add(3)
+    assert collector.done.wait(5)
+    assert collector.batches == [[1, 2], [3]]
+    assert 0.25 <= collector.handed[1] - added < 0.45
+    batcher.close()
+
+
+def test_handler_errors_do_not_stop_the_batcher() -> None:
+    """A batch whose handler raises is dropped, and the next ones are handled."""
+    handled: List[List[int]] = []
+    done = Event()
+
+    def _handle(batch: List[int]) -> None:
+        if 0 in batch:
+            raise ValueError("Cannot handle 0")
+        handled.append(batch)
+        done.set()
+
+    batcher: Batcher[int] = Batcher(_handle, batch_size=1)
+    batcher.add(0)
+    batcher.add(1)
+    assert done.wait(5)
+    assert handled == [[1]]
+    batcher.close()
+
+
+def test_flush_and_close_hand_everything_over() -> None:
+    """`flush` and `close` hand the waiting items over right away."""
+    collector = _Collector()
+    batcher: Batcher[int] = Batcher(collector, batch_size=2, linger=10)
+    batcher.add(1)
+    batcher.flush()
+    assert collector.batches == [[1]]
+    for i in range(2, 5):
+        batcher.add(i)
+    batcher.close()
+    assert [i for batch in collector.batches for i in batch] == [1, 2, 3, 4]
+
+
+def test_run_calls_are_batched() -> None:
+    """Single `run` calls are passed to the function as lists, and split back."""
+    background = Coleridge(max_workers=2, batch_size=8, batch_linger_ms=20)
+    sizes: List[int] = []
+
+    @background
+    def double(values: Union[Value, List[Value]]) -> Union[Value, List[Value]]:
+        assert isinstance(values, list)
+        sizes.append(len(values))
+        return [Value(value=v.value * 2) for v in values]
+
+    results = [double.run(Value(value=i)) for i in range(20)]
+    assert [r.get(5) for r in results] == [Value(value=i * 2) for i in range(20)]
+    assert sum(sizes) == 20
+    assert max(sizes) <= 8
+    assert len(sizes) < 20
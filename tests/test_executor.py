@@ -0,0 +1,91 @@
+"""Tests of the bounded worker pool and its backpressure policies"""
+
+from threading import Event, Thread
+from typing import Callable, List
+import pytest
+from coleridge import QueueFullError, WorkerPool
+
+
+def _occupy(pool: WorkerPool) -> Callable[[], None]:
+    """Keep the only worker of a pool busy until the returned function is called."""
+    started, release = Event(), Event()
+
+    def _task() -> None:
+        started.set()
+        release.wait(10)
+
+    pool.submit(_task)
+    assert started.wait(5)
+    return release.set
+
+
+def test_runs_the_tasks() -> None:
+    """The tasks run on at most `max_workers` threads, and `join` waits for them."""
+    pool = WorkerPool(2)
+    done: List[int] = []
+    for i in range(20):
+        pool.submit(lambda i=i: done.append(i))
+    assert pool.join(5)
+    assert sorted(done) == list(range(20))
+    assert pool.workers <= 2
+    pool.shutdown()
+
+
+def test_block_waits_for_room() -> None:
+    """With "block", `submit` waits for a free slot, up to its timeout."""
+    pool = WorkerPool(1, max_queue=1, backpressure="block")
+    release = _occupy(pool)
+    pool.submit(lambda: None)
+    with pytest.raises(QueueFullError):
+        pool.submit(lambda: None, timeout=0.05)
+    done = Event()
+    submitter = Thread(target=lambda: pool.submit(done.set))
+    submitter.start()
+    submitter.join(0.1)
+    assert submitter.is_alive()
+    release()
+    submitter.join(5)
+    assert not submitter.is_alive()
+    assert done.wait(5)
+    pool.shutdown()
+
+
+def test_reject_raises() -> None:
+    """With "reject", `submit` raises right away when the queue is full."""
+    pool = WorkerPool(1, max_queue=1, backpressure="reject")
+    release = _occupy(pool)
+    pool.submit(lambda: None)
+    with pytest.raises(QueueFullError):
+        pool.submit(lambda: None)
+    assert pool.queue_depth == 1
+    release()
+    pool.shutdown()
+
+
+def test_drop_oldest_drops_the_next_in_line() -> None:
+    """With "drop_oldest", the oldest waiting task makes room and is told so."""
+    pool = WorkerPool(1, max_queue=2, backpressure="drop_oldest")
+    release = _occupy(pool)
+    ran: List[str] = []
+    dropped: List[Exception] = []
+    for name in ("first", "second", "third"):
+        pool.submit(lambda name=name: ran.append(name), on_drop=dropped.append)
+    assert len(dropped) == 1
+    assert isinstance(dropped[0], QueueFullError)
+    release()
+    assert pool.join(5)
+    assert ran == ["second", "third"]
+    pool.shutdown()
+
+
+def test_shutdown_runs_the_queued_tasks() -> None:
+    """A pool that is shut down runs its queued tasks, but takes no new one."""
+    pool = WorkerPool(1)
+    release = _occupy(pool)
+    done = Event()
+    pool.submit(done.set)
+    release()
+    pool.shutdown()
+    assert done.is_set()
+    with pytest.raises(RuntimeError):
+        pool.submit(lambda: None)
@@ -0,0 +1,132 @@
+"""Tests of the in-process memory broker: acks, redelivery, prefetch and priorities"""
+
+from typing import Any, List, Tuple
+import pytest
+from pika import BasicProperties
+from coleridge import Coleridge, MemoryBroker, Value
+from coleridge.memory import MemoryChannel, MemoryConnection
+
+Delivery = Tuple[int, bool, Any]
+
+
+def _consumer(
+    broker: MemoryBroker, queue: str, prefetch: int = 0
+) -> Tuple[MemoryConnection, MemoryChannel, List[Delivery]]:
+    """Consume a queue, collecting the delivery tags, redelivered flags and bodies."""
+    connection = broker.connect()
+    channel = connection.channel()
+    channel.basic_qos(prefetch_count=prefetch)
+    deliveries: List[Delivery] = []
+    channel.basic_consume(
+        queue,
+        lambda _ch, method, _props, body: deliveries.append(
+            (method.delivery_tag, method.redelivered, body)
+        ),
+    )
+    return connection, channel, deliveries
+
+
+def _publisher(broker: MemoryBroker, queue: str, **arguments: Any) -> MemoryChannel:
+    """Declare a queue and get a channel to publish to it."""
+    channel = broker.connect().channel()
+    channel.queue_declare(queue, arguments=arguments or None)
+    return channel
+
+
+def test_ack_removes_the_message() -> None:
+    """Acked messages are gone, the others wait in the queue."""
+    broker = MemoryBroker()
+    publisher = _publisher(broker, "q")
+    for body in (b"a", b"b"):
+        publisher.basic_publish("", "q", body)
+    assert broker.queue_depth("q") == 2
+    connection, channel, deliveries = _consumer(broker, "q")
+    connection.process_data_events()
+    assert [body for _, _, body in deliveries] == [b"a", b"b"]
+    assert broker.queue_depth("q") == 0
+    channel.basic_ack(deliveries[1][0], multiple=True)
+    channel.close()
+    assert broker.queue_depth("q") == 0
+
+
+def test_nack_redelivers() -> None:
+    """Nacked messages are redelivered, flagged so, unless they are not requeued."""
+    broker = MemoryBroker()
+    publisher = _publisher(broker, "q")
+    publisher.basic_publish("", "q", b"again")
+    publisher.basic_publish("", "q", b"dropped")
+    connection, channel, deliveries = _consumer(broker, "q")
+    connection.process_data_events()
+    (again, redelivered, _), (dropped, _, _) = deliveries
+    assert not redelivered
+    channel.basic_nack(dropped, requeue=False)
+    channel.basic_nack(again)
+    connection.process_data_events()
+    assert deliveries[2][1:] == (True, b"again")
+    channel.basic_ack(deliveries[2][0])
+    assert broker.queue_depth("q") == 0
+
+
+def test_closing_requeues_the_unacked() -> None:
+    """The unacked messages of a closed channel go to the other consumers."""
+    broker = MemoryBroker()
+    publisher = _publisher(broker, "q")
+    publisher.basic_publish("", "q", b"message")
+    first, channel, delivered = _consumer(broker, "q")
+    first.process_data_events()
+    assert len(delivered) == 1
+    channel.close()
+    assert broker.queue_depth("q") == 1
+    second, _, redelivered = _consumer(broker, "q")
+    second.process_data_events()
+    assert redelivered[0][1:] == (True, b"message")
+
+
+def test_prefetch_limits_the_unacked() -> None:
+    """A channel gets no more than `prefetch_count` unacked messages."""
+    broker = MemoryBroker()
+    publisher = _publisher(broker, "q")
+    for i in range(5):
+        publisher.basic_publish("", "q", str(i).encode())
+    connection, channel, deliveries = _consumer(broker, "q", prefetch=2)
+    connection.process_data_events()
+    assert len(deliveries) == 2
+    channel.basic_ack(deliveries[0][0])
+    connection.process_data_events()
+    assert len(deliveries) == 3
+    assert broker.queue_depth("q") == 2
+
+
+def test_priorities_are_clamped() -> None:
+    """Higher priorities are delivered first, and count as the maximum of the queue."""
+    broker = MemoryBroker()
+    publisher = _publisher(broker, "q", **{"x-max-priority": 5})
+    for body, priority in ((b"above", 9), (b"max", 5), (b"low", 1), (b"mid", 3)):
+        publisher.basic_publish("", "q", body, BasicProperties(priority=priority))
+    connection, _, deliveries = _consumer(broker, "q")
+    connection.process_data_events()
+    assert [body for _, _, body in deliveries] == [b"above", b"max", b"mid", b"low"]
+
+
+def test_unroutable_mandatory_messages_fail() -> None:
+    """Mandatory messages to a missing queue raise, the others are dropped."""
+    broker = MemoryBroker()
+    channel = broker.connect().channel()
+    channel.basic_publish("", "missing", b"lost")
+    with pytest.raises(LookupError):
+        channel.basic_publish("", "missing", b"lost", mandatory=True)
+
+
+def test_memory_mode_round_trip() -> None:
+    """Functions in memory mode run their tasks and send the results back."""
+    pool = MemoryBroker().connection_pool()
+    memory = Coleridge(mode="memory", queue="round-trip", connection_pool=pool)
+
+    @memory
+    def double(value: Value) -> Value:
+        return Value(value=value.value * 2)
+
+    results = [double.run(Value(value=i)) for i in range(10)]
+    assert [r.get(5) for r in results] == [Value(value=i * 2) for i in range(10)]
+    double.close()
+    pool.close()
@@ -0,0 +1,83 @@
+"""Tests of the task priorities and of their aging"""
+
+from threading import Event
+from time import sleep
+from typing import List
+import pytest
+from coleridge import Coleridge, Value, WorkerPool
+
+
+def _occupy(pool: WorkerPool) -> Event:
+    """Keep the only worker of a pool busy until the returned event is set."""
+    started, release = Event(), Event()
+
+    def _task() -> None:
+        started.set()
+        release.wait(10)
+
+    pool.submit(_task)
+    assert started.wait(5)
+    return release
+
+
+def test_higher_priorities_run_first() -> None:
+    """Waiting tasks run by priority, then in submission order."""
+    pool = WorkerPool(1)
+    release = _occupy(pool)
+    ran: List[str] = []
+    for name, priority in (("low", 0), ("high", 5), ("mid", 2), ("high-2", 5)):
+        pool.submit(lambda name=name: ran.append(name), priority=priority)
+    release.set()
+    assert pool.join(5)
+    assert ran == ["high", "high-2", "mid", "low"]
+    pool.shutdown()
+
+
+def test_waiting_tasks_age() -> None:
+    """A low priority task that waited long enough runs before a newer high one."""
+    pool = WorkerPool(1, aging=0.05)
+    release = _occupy(pool)
+    ran: List[str] = []
+    pool.submit(lambda: ran.append("old"), priority=0)
+    sleep(0.2)
+    pool.submit(lambda: ran.append("new"), priority=2)
+    pool.submit(lambda: ran.append("urgent"), priority=10)
+    release.set()
+    assert pool.join(5)
+    assert ran == ["urgent", "old", "new"]
+    pool.shutdown()
+
+
+def test_drop_oldest_drops_the_lowest_priority() -> None:
+    """A full queue drops its lowest priority task, the new one if it is the lowest."""
+    pool = WorkerPool(1, max_queue=2, backpressure="drop_oldest")
+    release = _occupy(pool)
+    ran: List[str] = []
+    dropped: List[str] = []
+    for name, priority in (("high", 5), ("low", 0), ("mid", 2), ("lowest", -1)):
+        pool.submit(
+            lambda name=name: ran.append(name),
+            on_drop=lambda _, name=name: dropped.append(name),
+            priority=priority,
+        )
+    assert dropped == ["low", "lowest"]
+    release.set()
+    assert pool.join(5)
+    assert ran == ["high", "mid"]
+    pool.shutdown()
+
+
+def test_priority_needs_a_worker_pool() -> None:
+    """A priority that cannot be honored issues a RuntimeWarning."""
+    background = Coleridge()
+    pooled = Coleridge(max_workers=1)
+
+    def identity(value: Value) -> Value:
+        return value
+
+    unordered = background(identity)
+    ordered = pooled(identity)
+    with pytest.warns(RuntimeWarning):
+        unordered.run(Value(value=1), priority=1).get(5)
+    unordered.run(Value(value=1)).get(5)
+    assert ordered.run(Value(value=2), priority=1).get(5) == Value(value=2)
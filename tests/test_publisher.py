@@ -0,0 +1,77 @@
+"""Tests of the batched publisher and of its asynchronous confirms, against the memory broker"""
+
+from typing import List
+import pytest
+from pika import BasicProperties
+from pika.exceptions import UnroutableError
+from coleridge import Coleridge, Connection, MemoryBroker, Value
+from coleridge.publisher import Message, Publisher
+
+
+def _messages(count: int) -> List[Message]:
+    """Messages with their index as body and message id."""
+    return [(str(i).encode(), BasicProperties(message_id=str(i))) for i in range(count)]
+
+
+@pytest.mark.parametrize("latency", [0.0, 0.002])
+def test_published_messages_are_confirmed(latency: float) -> None:
+    """Every message of a batch is confirmed, with or without a confirm latency."""
+    broker = MemoryBroker(confirm_latency=latency)
+    pool = broker.connection_pool()
+    publisher = Publisher(pool, Connection(), "q", lambda ch: ch.queue_declare("q"), confirm=True)
+    assert publisher.publish_many(_messages(100)) == [None] * 100
+    assert broker.queue_depth("q") == 100
+    publisher.close()
+    pool.close()
+
+
+@pytest.mark.parametrize("latency", [0.0, 0.002])
+def test_unroutable_messages_fail(latency: float) -> None:
+    """Messages to a missing queue fail with an UnroutableError in confirm mode."""
+    pool = MemoryBroker(confirm_latency=latency).connection_pool()
+    publisher = Publisher(pool, Connection(), "missing", lambda ch: None, confirm=True)
+    errors = publisher.publish_many(_messages(3))
+    assert all(isinstance(error, UnroutableError) for error in errors)
+    publisher.close()
+    pool.close()
+
+
+def test_buffered_messages_are_sent_in_batches() -> None:
+    """Buffered messages are sent once their batch fills up, or on `flush`."""
+    broker = MemoryBroker()
+    pool = broker.connection_pool()
+    publisher = Publisher(
+        pool, Connection(), "q", lambda ch: ch.queue_declare("q"), batch_size=4, linger=10
+    )
+    assert publisher.buffered
+    failures: List[Exception] = []
+    for body, properties in _messages(5):
+        publisher.publish(body, properties, failures.append)
+    publisher.flush()
+    assert broker.queue_depth("q") == 5
+    assert not failures
+    publisher.close()
+    pool.close()
+
+
+@pytest.mark.parametrize("batch_size", [1, 16])
+def test_confirmed_round_trip(batch_size: int) -> None:
+    """Functions publishing with confirms get every result back."""
+    pool = MemoryBroker(confirm_latency=0.001).connection_pool()
+    memory = Coleridge(
+        mode="memory",
+        queue=f"confirmed-{batch_size}",
+        connection_pool=pool,
+        publisher_confirms=True,
+        publish_batch_size=batch_size,
+        publish_linger_ms=2,
+    )
+
+    @memory
+    def double(value: Value) -> Value:
+        return Value(value=value.value * 2)
+
+    results = [double.run(Value(value=i)) for i in range(20)]
+    assert [r.get(10) for r in results] == [Value(value=i * 2) for i in range(20)]
+    double.close()
+    pool.close()
@@ -0,0 +1,83 @@
+"""Tests of the reply path of the rabbit functions, against the memory broker"""
+
+import gc
+from threading import Event
+from typing import List, Tuple
+from weakref import ref
+import pytest
+from pika import BasicProperties
+from coleridge import Coleridge, Connection, MemoryBroker, Value
+from coleridge.reply import get_reply_consumer
+
+
+def test_replies_reach_their_waiter() -> None:
+    """A reply is handed over to the waiter of its correlation id."""
+    broker = MemoryBroker()
+    pool = broker.connection_pool()
+    consumer = get_reply_consumer(pool, Connection())
+    replies: List[Tuple[str, bytes]] = []
+    replied = Event()
+
+    def _waiter(properties: BasicProperties, body: bytes) -> None:
+        replies.append((properties.correlation_id, body))
+        replied.set()
+
+    queue = consumer.register("expected", _waiter, lambda ex: None)
+    consumer.register("forgotten", _waiter, lambda ex: None)
+    consumer.forget("forgotten")
+    assert consumer.pending == 1
+    channel = broker.connect().channel()
+    for correlation_id in ("forgotten", "unknown", "expected"):
+        channel.basic_publish(
+            "", queue, correlation_id.encode(), BasicProperties(correlation_id=correlation_id)
+        )
+    assert replied.wait(5)
+    assert replies == [("expected", b"expected")]
+    assert consumer.pending == 0
+    pool.close()
+
+
+def test_lost_reply_queue_fails_the_waiters() -> None:
+    """The waiters fail with a ConnectionError when the reply queue is lost."""
+    pool = MemoryBroker().connection_pool()
+    consumer = get_reply_consumer(pool, Connection())
+    errors: List[Exception] = []
+    failed = Event()
+
+    def _on_lost(error: Exception) -> None:
+        errors.append(error)
+        failed.set()
+
+    consumer.register("waiting", lambda properties, body: None, _on_lost)
+    pool.close()
+    assert failed.wait(5)
+    assert isinstance(errors[0], ConnectionError)
+    assert consumer.pending == 0
+
+
+def test_pending_results_fail_when_the_reply_queue_is_lost() -> None:
+    """The results waiting for a reply fail instead of waiting forever."""
+    pool = MemoryBroker().connection_pool()
+    memory = Coleridge(mode="memory", queue="no-consumer", connection_pool=pool, consume=False)
+
+    @memory
+    def identity(value: Value) -> Value:
+        return value
+
+    result = identity.run(Value(value=1))
+    pool.close()
+    with pytest.raises(ConnectionError):
+        result.get(5)
+
+
+def test_reply_consumers_are_kept_per_pool() -> None:
+    """There is one consumer per pool, dropped with its pool."""
+    pool = MemoryBroker().connection_pool()
+    consumer = get_reply_consumer(pool, Connection())
+    assert get_reply_consumer(pool, Connection()) is consumer
+    assert get_reply_consumer(MemoryBroker().connection_pool(), Connection()) is not consumer
+    consumer_ref = ref(consumer)
+    pool.close()
+    del pool, consumer
+    gc.collect()
+    assert consumer_ref() is None
@@ -0,0 +1,88 @@
+"""Tests of ExecutionResult: waiting, getting and timing out"""
+
+from threading import Event
+from typing import List
+import pytest
+from coleridge import Coleridge, Value
+from coleridge.result import ExecutionResult
+
+coleridge = Coleridge()
+release = Event()
+
+
+@coleridge
+def double(value: Value) -> Value:
+    """Double a value"""
+    return Value(value=value.value * 2)
+
+
+@coleridge
+def fail(value: Value) -> Value:
+    """Raise an error"""
+    raise KeyError(value.value)
+
+
+@coleridge
+def blocked(value: Value) -> Value:
+    """Wait for the test to release it"""
+    release.wait(10)
+    return value
+
+
+def test_get_returns_the_result() -> None:
+    """`get` waits for the execution and returns its result."""
+    result = double.run(Value(value=21))
+    value = result.get(timeout=5)
+    assert isinstance(value, Value)
+    assert value.value == 42
+    assert result.finished
+    assert result.success
+    assert result.error is None
+    assert result.started is not None and result.completed is not None
+    assert result.completed >= result.started
+
+
+def test_get_raises_the_error() -> None:
+    """`get` raises the error of the execution, `wait` does not."""
+    result = fail.run(Value(value="missing"))
+    assert result.wait(timeout=5)
+    assert result.finished
+    assert not result.success
+    assert isinstance(result.error, KeyError)
+    with pytest.raises(KeyError):
+        result.get(timeout=5)
+
+
+def test_wait_and_get_time_out() -> None:
+    """`wait` returns False and `get` raises a TimeoutError while the execution runs."""
+    release.clear()
+    result = blocked.run(Value(value=1))
+    try:
+        assert not result.wait(timeout=0.05)
+        assert not result.finished
+        with pytest.raises(TimeoutError):
+            result.get(timeout=0.05)
+    finally:
+        release.set()
+    value = result.get(timeout=5)
+    assert isinstance(value, Value)
+    assert value.value == 1
+
+
+def test_done_callback_runs_once_finished() -> None:
+    """The done callbacks run once the execution finishes, or right away if it has."""
+    release.clear()
+    result = blocked.run(Value(value=2))
+    called: List[ExecutionResult[Value]] = []
+    finished = Event()
+
+    def _done(res: ExecutionResult[Value]) -> None:
+        called.append(res)
+        finished.set()
+
+    result.add_done_callback(_done)
+    assert not called
+    release.set()
+    assert finished.wait(5)
+    result.add_done_callback(called.append)
+    assert called == [result, result]
@@ -0,0 +1,75 @@
+"""Tests of the cron scheduler and of its misfire policies"""
+
+from threading import Event
+from coleridge import CronJob, CronScheduler, WorkerPool
+
+EVERY_MINUTE = "* * * * *"
+
+
+def _missed(job: CronJob, fire_times: int) -> float:
+    """The time at which `fire_times` fire times of a job are due."""
+    return job.next_timestamp + 60 * (fire_times - 1) + 0.5
+
+
+def test_coalesce_runs_once_for_the_missed_fire_times() -> None:
+    """"coalesce" runs a late job once, and moves to the next fire time in the future."""
+    job = CronJob(EVERY_MINUTE, lambda: None, misfire="coalesce")
+    now = _missed(job, 3)
+    next_time, run = job.advance(now)
+    assert run
+    assert now < next_time <= now + 60
+    assert job.stats.misfires == 1
+
+
+def test_skip_runs_only_within_the_grace_time() -> None:
+    """"skip" drops a run later than `misfire_grace_time`."""
+    job = CronJob(EVERY_MINUTE, lambda: None, misfire="skip", misfire_grace_time=1.0)
+    _, run = job.advance(job.next_timestamp + 0.5)
+    assert run
+    assert job.stats.misfires == 0
+    now = job.next_timestamp + 30
+    next_time, run = job.advance(now)
+    assert not run
+    assert next_time > now
+    assert job.stats.misfires == 1
+
+
+def test_run_all_runs_every_missed_fire_time() -> None:
+    """"run_all" runs a late job once for every missed fire time."""
+    job = CronJob(EVERY_MINUTE, lambda: None, misfire="run_all")
+    now = _missed(job, 3)
+    runs = 0
+    while job.next_timestamp <= now:
+        _, run = job.advance(now)
+        runs += run
+    assert runs == 3
+
+
+def test_max_instances_skips_the_overlapping_runs() -> None:
+    """A job does not start more than `max_instances` runs at a time."""
+    pool = WorkerPool(2)
+    release = Event()
+
+    def _slow() -> None:
+        release.wait(5)
+
+    job = CronJob(EVERY_MINUTE, _slow, max_instances=1)
+    assert job.dispatch(job.next_timestamp, pool)
+    assert not job.dispatch(job.next_timestamp, pool)
+    release.set()
+    assert pool.join(5)
+    stats = job.stats
+    assert (stats.runs, stats.skipped, stats.running) == (1, 1, 0)
+    pool.shutdown()
+
+
+def test_scheduler_runs_the_due_jobs() -> None:
+    """The scheduler runs a job when it is due, and not once it is removed."""
+    scheduler = CronScheduler(WorkerPool(1), name="test-cron")
+    done = Event()
+    job = scheduler.add("* * * * * *", done.set)
+    assert done.wait(3)
+    scheduler.remove(job)
+    assert job.cancelled
+    assert job not in scheduler.jobs
+    scheduler.shutdown()
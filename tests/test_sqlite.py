@@ -0,0 +1,100 @@
+"""Tests of the SQLite result store: persistence across instances"""
+
+from pathlib import Path
+from typing import Any, List, Union
+from pydantic import BaseModel
+from coleridge import Coleridge, RemoteExecutionError, SQLiteResultStore, Value
+from coleridge.models.response import ResultModel
+
+
+class Secret(BaseModel):
+    """A model no function of the reading process returns"""
+
+    token: str
+
+
+def _complete(
+    store: SQLiteResultStore,
+    uuid: str,
+    result: Union[BaseModel, List[BaseModel], None] = None,
+    error: Union[Exception, None] = None,
+) -> None:
+    """Store a result and complete it."""
+    entry: ResultModel[Any] = ResultModel()
+    store.put(uuid, entry)
+    entry.result = result
+    entry.error = error
+    entry.set_completed()
+
+
+def test_results_survive_the_store(tmp_path: Path) -> None:
+    """Results written by a store are found by a new one on the same database."""
+    path = tmp_path / "results.db"
+    writer = SQLiteResultStore(path)
+    _complete(writer, "value", Value(value=42))
+    _complete(writer, "values", [Value(value=1), Value(value=2)])
+    _complete(writer, "empty", [])
+    _complete(writer, "error", error=KeyError("missing"))
+    assert writer.flush(5)
+    assert writer.stats.persisted == 4
+    writer.close()
+
+    reader = SQLiteResultStore(path, models=[Value])
+    value = reader.get("value")
+    assert value is not None and value.completed is not None
+    assert value.result == Value(value=42)
+    values = reader.get("values")
+    assert values is not None and values.result == [Value(value=1), Value(value=2)]
+    empty = reader.get("empty")
+    assert empty is not None and empty.result == []
+    error = reader.get("error")
+    assert error is not None and isinstance(error.error, RemoteExecutionError)
+    assert error.error.error_type == "KeyError"
+    assert reader.get("nope") is None
+    reader.close()
+
+
+def test_only_declared_models_are_loaded(tmp_path: Path) -> None:
+    """Results of a model the reader does not know are not loaded."""
+    path = tmp_path / "results.db"
+    writer = SQLiteResultStore(path)
+    _complete(writer, "secret", Secret(token="t"))
+    assert writer.flush(5)
+    writer.close()
+
+    reader = SQLiteResultStore(path)
+    assert reader.get("secret") is None
+    reader.register_model(Secret)
+    loaded = reader.get("secret")
+    assert loaded is not None and loaded.result == Secret(token="t")
+    reader.close()
+
+
+def test_get_result_from_another_instance(tmp_path: Path) -> None:
+    """`get_result` finds the results of the output types of the decorated functions."""
+    path = tmp_path / "results.db"
+    store = SQLiteResultStore(path)
+    _complete(store, "done", Value(value="ok"))
+    assert store.flush(5)
+    store.close()
+
+    reader = SQLiteResultStore(path)
+    background = Coleridge(result_store=reader)
+    assert background.get_result("done") is None
+
+    @background
+    def identity(value: Value) -> Value:  # pylint: disable=unused-variable
+        return value
+
+    found = background.get_result("done")
+    assert found is not None and found.result == Value(value="ok")
+    reader.close()
+
+
+def test_closed_store_finds_nothing(tmp_path: Path) -> None:
+    """A closed store does not read the database anymore."""
+    store = SQLiteResultStore(tmp_path / "results.db", models=[Value])
+    _complete(store, "value", Value(value=1))
+    store.close()
+    store.discard("value")
+    assert store.get("value") is None
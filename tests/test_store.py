@@ -0,0 +1,93 @@
+"""Tests of the in-memory result store: LRU eviction, size limit and expiry"""
+
+from time import sleep
+from typing import Any
+import pytest
+from coleridge import Coleridge, MemoryResultStore, ResultStore, Value
+from coleridge.models.response import ResultModel
+
+
+def _completed(value: Any) -> ResultModel[Any]:
+    """A completed result."""
+    entry: ResultModel[Any] = ResultModel()
+    entry.result = Value(value=value)
+    entry.set_completed()
+    return entry
+
+
+def test_evicts_the_least_recently_used() -> None:
+    """Beyond `max_entries`, the least recently used result is evicted."""
+    store = MemoryResultStore(max_entries=2)
+    store.put("a", _completed(1))
+    store.put("b", _completed(2))
+    assert store.get("a") is not None
+    store.put("c", _completed(3))
+    assert "b" not in store
+    assert "a" in store and "c" in store
+    stats = store.stats
+    assert stats.entries == 2
+    assert stats.evictions == 1
+
+
+def test_evicts_beyond_max_bytes() -> None:
+    """The estimated size of the completed results is bounded by `max_bytes`."""
+    store = MemoryResultStore(max_entries=None, max_bytes=2_000)
+    for i in range(10):
+        store.put(str(i), _completed("x" * 500))
+    stats = store.stats
+    assert 0 < stats.bytes <= 2_000
+    assert stats.entries < 10
+    assert stats.evictions == 10 - stats.entries
+    assert "9" in store
+
+
+def test_completed_results_expire() -> None:
+    """Completed results expire `ttl` seconds after completion, running ones do not."""
+    store = MemoryResultStore(ttl=0.05)
+    running: ResultModel[Any] = ResultModel()
+    store.put("running", running)
+    store.put("done", _completed(1))
+    sleep(0.1)
+    assert store.get("done") is None
+    assert store.get("running") is running
+    assert store.stats.expirations == 1
+
+
+def test_discard_and_stats() -> None:
+    """Discarded results are gone, and the lookups are counted."""
+    store = MemoryResultStore()
+    store.put("a", _completed(1))
+    assert store.get("a") is not None
+    store.discard("a")
+    assert store.get("a") is None
+    stats = store.stats
+    assert (stats.entries, stats.hits, stats.misses) == (0, 1, 1)
+
+
+def test_results_survive_eviction() -> None:
+    """An execution result keeps its outcome after it is evicted from the store."""
+    store = MemoryResultStore(max_entries=1)
+    background = Coleridge(result_store=store)
+
+    @background
+    def double(value: Value) -> Value:
+        return Value(value=value.value * 2)
+
+    first = double.run(Value(value=1))
+    first.wait(5)
+    double.run(Value(value=2)).wait(5)
+    assert first.uuid not in store
+    assert first.get(5) == Value(value=2)
+
+
+def test_result_store_is_abstract() -> None:
+    """A store must implement the whole interface."""
+
+    class Incomplete(ResultStore):
+        """Only stores"""
+
+        def put(self, uuid: str, entry: ResultModel[Any]) -> None:
+            """Drop the result"""
+
+    with pytest.raises(TypeError):
+        Incomplete()  # type: ignore[abstract]